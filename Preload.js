@@ -2,7 +2,8 @@ const { contextBridge, ipcRenderer } = require('electron');
 
 contextBridge.exposeInMainWorld('electronAPI', {
   // Арбітраж
-  getArbitrage: () => ipcRenderer.invoke('get-arbitrage'),
+  // query - фільтри сервера: {min_spread, max_spread, min_volume, buy, sell, min_exchanges, limit, cursor}
+  getArbitrage: (query) => ipcRenderer.invoke('get-arbitrage', query),
   updateArbitrage: () => ipcRenderer.invoke('update-arbitrage'),
   
   // Налаштування
@@ -150,9 +150,14 @@ function createMenu() {
 }
 
 // Обробники IPC
-ipcMain.handle('get-arbitrage', async () => {
+ipcMain.handle('get-arbitrage', async (event, query = {}) => {
     try {
-        const response = await fetch('http://127.0.0.1:5000/arbitrage');
+        // Фільтрація та сторінки - на сервері (порожні значення не передаються)
+        const params = new URLSearchParams(
+            Object.entries(query || {}).filter(([, value]) => value !== undefined && value !== null && value !== '')
+        );
+        const suffix = params.toString() ? `?${params}` : '';
+        const response = await fetch(`http://127.0.0.1:5000/arbitrage${suffix}`);
         return await response.json();
     } catch (error) {
         return { error: error.message };
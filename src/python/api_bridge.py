@@ -35,6 +35,7 @@ CORS(app)
 # Кешовані дані
 cache = {
     'arbitrage': None,
+    'index': None,      # OpportunityIndex для запитів до cache['arbitrage']
     'exchanges': None,
     'last_update': 0
 }
@@ -51,7 +52,7 @@ except ImportError as e:
     ARBITRAGE_AVAILABLE = False
     
     # Створюємо заглушку
-    def analyze_arbitrage_fast(json_output=False):
+    def analyze_arbitrage_fast(json_output=False, index=None, filters=None):
         print("⚠️  Використовую заглушку для arbitrage")
         if json_output:
             return {
@@ -67,6 +68,141 @@ except ImportError as e:
         else:
             return []
 
+# ========== ПОТОКОВИЙ РЕЖИМ (WebSocket) ==========
+# Вмикається змінною оточення SOLIPSIST_STREAM=1
+
+def start_streaming():
+    """Підписатися на тікери бірж для пар універсуму
+
+    Оновлення потоку (і REST знімки бірж без потоку) живлять
+    інкрементальний двигун - /arbitrage відповідає з його стану.
+    """
+    try:
+        from arbitrage_volume import load_pairs
+        from exchanges_all import VENUE_URLS
+        from live_engine import start_live
+        from symbols import get_index
+        
+        index = get_index(load_pairs(), list(VENUE_URLS))
+        live = start_live(lambda: get_active_index() or index, stream=True)
+        logger.info("Потоковий режим: WebSocket + інкрементальний двигун")
+        return live
+    except Exception as e:
+        logger.error(f"Помилка запуску потоків: {e}")
+        return None
+
+def get_venues_status():
+    try:
+        from exchanges_all import get_venue_status
+        return get_venue_status()
+    except Exception:
+        return {}
+
+def get_stream_status():
+    try:
+        from ws_ingest import get_stream
+        stream = get_stream()
+        return stream.get_status() if stream else {'running': False}
+    except Exception:
+        return {'running': False}
+
+def get_live_status():
+    try:
+        from live_engine import get_live
+        live = get_live()
+        return live.get_status() if live else {'running': False}
+    except Exception:
+        return {'running': False}
+
+def get_live_index():
+    """(result, OpportunityIndex) інкрементального двигуна (None, якщо живий режим не готовий)"""
+    try:
+        from live_engine import get_live
+        live = get_live()
+        return live.query_index() if live is not None and live.ready() else None
+    except Exception as e:
+        logger.error(f"Live engine error: {e}")
+        return None
+
+def get_limits_status():
+    try:
+        from scheduler import get_scheduler
+        return get_scheduler().get_status()
+    except Exception:
+        return {}
+
+# ========== ФОНОВЕ ОНОВЛЕННЯ УНІВЕРСУМУ ==========
+# SOLIPSIST_UNIVERSE_REFRESH=секунди між перебудовами (0 - вимкнено)
+
+_universe_refresher = None
+
+def start_universe_refresh():
+    """Перебудовувати універсум зі спільних знімків бірж у фоні"""
+    global _universe_refresher
+    try:
+        from exchanges_all import VENUE_URLS, get_listings
+        from universe import REFRESH_INTERVAL, UniverseRefresher
+        
+        interval = float(os.environ.get('SOLIPSIST_UNIVERSE_REFRESH', REFRESH_INTERVAL))
+        if interval <= 0:
+            return None
+        _universe_refresher = UniverseRefresher(get_listings, list(VENUE_URLS), interval).start()
+        logger.info(f"Фонове оновлення універсуму: кожні {interval:.0f} с")
+        return _universe_refresher
+    except Exception as e:
+        logger.error(f"Помилка запуску оновлення універсуму: {e}")
+        return None
+
+def get_active_index():
+    """Активна версія універсуму (одне посилання - сканування тримає свою до кінця)"""
+    return _universe_refresher.active if _universe_refresher is not None else None
+
+def get_universe_status():
+    if _universe_refresher is not None:
+        return _universe_refresher.get_status()
+    try:
+        from universe import load_universe_file
+        universe_file = load_universe_file()
+        return {
+            'running': False,
+            'version': universe_file.version if universe_file is not None else None,
+            'pairs': len(universe_file) if universe_file is not None else 0
+        }
+    except Exception:
+        return {'running': False}
+
+# ========== ІСТОРІЯ СПРЕДІВ ==========
+# Кожне сканування (і цикл живого режиму) записується в кільцеві буфери пар
+
+def record_history(result):
+    try:
+        from spread_history import get_history
+        stats = result.get('stats', {})
+        get_history().record(result.get('opportunities', []), stats.get('timestamp'))
+    except Exception as e:
+        logger.error(f"History error: {e}")
+
+def get_history_status():
+    try:
+        from spread_history import get_history
+        return get_history().get_status()
+    except Exception:
+        return {}
+
+def get_spread_stats_status():
+    try:
+        from spread_stats import get_spread_stats
+        return get_spread_stats().get_status()
+    except Exception:
+        return {}
+
+def get_consensus_status():
+    try:
+        from price_consensus import get_scale_cache
+        return get_scale_cache().get_status()
+    except Exception:
+        return {}
+
 # ========== ГЛОБАЛЬНИЙ ЕКЗЕМПЛЯР СКАЛЬПЕРА ==========
 _scalper_instance = None
 _scalper_lock = threading.Lock()
@@ -119,9 +255,30 @@ def health():
         'status': 'ok', 
         'service': 'Solipsist Platform',
         'timestamp': time.time(),
-        'arbitrage_available': ARBITRAGE_AVAILABLE
+        'arbitrage_available': ARBITRAGE_AVAILABLE,
+        'stream': get_stream_status(),
+        'live': get_live_status(),
+        'venues': get_venues_status(),
+        'limits': get_limits_status(),
+        'universe': get_universe_status(),
+        'history': get_history_status(),
+        'spread_stats': get_spread_stats_status()
     })
 
+def with_depth(result):
+    """Друга фаза (?verify=true): стакани для топ-N пар, кеш не змінюється"""
+    if not request.args.get('verify') or not result.get('opportunities'):
+        return result
+    try:
+        from depth_check import verify_opportunities, DEFAULT_TOP_N, DEFAULT_NOTIONAL
+        top_n = request.args.get('top', DEFAULT_TOP_N, type=int)
+        notional = request.args.get('notional', DEFAULT_NOTIONAL, type=float)
+        opportunities = verify_opportunities(result['opportunities'], top_n, notional)
+        return dict(result, opportunities=opportunities)
+    except Exception as e:
+        logger.error(f"Depth check error: {e}")
+        return result
+
 @app.route('/arbitrage')
 def get_arbitrage():
     """Отримати арбітражні можливості"""
@@ -133,17 +290,34 @@ def get_arbitrage():
     print(f"   Час: {time.strftime('%H:%M:%S')}", flush=True)
     print(f"   Force: {request.args.get('force')}", flush=True)
     
+    # Фільтри та сторінка - з параметрів запиту (за замовчуванням - як раніше)
+    from opportunity_index import BASE_FILTERS, OpportunityIndex, QueryError, answer_query, parse_query
+    try:
+        query = parse_query(request.args)
+    except QueryError as e:
+        print(f"   ❌ Некоректний запит: {e}", flush=True)
+        return jsonify({'opportunities': [], 'stats': {'error': str(e)}}), 400
+    
+    # Живий режим: стан підтримується інкрементально, сканувати не треба
+    if not request.args.get('force'):
+        live = get_live_index()
+        if live is not None:
+            answer = answer_query(*live, query)
+            print(f"   ⚡ Живий стан: {answer['stats']['found_opportunities']} можливостей", flush=True)
+            return jsonify(with_depth(answer))
+    
     # Перевірка кешу (30 секунд)
     cache_age = time.time() - cache['last_update'] if cache['last_update'] else 999
     if cache['arbitrage'] and cache_age < 30 and not request.args.get('force'):
         print(f"   📦 Використовую кеш ({cache_age:.1f}с)", flush=True)
-        return jsonify(cache['arbitrage'])
+        return jsonify(with_depth(answer_query(cache['arbitrage'], cache['index'], query)))
     
     try:
         print(f"   🔄 Запускаю arbitrage...", flush=True)
         
-        # Безпосередній виклик функції
-        result = analyze_arbitrage_fast(json_output=True)
+        # Безпосередній виклик функції (ширший набір - звужується запитом)
+        result = analyze_arbitrage_fast(json_output=True, index=get_active_index(),
+                                        filters=BASE_FILTERS)
         
         # ДЕТАЛЬНА ПЕРЕВІРКА
         if result is None:
@@ -166,20 +340,24 @@ def get_arbitrage():
             print(f"   ❌ Невідомий тип: {type(result)}", flush=True)
             result = {'opportunities': [], 'stats': {'error': f'Unknown type: {type(result)}'}}
         
-        # Зберігаємо в кеш
+        # Зберігаємо в кеш (разом з індексом - спільний для всіх запитів)
+        cache['index'] = OpportunityIndex(result.get('opportunities', []))
         cache['arbitrage'] = result
         cache['last_update'] = time.time()
+        record_history(result)
         
         # Вивід результатів
-        opps = result.get('opportunities', [])
-        print(f"   ✅ Готово: {len(opps)} можливостей", flush=True)
+        answer = answer_query(result, cache['index'], query)
+        opps = answer['opportunities']
+        print(f"   ✅ Готово: {answer['stats']['found_opportunities']} можливостей "
+              f"(всього пораховано {len(cache['index'])})", flush=True)
         
         if opps:
             for i, opp in enumerate(opps[:3]):
                 print(f"      {i+1}. {opp['pair']}: {opp['spread']:.2f}%", flush=True)
         
         print("="*60, flush=True)
-        return jsonify(result)
+        return jsonify(with_depth(answer))
         
     except Exception as e:
         print(f"\n   💥 КРИТИЧНА ПОМИЛКА: {e}", flush=True)
@@ -199,6 +377,61 @@ def get_arbitrage():
             }
         }), 500
     
+@app.route('/triangular')
+def get_triangular():
+    """Цикловий арбітраж всередині бірж (USDT / USDC / BTC / ETH котирування)"""
+    try:
+        from triangular import MIN_PROFIT, find_triangular
+        min_profit = request.args.get('min_profit', MIN_PROFIT, type=float)
+        venues = [v.strip() for v in request.args.get('venue', '').split(',') if v.strip()] or None
+        limit = request.args.get('limit', type=int)
+        result = find_triangular(min_profit, venues)
+        if limit:
+            result['cycles'] = result['cycles'][:limit]
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Triangular error: {e}")
+        return jsonify({'cycles': [], 'stats': {'error': str(e), 'timestamp': time.time()}}), 500
+
+@app.route('/history')
+def get_spread_history():
+    """Історія спредів: ?pair=BTCUSDT - точки пари, без pair - пари діапазону"""
+    try:
+        from spread_history import get_history
+        history = get_history()
+        until = request.args.get('until', type=float)
+        since = request.args.get('since', type=float)
+        hours = request.args.get('hours', type=float)
+        if since is None and hours:
+            since = (until or time.time()) - hours * 3600
+        min_spread = request.args.get('min_spread', 0.0, type=float)
+        pair = request.args.get('pair', '').strip().upper()
+        if pair:
+            return jsonify(history.pair(pair, since, until, min_spread))
+        return jsonify(history.range(since, until, min_spread, request.args.get('limit', 100, type=int)))
+    except Exception as e:
+        logger.error(f"History error: {e}")
+        return jsonify({'pairs': [], 'error': str(e)}), 500
+
+@app.route('/consensus')
+def get_consensus():
+    """Консенсус бірж: відкинуті ноги та кеш множників
+
+    Живий режим - з останнього перерахунку двигуна, інакше - з останнього сканування.
+    """
+    live = get_live_index()
+    result = live[0] if live is not None else cache['arbitrage'] or {}
+    rejections = result.get('rejections', [])
+    reason = request.args.get('reason')
+    if reason:
+        rejections = [r for r in rejections if r['reason'] == reason]
+    return jsonify({
+        'rejections': rejections,
+        'rejected': result.get('stats', {}).get('rejected', {}),
+        'scales': get_consensus_status(),
+        'timestamp': result.get('stats', {}).get('timestamp')
+    })
+
 @app.route('/exchanges', methods=['GET'])
 def get_exchanges():
     """Отримати список бірж"""
@@ -469,10 +702,25 @@ if __name__ == '__main__':
     
     print(f"\nArbitrage available: {'YES' if ARBITRAGE_AVAILABLE else 'NO (using stub)'}")
     
+    if start_universe_refresh():
+        print(f"Universe refresh: every {_universe_refresher.interval:.0f}s")
+    
+    if os.environ.get('SOLIPSIST_STREAM'):
+        print("Streaming mode: ON (WebSocket)")
+        start_streaming()
+    
     print("\nAvailable routes:")
     print("  GET  /health")
     print("  GET  /arbitrage")
     print("  GET  /arbitrage?force=true  (очистити кеш)")
+    print("  GET  /arbitrage?verify=true&top=20&notional=1000  (перевірка стаканів)")
+    print("  GET  /arbitrage?min_spread=0.5&max_spread=50&min_volume=50000&buy=Binance")
+    print("       &sell=MEXC&min_exchanges=2&limit=50&cursor=...  (запит + сторінки)")
+    print("  GET  /arbitrage?sort=zscore  (за відхиленням спреду від норми пари)")
+    print("  GET  /triangular?min_profit=0.1&venue=Binance&limit=20  (цикли всередині біржі)")
+    print("  GET  /history?pair=BTCUSDT&hours=6  (історія спреду пари)")
+    print("  GET  /consensus?reason=outlier  (відкинуті ноги останнього сканування)")
+    print("  GET  /history?since=...&until=...&min_spread=3&limit=100  (пари за діапазон)")
     print("  GET  /api/scalper/test")
     print("  GET  /api/scalper/status")
     print("  POST /api/scalper/start")
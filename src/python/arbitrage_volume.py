@@ -1,25 +1,26 @@
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from exchanges_all import ALL_EXCHANGES_VOLUME
+from depth_check import verify_opportunities, DEFAULT_TOP_N, DEFAULT_NOTIONAL
+from exchanges_all import fetch_all_with_volume, get_venue_status, VENUE_URLS
+from market_snapshot import MarketSnapshot, build_market_snapshot
+from spread_engine import find_opportunities
+from spread_stats import get_spread_stats
+from symbols import SymbolIndex, get_index
+from universe import UNIVERSE_TEXT, get_universe_index, load_universe_file, read_universe_text
 
 def get_all_data_with_volumes():
     """Отримати всі дані з об'ємами"""
     print("📊 ОТРИМАННЯ ДАНИХ З ОБ'ЄМАМИ")
     
     start = time.time()
-    results = {}
     
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(func): name for name, func in ALL_EXCHANGES_VOLUME.items()}
-        
-        for future in futures:
-            exchange = futures[future]
-            try:
-                results[exchange] = future.result(timeout=15)
-                print(f"✅ {exchange}: {len(results[exchange])} пар")
-            except:
-                print(f"❌ {exchange}: помилка")
-                results[exchange] = {}
+    # Всі біржі одночасно через постійні пули з'єднань
+    results = fetch_all_with_volume()
+    
+    for exchange, data in results.items():
+        if data:
+            print(f"✅ {exchange}: {len(data)} пар")
+        else:
+            print(f"❌ {exchange}: помилка")
     
     elapsed = time.time() - start
     print(f"⏱️  Час: {elapsed:.1f} сек")
@@ -27,49 +28,84 @@ def get_all_data_with_volumes():
     
     return results
 
-def analyze_arbitrage_fast(json_output=False):
-    """Аналіз арбітражу - швидка версія"""
-    # 1. Завантажити пари
-    try:
-        with open("pairs_3plus_of_5.txt", "r") as f:
-            pairs = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+def load_pairs():
+    """Пари для аналізу: universe.bin (mmap, один раз на версію),
+    pairs_3plus_of_5.txt або тестові"""
+    universe_file = load_universe_file()
+    if universe_file is not None and len(universe_file):
+        pairs = universe_file.pairs
+        print(f"📋 Аналіз {len(pairs)} пар (універсум v{universe_file.version})")
+        return pairs
+    
+    saved = read_universe_text(UNIVERSE_TEXT)
+    if saved and saved['pairs']:
+        pairs = saved['pairs']
         print(f"📋 Аналіз {len(pairs)} пар (3+ біржі)")
-    except:
+    else:
         pairs = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT', 'ADAUSDT']
         print("⚠️  Використовую тестові пари")
+    return pairs
+
+def get_market_snapshot(pairs, index=None):
+    """Отримати колонковий знімок цін та об'ємів для пар"""
+    print("📊 ОТРИМАННЯ ДАНИХ З ОБ'ЄМАМИ")
     
-    # 2. Отримати дані
-    all_data = get_all_data_with_volumes()
+    start = time.time()
+    snapshot = build_market_snapshot(pairs, index=index)
+    venues = get_venue_status()
+    
+    for exchange, found in zip(snapshot.exchanges, snapshot.mask.sum(axis=0).tolist()):
+        status = venues.get(exchange, {})
+        latency = status.get('latency', {})
+        if latency.get('breaker_open'):
+            print(f"⛔ {exchange}: пропущено на {latency['reopens_in']} с ({latency['last_error']})")
+        elif found:
+            print(f"✅ {exchange}: {found} пар")
+        else:
+            print(f"❌ {exchange}: помилка {status.get('last_error') or ''}")
     
-    # 3. Аналіз паралельно
+    print(f"⏱️  Час: {time.time() - start:.1f} сек")
+    return snapshot
+
+def analyze_arbitrage_fast(json_output=False, verify_depth=False,
+                           top_n=DEFAULT_TOP_N, notional=DEFAULT_NOTIONAL, index=None, filters=None):
+    """Аналіз арбітражу - швидка версія
+
+    verify_depth=True - друга фаза: стакани для top_n кращих пар
+    і виконуваний спред на notional USD.
+    index - активний SymbolIndex універсуму (фонове оновлення в api_bridge);
+    без нього пари беруться з universe.bin / текстового файлу.
+    filters - фільтри find_opportunities замість стандартних
+    (api_bridge рахує ширший набір і звужує його запитом).
+    """
+    # 1. Завантажити пари (індекс з нативними символами - з universe.bin)
+    if index is not None:
+        pairs = index.pairs
+        print(f"📋 Аналіз {len(pairs)} пар (універсум v{index.version})")
+    else:
+        pairs = load_pairs()
+        index = get_universe_index(list(VENUE_URLS))
+        if index is not None and index.pairs != pairs:
+            index = None
+    
+    # 2. Отримати дані (колонковий знімок pairs × exchanges)
+    snapshot = get_market_snapshot(pairs, index)
+    
+    # 3. Векторний аналіз всіх пар одразу
     print(f"\n🔍 АНАЛІЗ АРБІТРАЖУ...")
     
-    opportunities = []
-    analyzed = 0
+    start = time.perf_counter()
+    opportunities, info = find_opportunities(snapshot, stats=get_spread_stats(), **(filters or {}))
+    print(f"  Перевірено {len(pairs)} пар за {(time.perf_counter() - start) * 1000:.2f} мс")
     
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        # Створюємо завдання для кожної пари
-        future_to_pair = {}
-        for pair in pairs:
-            future = executor.submit(analyze_single_pair, pair, all_data)
-            future_to_pair[future] = pair
-        
-        # Обробляємо результати
-        for future in future_to_pair:
-            pair = future_to_pair[future]
-            try:
-                result = future.result(timeout=5)
-                if result:
-                    opportunities.append(result)
-            except:
-                pass
-            
-            analyzed += 1
-            if analyzed % 20 == 0:
-                print(f"  Перевірено {analyzed}/{len(pairs)} пар...")
+    if info['rejections']:
+        # Деталі - у rejections (JSON), тут тільки підсумок
+        print(f"🔧 Консенсус бірж: {info['rejected']}")
     
-    # 4. Сортування
-    opportunities.sort(key=lambda x: x['spread'], reverse=True)
+    if verify_depth and opportunities:
+        start = time.time()
+        opportunities = verify_opportunities(opportunities, top_n, notional)
+        print(f"📚 Стакани для топ-{min(top_n, len(opportunities))}: {time.time() - start:.2f} сек")
     
     # 🔴 Якщо потрібен JSON для API - повертаємо дані одразу
     if json_output:
@@ -83,11 +119,15 @@ def analyze_arbitrage_fast(json_output=False):
                 'found_opportunities': len(opportunities),
                 'avg_spread': avg_spread,
                 'max_spread': max_spread,
-                'timestamp': time.time()
-            }
+                'timestamp': time.time(),
+                'universe_version': index.version if index is not None else None,
+                'rejected': info['rejected'],
+                'venues': get_venue_status()
+            },
+            'rejections': info['rejections']
         }
     
-    # 5. Результати (тільки якщо не json_output)
+    # 4. Результати (тільки якщо не json_output)
     print(f"\n💎 РЕЗУЛЬТАТИ АРБІТРАЖУ:")
     print("=" * 100)
     
@@ -131,101 +171,37 @@ def analyze_arbitrage_fast(json_output=False):
 
 
 
-def analyze_single_pair(pair, all_data):
-    """Аналіз однієї пари"""
-    prices = {}
-    volumes = {}
-    
-    for exchange, data in all_data.items():
-        # Визначаємо ключ для цієї біржі
-        if exchange == 'Gate.io':
-            key = pair.replace('USDT', '_USDT')
-        elif exchange == 'HTX':
-            key = pair.lower()
-        else:
-            key = pair
-        
-        # Перевіряємо, чи є ця пара на біржі
-        if key not in data:
-            continue
-        
-        price = data[key].get('price', 0)
-        if price <= 0:  # Ігноруємо нульові ціни
-            continue
-            
-        # 🔴 ФІКС для MEXC: якщо ціна < 0.001 - можливо це центи
-        if exchange == 'MEXC' and price < 0.001:
-            # Перевіряємо інші біржі
-            other_prices = []
-            for ex in ['Binance', 'Bybit', 'Gate.io']:
-                other_key = pair.replace('USDT', '_USDT') if ex == 'Gate.io' else pair
-                if other_key in all_data.get(ex, {}):
-                    other_price = all_data[ex][other_key].get('price', 0)
-                    if other_price > 0.01:  # Інші біржі показують нормальну ціну
-                        other_prices.append(other_price)
-            
-            if other_prices and min(other_prices) > 0.01:
-                # MEXC показує центи - конвертуємо в долари
-                price = price * 100
-                print(f"🔧 Виправлено MEXC {pair}: {price/100:.6f} → {price:.6f}")
-            
-        prices[exchange] = price
-        
-        # КОРЕКТНО отримуємо об'єм у USDT
-        if exchange == 'Binance':
-            volumes[exchange] = data[key].get('volume', 0)
-        elif exchange == 'Bybit':
-            volumes[exchange] = data[key].get('volume24h', 0)
-        elif exchange == 'MEXC':
-            volumes[exchange] = data[key].get('volume', 0)
-        elif exchange == 'Gate.io':
-            volumes[exchange] = data[key].get('quote_volume', 0)
-        elif exchange == 'HTX':
-            vol_base = data[key].get('vol', 0)
-            volumes[exchange] = vol_base * price if price > 0 else 0
-    
-    # КРИТИЧНО: потрібно МІНІМУМ 3 біржі з цією парою
-    if len(prices) < 3:
-        return None
-    
-    # Перевіряємо, чи ціни не абсурдно відрізняються
-    price_values = list(prices.values())
-    max_price = max(price_values)
-    min_price = min(price_values)
-    
-    if max_price / min_price > 1000 and min_price > 0:
-        print(f"⚠️  Підозріла пара {pair}: {prices}")
-        return None
-    
-    # Знаходимо найдешевшу та найдорожчу біржі
-    min_ex = min(prices, key=prices.get)
-    max_ex = max(prices, key=prices.get)
-    
-    min_volume = volumes.get(min_ex, 0)
-    max_volume = volumes.get(max_ex, 0)
-    
-    # Розраховуємо спред
-    spread = ((max_price - min_price) / min_price) * 100 if min_price > 0 else 0
-    
-    # Фільтр за спредом: 1% < spread < 100%
-    if spread <= 1 or spread >= 100:
+def analyze_single_pair(pair, all_data, index=None):
+    """Аналіз однієї пари - те саме векторне ядро, що й analyze_arbitrage_fast
+
+    all_data - {exchange: {символ: {'price', 'bid', 'ask', 'volume'}}}
+    (fetch_all_with_volume). Ціни в інших одиницях і абсурдні ноги
+    обробляє консенсус бірж (price_consensus), як і для всього знімка.
+    """
+    if index is None:
+        index = get_index([pair], list(all_data))
+    
+    pair_id = index.pair_id(pair)
+    if pair_id is None:
         return None
     
-    # Фільтр за об'ємом
-    if min_volume > 100000 and max_volume > 100000:
-        return {
-            'pair': pair,
-            'spread': spread,
-            'buy': min_ex,
-            'sell': max_ex,
-            'buy_price': min_price,
-            'sell_price': max_price,
-            'buy_volume': min_volume,
-            'sell_volume': max_volume,
-            'exchanges': len(prices)
-        }
-    
-    return None
+    # Знімок з одного рядка: символи бірж - з індексу
+    exchanges = [exchange for exchange in index.exchanges if exchange in all_data]
+    natives = {exchange: [index.native_symbol(exchange, pair_id)] for exchange in exchanges}
+    snapshot = MarketSnapshot(SymbolIndex([pair], exchanges, natives=natives))
+    for col, exchange in enumerate(exchanges):
+        item = all_data[exchange].get(natives[exchange][0])
+        if not item or item.get('price', 0) <= 0:
+            continue
+        snapshot.prices[0, col] = item['price']
+        snapshot.volumes[0, col] = item.get('volume', 0)
+        snapshot.bids[0, col] = item.get('bid', 0)
+        snapshot.asks[0, col] = item.get('ask', 0)
+        snapshot.updated[0, col] = snapshot.timestamp
+        snapshot.mask[0, col] = True
+    
+    opportunities, _ = find_opportunities(snapshot, max_age=None)
+    return opportunities[0] if opportunities else None
 
 def main():
     print("🎯 АРБІТРАЖ З ОБ'ЄМАМИ (3+ БІРЖІ)")
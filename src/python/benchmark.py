@@ -0,0 +1,266 @@
+# src/python/benchmark.py - офлайн бенчмарки конвеєра даних
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fast_decode import DECODE_MODE, DECODE_MODES, ORJSON_AVAILABLE
+from market_snapshot import MarketSnapshot
+from price_consensus import ScaleCache
+from spread_engine import find_opportunities
+from symbols import USD_QUOTE, SymbolIndex, split_symbol
+
+EXCHANGES = ['Binance', 'Bybit', 'MEXC', 'Gate.io', 'HTX']
+
+# Курси котирувань синтетичного ринку та частка пар кожного котирування
+# відносно USDT пар (приблизно як на Binance / Bybit)
+QUOTE_USD = {'USDT': 1.0, 'USDC': 1.0, 'FDUSD': 1.0, 'BTC': 60000.0, 'ETH': 3000.0}
+QUOTE_MIX = {'USDC': 0.35, 'FDUSD': 0.10, 'BTC': 0.20, 'ETH': 0.10}
+
+# Ціни бірж розходяться: шум кожної біржі та рідкісні зсуви в кілька відсотків
+# (з ними сканування знаходить можливості, зокрема між котируваннями)
+PRICE_JITTER = 0.002      # стандартне відхилення ціни біржі від "справжньої"
+DISLOCATION_RATE = 0.02   # частка (біржа, пара) зі зсувом
+DISLOCATION = 0.05        # максимальний зсув, частка ціни
+
+# Бюджет циклу (розбір + сканування) мультикотирувального універсуму відносно
+# USDT, для кожного режиму розбору. json / orjson розбирають усі тікери
+# відповіді незалежно від універсуму, тож нові пари коштують тільки в
+# скануванні. scan розбирає лише тікери універсуму (звідси його виграш на
+# USDT універсумі) - його розбір росте з кількістю пар (×1.75 для типового
+# QUOTE_MIX); бюджет дозволяє цей ріст, але не дорожчий тікер чи пару.
+SCAN_BUDGETS = {'json': 1.25, 'orjson': 1.25, 'scan': 1.6}
+
+# ==================== СИНТЕТИЧНІ ВІДПОВІДІ ====================
+
+def _binance_item(symbol, price, rng):
+    # Повний набір полів /api/v3/ticker/24hr (MEXC має такий самий формат)
+    return {
+        'symbol': symbol, 'priceChange': f"{price * 0.01:.8f}", 'priceChangePercent': '1.000',
+        'weightedAvgPrice': f"{price:.8f}", 'prevClosePrice': f"{price:.8f}",
+        'lastPrice': f"{price:.8f}", 'lastQty': '1.00000000',
+        'bidPrice': f"{price * 0.999:.8f}", 'bidQty': '10.00000000',
+        'askPrice': f"{price * 1.001:.8f}", 'askQty': '10.00000000',
+        'openPrice': f"{price:.8f}", 'highPrice': f"{price * 1.05:.8f}", 'lowPrice': f"{price * 0.95:.8f}",
+        'volume': f"{rng.uniform(1e3, 1e7):.8f}", 'quoteVolume': f"{rng.uniform(1e4, 1e8):.8f}",
+        'openTime': 1700000000000, 'closeTime': 1700086400000,
+        'firstId': 1, 'lastId': 1000, 'count': 1000
+    }
+
+
+def make_payloads(universe, total_symbols, seed=7):
+    """Відповіді 5 бірж у реальних форматах: універсум + "шум" до total_symbols
+
+    Пари з котируванням не в USDT отримують ціну USD / курс котирування
+    (QUOTE_USD), а знімок - пари курсів BTCUSDT, USDCUSDT... для переводу.
+    Кожна біржа має свої ціни (PRICE_JITTER / DISLOCATION_RATE), курси
+    котирувань - спільні для всіх бірж.
+    """
+    rng = random.Random(seed)
+    markets = [split_symbol(p) for p in universe]
+    refs = [(q, USD_QUOTE) for q in QUOTE_USD if q != USD_QUOTE and any(m[1] == q for m in markets)]
+    markets += [m for m in refs if m not in markets]
+    markets += [(f"NOISE{i}", USD_QUOTE) for i in range(max(0, total_symbols - len(markets)))]
+    usd = {}
+    for base, _ in markets:
+        if base not in usd:
+            usd[base] = QUOTE_USD.get(base) or rng.uniform(0.0001, 1000)
+    fair = [usd[b] / QUOTE_USD[q] for b, q in markets]
+
+    def venue_prices():
+        prices = []
+        for (b, q), p in zip(markets, fair):
+            if b not in QUOTE_USD:
+                p *= 1 + rng.gauss(0, PRICE_JITTER)
+                if rng.random() < DISLOCATION_RATE:
+                    p *= 1 + rng.uniform(-DISLOCATION, DISLOCATION)
+            prices.append((b, q, p))
+        return prices
+
+    prices = venue_prices()
+    binance = [_binance_item(f"{b}{q}", p, rng) for b, q, p in prices]
+    prices = venue_prices()
+    mexc = [_binance_item(f"{b}{q}", p, rng) for b, q, p in prices]
+    prices = venue_prices()
+    bybit = {'retCode': 0, 'result': {'category': 'spot', 'list': [
+        {'symbol': f"{b}{q}", 'lastPrice': f"{p:.8f}", 'bid1Price': f"{p * 0.999:.8f}",
+         'bid1Size': '1', 'ask1Price': f"{p * 1.001:.8f}", 'ask1Size': '1',
+         'prevPrice24h': f"{p:.8f}", 'price24hPcnt': '0.01', 'highPrice24h': f"{p:.8f}",
+         'lowPrice24h': f"{p:.8f}", 'turnover24h': f"{rng.uniform(1e4, 1e8):.4f}",
+         'volume24h': f"{rng.uniform(1e3, 1e7):.4f}"}
+        for b, q, p in prices]}}
+    prices = venue_prices()
+    gate = [{'currency_pair': f"{b}_{q}", 'last': f"{p:.8f}", 'lowest_ask': f"{p * 1.001:.8f}",
+             'highest_bid': f"{p * 0.999:.8f}", 'change_percentage': '1.0',
+             'base_volume': f"{rng.uniform(1e3, 1e7):.4f}", 'quote_volume': f"{rng.uniform(1e4, 1e8):.4f}",
+             'high_24h': f"{p:.8f}", 'low_24h': f"{p:.8f}"}
+            for b, q, p in prices]
+    prices = venue_prices()
+    htx = {'status': 'ok', 'data': [
+        {'symbol': f"{b}{q}".lower(), 'open': p, 'high': p, 'low': p, 'close': p,
+         'amount': rng.uniform(1e3, 1e7), 'vol': rng.uniform(1e4, 1e8), 'count': 100,
+         'bid': p * 0.999, 'bidSize': 1.0, 'ask': p * 1.001, 'askSize': 1.0}
+        for b, q, p in prices]}
+
+    payloads = {'Binance': binance, 'Bybit': bybit, 'MEXC': mexc, 'Gate.io': gate, 'HTX': htx}
+    return {name: json.dumps(data).encode() for name, data in payloads.items()}
+
+
+def multi_quote_universe(universe_size):
+    """USDT пари + ті ж монети в інших котируваннях у частках QUOTE_MIX"""
+    universe = [f"COIN{i}{USD_QUOTE}" for i in range(universe_size)]
+    for quote, share in QUOTE_MIX.items():
+        universe += [f"COIN{i}{quote}" for i in range(int(universe_size * share))]
+    universe += [f"{quote}{USD_QUOTE}" for quote in QUOTE_MIX]
+    return universe
+
+
+# ==================== ЗАМІРИ ====================
+
+def _rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - КБ, macOS - байти
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def bench_decode(mode, universe_size, total_symbols, cycles):
+    """Розбір 5 відповідей у колонковий знімок: час та пам'ять за цикл"""
+    universe = [f"COIN{i}USDT" for i in range(universe_size)]
+    payloads = make_payloads(universe, total_symbols)
+    index = SymbolIndex(universe, EXCHANGES)
+
+    MarketSnapshot.from_payloads(payloads, index, mode=mode)  # прогрів
+    times = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        MarketSnapshot.from_payloads(payloads, index, mode=mode)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    snapshot = MarketSnapshot.from_payloads(payloads, index, mode=mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times.sort()
+    return {
+        'mode': mode,
+        'payload_mb': sum(len(p) for p in payloads.values()) / 1024 / 1024,
+        'median_ms': times[len(times) // 2] * 1000,
+        'best_ms': times[0] * 1000,
+        'peak_alloc_mb': peak / 1024 / 1024,
+        'rss_mb': _rss_mb(),
+        'filled': int(snapshot.mask.sum())
+    }
+
+
+def bench_scan(universe_size, total_symbols, cycles):
+    """Сканування (розбір + find_opportunities): USDT універсум vs мультикотирувальний
+
+    Обидва - на тих самих відповідях бірж (в них є всі котирування),
+    тож різниця - ціна додаткових пар і переводу ніг у USD.
+    """
+    universe = multi_quote_universe(universe_size)
+    payloads = make_payloads(universe, total_symbols)
+    usdt = [p for p in universe if split_symbol(p)[1] == USD_QUOTE and p[:-len(USD_QUOTE)] not in QUOTE_USD]
+    runs = {'USDT': SymbolIndex(usdt, EXCHANGES), 'multi': SymbolIndex(universe, EXCHANGES)}
+    times = {name: ([], []) for name in runs}
+    found = {}
+    # Цикли чергуються між універсумами - дрейф машини діє на обидва однаково
+    for cycle in range(cycles + 1):
+        for name, index in runs.items():
+            start = time.perf_counter()
+            snapshot = MarketSnapshot.from_payloads(payloads, index)
+            decoded = time.perf_counter()
+            found[name], _ = find_opportunities(snapshot, max_age=None, scales=ScaleCache())
+            if cycle:   # перший цикл - прогрів
+                times[name][0].append(decoded - start)
+                times[name][1].append(time.perf_counter() - decoded)
+
+    def median_ms(values):
+        return sorted(values)[len(values) // 2] * 1000
+
+    return [{
+        'universe': name,
+        'pairs': len(index),
+        'quotes': len(index.quote_assets),
+        'decode_ms': median_ms(times[name][0]),
+        'scan_ms': median_ms(times[name][1]),
+        'total_ms': median_ms([d + s for d, s in zip(*times[name])]),
+        'opportunities': len(found[name])
+    } for name, index in runs.items()]
+
+
+def run_isolated(mode, args):
+    """Кожен режим в окремому процесі - щоб пікова RSS не змішувалась"""
+    command = [sys.executable, __file__, '--child', mode,
+               '--universe', str(args.universe), '--symbols', str(args.symbols),
+               '--cycles', str(args.cycles)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки розбору відповідей бірж і сканування")
+    parser.add_argument('--universe', type=int, default=756, help="пар в універсумі")
+    parser.add_argument('--symbols', type=int, default=3000, help="символів у відповіді біржі")
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--scan', action='store_true',
+                        help="сканування USDT vs мультикотирувального універсуму")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="допустимий час мультикотирувального циклу відносно USDT "
+                             "(за замовчуванням - SCAN_BUDGETS режиму розбору)")
+    parser.add_argument('--child', choices=DECODE_MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scan:
+        print("=" * 80)
+        print(f"🧪 СКАНУВАННЯ: {args.symbols} символів × 5 бірж, {args.universe} USDT пар + "
+              + ", ".join(f"{q} {share:.0%}" for q, share in QUOTE_MIX.items()))
+        print(f"   режим розбору: {DECODE_MODE} (SOLIPSIST_DECODE)")
+        print("=" * 80)
+        print(f"{'УНІВЕРСУМ':<10} {'ПАР':>6} {'КОТИР.':>7} {'РОЗБІР, МС':>11} {'СКАН, МС':>9} "
+              f"{'РАЗОМ, МС':>10} {'МОЖЛИВ.':>8}")
+        results = bench_scan(args.universe, args.symbols, args.cycles)
+        for r in results:
+            print(f"{r['universe']:<10} {r['pairs']:>6} {r['quotes']:>7} {r['decode_ms']:>11.2f} "
+                  f"{r['scan_ms']:>9.2f} {r['total_ms']:>10.2f} {r['opportunities']:>8}")
+        base, multi = results
+        budget = args.budget if args.budget is not None else SCAN_BUDGETS[DECODE_MODE]
+        ratio = multi['total_ms'] / base['total_ms']
+        print(f"\n   пар: {multi['pairs'] / base['pairs']:.2f}×, "
+              f"розбір: {multi['decode_ms'] / base['decode_ms']:.2f}×, "
+              f"сканування без розбору: {multi['scan_ms'] / base['scan_ms']:.2f}×")
+        if ratio > budget:
+            print(f"❌ понад бюджет: {ratio:.2f}× від USDT циклу (бюджет {DECODE_MODE}: {budget:.2f}×)")
+            sys.exit(1)
+        print(f"✅ в бюджеті: {ratio:.2f}× від USDT циклу (бюджет {DECODE_MODE}: {budget:.2f}×)")
+        return
+
+    if args.child:
+        print(json.dumps(bench_decode(args.child, args.universe, args.symbols, args.cycles)))
+        return
+
+    print("=" * 80)
+    print(f"🧪 РОЗБІР ВІДПОВІДЕЙ: {args.symbols} символів × 5 бірж → {args.universe} пар")
+    print(f"   orjson: {'так' if ORJSON_AVAILABLE else 'ні (режим orjson = json)'}")
+    print("=" * 80)
+    print(f"{'РЕЖИМ':<8} {'MB':>7} {'МЕДІАНА, МС':>12} {'КРАЩИЙ, МС':>11} {'ПІК АЛОК, MB':>13} {'RSS, MB':>8} {'КОМІРОК':>8}")
+    for mode in DECODE_MODES:
+        r = run_isolated(mode, args)
+        rss = f"{r['rss_mb']:.1f}" if r['rss_mb'] is not None else '-'
+        print(f"{r['mode']:<8} {r['payload_mb']:>7.2f} {r['median_ms']:>12.2f} {r['best_ms']:>11.2f} "
+              f"{r['peak_alloc_mb']:>13.2f} {rss:>8} {r['filled']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# src/python/depth_check.py - перевірка арбітражу по стакану (L2)
+import threading
+import time
+
+from ingestion import get_engine
+from symbols import native_symbol, split_symbol
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+DEPTH_TTL = 3              # секунд, скільки стакан вважається свіжим
+DEPTH_LEVELS = 20          # рівнів стакану з кожного боку
+DEFAULT_TOP_N = 20         # скільки кращих кандидатів перевіряти
+DEFAULT_NOTIONAL = 1000    # USD на угоду
+
+# ==================== ЕНДПОІНТИ СТАКАНІВ ====================
+
+def _binance_request(symbol):
+    return "https://api.binance.com/api/v3/depth", {'symbol': symbol, 'limit': DEPTH_LEVELS}
+
+def _bybit_request(symbol):
+    return "https://api.bybit.com/v5/market/orderbook", {'category': 'spot', 'symbol': symbol, 'limit': DEPTH_LEVELS}
+
+def _mexc_request(symbol):
+    return "https://api.mexc.com/api/v3/depth", {'symbol': symbol, 'limit': DEPTH_LEVELS}
+
+def _gateio_request(symbol):
+    return "https://api.gateio.ws/api/v4/spot/order_book", {'currency_pair': symbol, 'limit': DEPTH_LEVELS}
+
+def _htx_request(symbol):
+    return "https://api.huobi.pro/market/depth", {'symbol': symbol.lower(), 'type': 'step0', 'depth': DEPTH_LEVELS}
+
+def _okx_request(symbol):
+    return "https://www.okx.com/api/v5/market/books", {'instId': symbol, 'sz': DEPTH_LEVELS}
+
+def _kucoin_request(symbol):
+    return "https://api.kucoin.com/api/v1/market/orderbook/level2_20", {'symbol': symbol}
+
+def _bitget_request(symbol):
+    return "https://api.bitget.com/api/v2/spot/market/orderbook", {'symbol': symbol, 'limit': DEPTH_LEVELS}
+
+def _kraken_request(symbol):
+    return "https://api.kraken.com/0/public/Depth", {'pair': symbol, 'count': DEPTH_LEVELS}
+
+def _levels(rows):
+    return [(float(row[0]), float(row[1])) for row in rows]
+
+def _parse_plain(data):
+    return _levels(data['bids']), _levels(data['asks'])
+
+def _parse_bybit(data):
+    book = data['result']
+    return _levels(book['b']), _levels(book['a'])
+
+def _parse_htx(data):
+    book = data['tick']
+    return _levels(book['bids']), _levels(book['asks'])
+
+def _parse_okx(data):
+    book = data['data'][0]
+    return _levels(book['bids']), _levels(book['asks'])
+
+def _parse_data(data):
+    return _parse_plain(data['data'])
+
+def _parse_kraken(data):
+    book = next(iter(data['result'].values()))
+    return _levels(book['bids']), _levels(book['asks'])
+
+DEPTH_SOURCES = {
+    'Binance': (_binance_request, _parse_plain),
+    'Bybit': (_bybit_request, _parse_bybit),
+    'MEXC': (_mexc_request, _parse_plain),
+    'Gate.io': (_gateio_request, _parse_plain),
+    'HTX': (_htx_request, _parse_htx),
+    'OKX': (_okx_request, _parse_okx),
+    'KuCoin': (_kucoin_request, _parse_data),
+    'Bitget': (_bitget_request, _parse_data),
+    'Kraken': (_kraken_request, _parse_kraken),
+}
+
+# ==================== КЕШ СТАКАНІВ ====================
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def fetch_books(keys, ttl=DEPTH_TTL):
+    """Стакани для [(exchange, symbol)]: свіжі з кешу, решта - паралельно
+
+    Повертає {(exchange, symbol): (bids, asks)}; недоступні стакани пропускаються.
+    """
+    now = time.time()
+    books = {}
+    missing = []
+    with _books_lock:
+        for key in set(keys):
+            cached = _books.get(key)
+            if cached and now - cached[0] < ttl:
+                books[key] = cached[1]
+            elif key[0] in DEPTH_SOURCES:
+                missing.append(key)
+
+    if missing:
+        jobs = {}
+        for exchange, symbol in missing:
+            url, params = DEPTH_SOURCES[exchange][0](symbol)
+            jobs[(exchange, symbol)] = (exchange, url, params)
+        try:
+            payloads = get_engine().fetch_many(jobs)
+        except Exception:
+            payloads = {}
+
+        fetched_at = time.time()
+        with _books_lock:
+            for key, data in payloads.items():
+                if isinstance(data, Exception):
+                    continue
+                try:
+                    book = DEPTH_SOURCES[key[0]][1](data)
+                except (KeyError, TypeError, ValueError, IndexError):
+                    continue
+                _books[key] = (fetched_at, book)
+                books[key] = book
+    return books
+
+
+# ==================== ВИКОНУВАНИЙ СПРЕД ====================
+
+def buy_with_quote(asks, notional):
+    """Купити на notional USD по asks → (кількість, середня ціна, чи вистачило глибини)"""
+    spent = qty = 0.0
+    for price, size in asks:
+        if price <= 0:
+            continue
+        take = min(size, (notional - spent) / price)
+        qty += take
+        spent += take * price
+        if spent >= notional * (1 - 1e-9):
+            return qty, spent / qty, True
+    return qty, (spent / qty if qty else 0.0), False
+
+
+def sell_quantity(bids, qty):
+    """Продати qty по bids → (виручка, середня ціна, чи вистачило глибини)"""
+    left = qty
+    proceeds = 0.0
+    for price, size in bids:
+        take = min(size, left)
+        proceeds += take * price
+        left -= take
+        if left <= qty * 1e-9:
+            return proceeds, proceeds / qty, True
+    sold = qty - left
+    return proceeds, (proceeds / sold if sold else 0.0), False
+
+
+def executable_spread(buy_book, sell_book, notional, buy_rate=1.0, sell_rate=1.0):
+    """Спред, який реально можна взяти на notional USD (купівля по asks, продаж по bids)
+
+    buy_rate / sell_rate - USD за одиницю котирування кожної ноги: стакани
+    в котируваннях своїх пар, ціни в результаті - в USD.
+    """
+    qty, buy_price, buy_full = buy_with_quote(buy_book[1], notional / buy_rate)
+    if qty <= 0:
+        return None
+    proceeds, sell_price, sell_full = sell_quantity(sell_book[0], qty)
+    cost = qty * buy_price * buy_rate
+    proceeds *= sell_rate
+    return {
+        'executable_spread': (proceeds - cost) / cost * 100 if cost else 0.0,
+        'executable_buy_price': buy_price * buy_rate,
+        'executable_sell_price': sell_price * sell_rate,
+        'depth_filled': buy_full and sell_full
+    }
+
+
+def verify_opportunities(opportunities, top_n=DEFAULT_TOP_N, notional=DEFAULT_NOTIONAL, ttl=DEPTH_TTL):
+    """Друга фаза: стакани тільки для top_n кандидатів з екрана тікерів
+
+    Повертає новий список; перевірені можливості отримують поля
+    executable_spread / executable_buy_price / executable_sell_price /
+    depth_filled / notional (None якщо стакан недоступний).
+    notional - у USD; ноги можуть бути в різних котируваннях (buy_pair /
+    sell_pair), стакан кожної проходиться в її котируванні курсами
+    buy_rate / sell_rate можливості.
+    """
+    candidates = opportunities[:top_n]
+    legs = []
+    for opp in candidates:
+        buy_parts = split_symbol(opp.get('buy_pair', opp['pair']))
+        sell_parts = split_symbol(opp.get('sell_pair', opp['pair']))
+        if buy_parts is None or sell_parts is None:
+            legs.append(None)
+            continue
+        legs.append(((opp['buy'], native_symbol(opp['buy'], *buy_parts)),
+                     (opp['sell'], native_symbol(opp['sell'], *sell_parts))))
+
+    books = fetch_books([key for pair in legs if pair for key in pair], ttl)
+
+    verified = []
+    for opp, pair in zip(candidates, legs):
+        opp = dict(opp, notional=notional, executable_spread=None, depth_filled=False)
+        buy_rate = opp.get('buy_rate') or 1.0
+        sell_rate = opp.get('sell_rate') or 1.0
+        if (pair and pair[0] in books and pair[1] in books
+                and buy_rate == buy_rate and sell_rate == sell_rate):
+            result = executable_spread(books[pair[0]], books[pair[1]], notional,
+                                       buy_rate, sell_rate)
+            if result:
+                opp.update(result)
+        verified.append(opp)
+
+    return verified + list(opportunities[top_n:])
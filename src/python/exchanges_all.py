@@ -1,163 +1,326 @@
-import requests
+import asyncio
 import time
+import threading
+from fast_decode import loads
+from ingestion import get_engine
+from scheduler import get_scheduler, request_weight, DEFAULT_LIMIT
+from venues import VENUES, batch_requests, enabled_venues, iter_tickers, merge_payloads, parse_tickers
 
-# ==================== ФУНКЦІЇ БЕЗ ОБ'ЄМІВ (ШВИДКІ) ====================
+# ==================== ЕНДПОІНТИ ====================
 
-def get_all_binance_fast():
-    """Всі пари Binance (швидко, тільки ціни)"""
-    try:
-        url = "https://api.binance.com/api/v3/ticker/price"
-        data = requests.get(url, timeout=10).json()
-        return {item['symbol']: float(item['price']) for item in data}
-    except:
-        return {}
-
-def get_all_bybit_fast():
-    """Всі пари Bybit (швидко)"""
-    try:
-        url = "https://api.bybit.com/v5/market/tickers?category=spot"
-        data = requests.get(url, timeout=10).json()
-        return {item['symbol']: float(item['lastPrice']) 
-                for item in data['result']['list']}
-    except:
-        return {}
-
-def get_all_mexc_fast():
-    """Всі пари MEXC (швидко)"""
-    try:
-        url = "https://api.mexc.com/api/v3/ticker/price"
-        data = requests.get(url, timeout=10).json()
-        return {item['symbol']: float(item['price']) for item in data}
-    except:
-        return {}
-
-def get_all_gateio_fast():
-    """Всі пари Gate.io (швидко)"""
-    try:
-        url = "https://api.gateio.ws/api/v4/spot/tickers"
-        data = requests.get(url, timeout=10).json()
-        return {item['currency_pair']: float(item['last']) for item in data}
-    except:
-        return {}
-
-def get_all_htx_fast():
-    """Всі пари HTX (швидко)"""
-    try:
-        url = "https://api.huobi.pro/market/tickers"
-        data = requests.get(url, timeout=10).json()
-        return {item['symbol'].upper(): float(item['close']) 
-                for item in data['data']}
-    except:
-        return {}
+# Один ендпоінт на біржу: з нього беруться і ціни, і об'єми.
+# Опис бірж - у venues.py; тут тільки активні (SOLIPSIST_VENUES)
+VENUE_URLS = {name: VENUES[name]['url'] for name in enabled_venues()}
 
-# ==================== ФУНКЦІЇ З ОБ'ЄМАМИ ====================
+# Скільки секунд знімок біржі вважається актуальним (один цикл сканування)
+SNAPSHOT_TTL = 5
 
-def get_all_binance_with_volume():
-    """Всі пари Binance з об'ємами"""
-    try:
-        url = "https://api.binance.com/api/v3/ticker/24hr"
-        data = requests.get(url, timeout=10).json()
-        
-        result = {}
-        for item in data:
-            result[item['symbol']] = {
-                'price': float(item['lastPrice']),
-                'volume': float(item['volume']),  # USDT об'єм
-                'quoteVolume': float(item['quoteVolume'])
-            }
-        return result
-    except:
-        return {}
+# Окремий TTL для біржі (якщо відрізняється від SNAPSHOT_TTL)
+VENUE_TTL = {}
 
-def get_all_bybit_with_volume():
-    """Всі пари Bybit з об'ємами"""
-    try:
-        url = "https://api.bybit.com/v5/market/tickers?category=spot"
-        data = requests.get(url, timeout=10).json()
-        
-        result = {}
-        for item in data['result']['list']:
-            result[item['symbol']] = {
-                'price': float(item['lastPrice']),
-                'volume24h': float(item['volume24h']),
-                'turnover24h': float(item['turnover24h'])
-            }
-        return result
-    except:
-        return {}
+# Після помилок старі дані біржі ще віддаються, але не довше
+MAX_STALE = 60
 
-def get_all_mexc_with_volume():
-    """Всі пари MEXC з об'ємами"""
-    try:
-        url = "https://api.mexc.com/api/v3/ticker/24hr"
-        data = requests.get(url, timeout=10).json()
-        
-        result = {}
-        for item in data:
-            result[item['symbol']] = {
-                'price': float(item['lastPrice']),
-                'volume': float(item['volume']),
-                'quoteVolume': float(item['quoteVolume'])
-            }
-        return result
-    except:
-        return {}
+# Верхня межа одного циклу завантаження: повільна біржа не тримає решту
+# (вона отримує TimeoutError і віддає старі дані до MAX_STALE)
+SCAN_DEADLINE = 6
 
-def get_all_gateio_with_volume():
-    """Всі пари Gate.io з об'ємами"""
-    try:
-        url = "https://api.gateio.ws/api/v4/spot/tickers"
-        data = requests.get(url, timeout=10).json()
-        
-        result = {}
-        for item in data:
-            symbol = item['currency_pair']
-            result[symbol] = {
-                'price': float(item['last']),
-                'base_volume': float(item['base_volume']),
-                'quote_volume': float(item['quote_volume'])  # USDT об'єм
-            }
-        return result
-    except:
-        return {}
+# ==================== ПЛАН ЗАВАНТАЖЕННЯ ====================
+# Біржі з фільтром символів (venues.py: batch) можуть віддавати тікери
+# тільки універсуму. Що дешевше - фільтр чи повний дамп - вирішує оцінка
+# вартості з виміряних розміру відповіді, затримки та ваги запитів.
+
+PARSE_SECONDS_PER_MB = 0.02   # розбір відповіді (benchmark.py, режим json)
+WEIGHT_PENALTY = 2.0          # секунд "вартості" за весь бюджет ваги біржі
+PROBE_EVERY = 20              # циклів між перевірками невибраного режиму
+LISTED_TTL = 600              # секунд, скільки довіряти списку символів біржі
+EWMA_ALPHA = 0.3
+
+_plans = {
+    name: {'mode': 'full', 'cycles': 0, 'stats': {}, 'listed': None, 'listed_at': 0}
+    for name in VENUE_URLS
+}
+
+def _mode_cost(name, mode):
+    """Оцінка вартості циклу в секундах (None - режим ще не виміряний)"""
+    stats = _plans[name]['stats'].get(mode)
+    if stats is None:
+        return None
+    limit = get_scheduler().limits.get(name, DEFAULT_LIMIT)
+    return (stats['latency'] + stats['bytes'] / 1e6 * PARSE_SECONDS_PER_MB
+            + WEIGHT_PENALTY * stats['weight'] / limit['capacity'])
+
+def _plan_requests(name, universe):
+    """(режим, [(url, params)]) для біржі на цей цикл"""
+    full = ('full', [(VENUE_URLS[name], None)])
+    plan = _plans[name]
+    if universe is None or 'batch' not in VENUES[name] or plan['listed'] is None:
+        return full
+    if time.time() - plan['listed_at'] > LISTED_TTL:
+        return full
+    
+    # Тільки символи, що є на біржі: невідомий символ ламає весь запит
+    symbols = [symbol for symbol in universe if symbol in plan['listed']]
+    if not symbols:
+        return full
+    batch = ('batch', batch_requests(name, symbols))
+    
+    plan['cycles'] += 1
+    full_cost, batch_cost = _mode_cost(name, 'full'), _mode_cost(name, 'batch')
+    if batch_cost is None:
+        return batch
+    mode = 'batch' if full_cost is None or batch_cost < full_cost else 'full'
+    if plan['cycles'] % PROBE_EVERY == 0:
+        mode = 'full' if mode == 'batch' else 'batch'
+    return batch if mode == 'batch' else full
+
+def _record_plan(name, mode, requests, payload, elapsed):
+    plan = _plans[name]
+    weight = sum(request_weight(name, url, params) for url, params in requests)
+    sample = {'latency': elapsed, 'bytes': len(payload), 'weight': weight}
+    stats = plan['stats'].get(mode)
+    if stats is None:
+        plan['stats'][mode] = sample
+    else:
+        for key, value in sample.items():
+            stats[key] += EWMA_ALPHA * (value - stats[key])
+    plan['mode'] = mode
+    
+    if mode == 'full' and 'batch' in VENUES[name] and time.time() - plan['listed_at'] > LISTED_TTL / 2:
+        plan['listed'] = {symbol for symbol, _ in iter_tickers(name, loads(payload))}
+        plan['listed_at'] = time.time()
+
+# ==================== ЗНІМОК РИНКУ ====================
+
+_venues = {
+    name: {'payload': None, 'data': None, 'fetched_at': 0, 'last_error': None,
+           'error_at': 0, 'scope': None, 'decode_error': None}
+    for name in VENUE_URLS
+}
+_snapshot_lock = threading.Lock()
+
+async def _fetch_venue(name, requests):
+    """Всі запити біржі паралельно → (одна відповідь, секунд)"""
+    engine = get_engine()
+    start = time.monotonic()
+    bodies = await asyncio.gather(
+        *(engine.fetch_json(name, url, params, raw=True) for url, params in requests))
+    return merge_payloads(name, bodies), time.monotonic() - start
+
+async def _fetch_venues(plans):
+    # Корутини бірж створюються вже в loop: якщо збір не запустився,
+    # закривати нічого, а запущений скасовує їх сам (gather_calls)
+    return await get_engine().gather_calls(
+        {name: _fetch_venue(name, requests) for name, requests in plans.items()},
+        deadline=SCAN_DEADLINE)
+
+def _fetch_payloads(plans):
+    """Біржі одночасно (asyncio), кожна через свій пул
 
-def get_all_htx_with_volume():
-    """Всі пари HTX з об'ємами"""
+    plans - {exchange: [(url, params)]}. Повертає {exchange: (bytes, секунд)} -
+    розбір робить споживач (fast_decode); для біржі з помилкою - виняток.
+    """
+    engine = get_engine()
     try:
-        url = "https://api.huobi.pro/market/tickers"
-        data = requests.get(url, timeout=10).json()
+        return engine.run(_fetch_venues(plans), timeout=engine.timeout + 5)
+    except Exception as e:
+        return {name: e for name in plans}
+
+def _venue_ttl(name, max_age):
+    return VENUE_TTL.get(name, SNAPSHOT_TTL) if max_age is None else max_age
+
+def _covers(venue, scope):
+    """Кеш біржі містить потрібні символи (повний дамп містить усі)"""
+    return venue['scope'] is None or (scope is not None and scope <= venue['scope'])
+
+def _refresh_locked(names, max_age, universe=None):
+    """Завантажити тільки біржі з простроченим кешем
+
+    universe - {exchange: [символи]}: для бірж з фільтром символів
+    достатньо відповіді тільки по цих символах.
+    """
+    universe = universe or {}
+    now = time.time()
+    scopes = {name: frozenset(universe[name]) if name in universe else None for name in names}
+    expired = [name for name in names
+               if _venues[name]['payload'] is None
+               or now - _venues[name]['fetched_at'] >= _venue_ttl(name, max_age)
+               or not _covers(_venues[name], scopes[name])]
+    if not expired:
+        return
+    
+    plans = {name: _plan_requests(name, universe.get(name)) for name in expired}
+    results = _fetch_payloads({name: requests for name, (_, requests) in plans.items()})
+    _store_locked(plans, results, scopes)
+
+def _store_locked(plans, results, scopes, started=None):
+    """Записати результати завантаження в кеш (під _snapshot_lock)
+
+    started - коли почалось завантаження поза блокуванням: біржі, які
+    тим часом отримали повний дамп від сканування, не перезаписуються
+    старішою відповіддю.
+    """
+    now = time.time()
+    for name, (mode, requests) in plans.items():
+        venue = _venues[name]
+        if started is not None and venue['fetched_at'] >= started and venue['scope'] is None:
+            continue
+        result = results.get(name)
+        if isinstance(result, tuple):
+            payload, elapsed = result
+            _record_plan(name, mode, requests, payload, elapsed)
+            venue.update(payload=payload, data=None, fetched_at=now, last_error=None, decode_error=None,
+                         scope=scopes.get(name) if mode == 'batch' else None)
+            continue
         
+        # Помилка: залишаємо попередні дані, поки вони не старші MAX_STALE
+        venue['last_error'] = str(result) if result is not None else 'no response'
+        venue['error_at'] = now
+        if venue['payload'] is not None and now - venue['fetched_at'] > MAX_STALE:
+            venue.update(payload=None, data=None)
+
+def get_payloads(max_age=None, exchanges=None, universe=None):
+    """Сирі відповіді (bytes) бірж з кешу; прострочені біржі оновлюються
+
+    universe - {exchange: [нативні символи]}: біржам з фільтром символів
+    можна віддати тільки їх (якщо це дешевше за повний дамп).
+    Повертає ({exchange: bytes або None}, {exchange: час отримання}).
+    Паралельні виклики чекають на одне завантаження і отримують спільний результат.
+    """
+    names = [name for name in (exchanges or VENUE_URLS) if name in VENUE_URLS]
+    with _snapshot_lock:
+        _refresh_locked(names, max_age, universe)
+        return ({name: _venues[name]['payload'] for name in names},
+                {name: _venues[name]['fetched_at'] for name in names})
+
+def get_snapshot(max_age=None):
+    """Розібрані дані всіх бірж (парсинг раз на кожне оновлення біржі)"""
+    with _snapshot_lock:
+        _refresh_locked(list(VENUE_URLS), max_age)
         result = {}
-        for item in data['data']:
-            symbol = item['symbol'].upper()
-            result[symbol] = {
-                'price': float(item['close']),
-                'amount': float(item['amount']),
-                'vol': float(item['vol'])  # USDT об'єм
-            }
+        for name, venue in _venues.items():
+            if venue['data'] is None and venue['payload'] is not None:
+                try:
+                    venue['data'] = parse_tickers(name, loads(venue['payload']))
+                except Exception as e:
+                    venue['last_error'] = f"parse: {e}"
+                    venue['data'] = {}
+            result[name] = venue['data'] or {}
         return result
-    except:
-        return {}
+
+def get_listings(max_age=LISTED_TTL):
+    """Символи кожної біржі для побудови універсуму (зі спільного знімка)
+
+    Береться повний дамп з кешу або список символів з плану (біржі, що
+    зараз працюють з фільтром). Під блокуванням - тільки копіювання
+    посилань; розбір іде після, тож сканування на нього не чекають.
+    Мережа - лише для бірж без даних новіших за max_age (холодний старт),
+    і теж поза блокуванням: результат підміняється в кеш під ним.
+    Повертає {exchange: [символи]}; біржі без даних відсутні.
+    """
+    now = time.time()
+    with _snapshot_lock:
+        missing = [name for name in VENUE_URLS if not _listing_usable(name, now, max_age)]
+    if missing:
+        # Повні дампи - поза блокуванням: сканування не чекають на перебудову
+        plans = {name: ('full', [(VENUE_URLS[name], None)]) for name in missing}
+        results = _fetch_payloads({name: requests for name, (_, requests) in plans.items()})
+        with _snapshot_lock:
+            _store_locked(plans, results, {}, started=now)
+
+    with _snapshot_lock:
+        sources = {}
+        for name, venue in _venues.items():
+            if venue['payload'] is not None and venue['scope'] is None:
+                sources[name] = venue['data'] if venue['data'] is not None else venue['payload']
+            elif _plans[name]['listed'] is not None:
+                sources[name] = _plans[name]['listed']
+
+    listings = {}
+    for name, source in sources.items():
+        try:
+            if isinstance(source, bytes):
+                source = parse_tickers(name, loads(source))
+            listings[name] = list(source)
+        except Exception as e:
+            with _snapshot_lock:
+                _venues[name]['last_error'] = f"parse: {e}"
+                _venues[name]['error_at'] = time.time()
+    return listings
+
+def _listing_usable(name, now, max_age):
+    """Є повний дамп або список символів біржі, новіший за max_age"""
+    venue, plan = _venues[name], _plans[name]
+    full = (venue['payload'] is not None and venue['scope'] is None
+            and now - venue['fetched_at'] < max_age)
+    return full or (plan['listed'] is not None and now - plan['listed_at'] < max_age)
+
+def record_decode(name, error):
+    """Результат розбору відповіді біржі в знімок (error=None - успішно)
+
+    Помилка розбору не губиться: вона стає last_error біржі і видна в /health.
+    """
+    message = f"decode: {error}" if error is not None else None
+    with _snapshot_lock:
+        venue = _venues.get(name)
+        if venue is None or venue['decode_error'] == message:
+            return
+        venue['decode_error'] = message
+        if message is not None:
+            venue['last_error'] = message
+            venue['error_at'] = time.time()
+
+def get_venue_status():
+    """Стан кешу кожної біржі: вік даних, TTL, остання помилка, затримки"""
+    now = time.time()
+    engine = get_engine()
+    return {
+        name: {
+            'age': round(now - venue['fetched_at'], 3) if venue['fetched_at'] else None,
+            'ttl': VENUE_TTL.get(name, SNAPSHOT_TTL),
+            'available': venue['payload'] is not None,
+            'last_error': venue['last_error'],
+            'error_age': round(now - venue['error_at'], 3) if venue['last_error'] else None,
+            'decoded': venue['payload'] is not None and venue['decode_error'] is None,
+            'fetch_mode': _plans[name]['mode'],
+            'bytes': len(venue['payload']) if venue['payload'] is not None else 0,
+            'latency': engine.health(name).get_status()
+        }
+        for name, venue in _venues.items()
+    }
+
+def to_fast_view(data):
+    """Ціновий вигляд {symbol: price} з розібраних даних біржі"""
+    return {symbol: item['price'] for symbol, item in data.items()}
+
+def fetch_all_fast():
+    """Всі біржі, тільки ціни (зі спільного знімка)"""
+    return {name: to_fast_view(data) for name, data in get_snapshot().items()}
+
+def fetch_all_with_volume():
+    """Всі біржі з об'ємами (зі спільного знімка)"""
+    return dict(get_snapshot())
+
+def _venue_fast(exchange):
+    return to_fast_view(get_snapshot().get(exchange, {}))
+
+def _venue_with_volume(exchange):
+    return get_snapshot().get(exchange, {})
+
+def _venue_getter(getter, exchange):
+    def get():
+        return getter(exchange)
+    get.__name__ = f"get_{exchange.lower().replace('.', '')}"
+    get.__doc__ = f"Всі пари {exchange} (зі спільного знімка)"
+    return get
 
 # ==================== СЛОВНИКИ ====================
 
-# Тільки 5 працюючих бірж (ШВИДКІ версії - без об'ємів)
-ALL_EXCHANGES_FAST = {
-    'Binance': get_all_binance_fast,
-    'Bybit': get_all_bybit_fast,
-    'MEXC': get_all_mexc_fast,
-    'Gate.io': get_all_gateio_fast,
-    'HTX': get_all_htx_fast,
-}
+# Активні біржі (ШВИДКІ версії - без об'ємів)
+ALL_EXCHANGES_FAST = {name: _venue_getter(_venue_fast, name) for name in VENUE_URLS}
 
-# З об'ємами (повільніше)
-ALL_EXCHANGES_VOLUME = {
-    'Binance': get_all_binance_with_volume,
-    'Bybit': get_all_bybit_with_volume,
-    'MEXC': get_all_mexc_with_volume,
-    'Gate.io': get_all_gateio_with_volume,
-    'HTX': get_all_htx_with_volume,
-}
+# З об'ємами (той самий знімок)
+ALL_EXCHANGES_VOLUME = {name: _venue_getter(_venue_with_volume, name) for name in VENUE_URLS}
 
 # По замовчуванню використовуємо швидкі
-ALL_EXCHANGES = ALL_EXCHANGES_FAST
\ No newline at end of file
+ALL_EXCHANGES = ALL_EXCHANGES_FAST
@@ -0,0 +1,96 @@
+# src/python/fast_decode.py - швидкий розбір великих JSON відповідей бірж
+import json
+import os
+import re
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# ==================== РЕЖИМИ ====================
+# json  - стандартний json.loads (за замовчуванням)
+# orjson - orjson.loads, якщо бібліотека встановлена (інакше json)
+# scan  - фільтрований розбір bytes: тільки потрібні символи та поля,
+#         без проміжних словників
+
+DECODE_MODES = ('json', 'orjson', 'scan')
+DECODE_MODE = os.environ.get('SOLIPSIST_DECODE', 'json')
+if DECODE_MODE not in DECODE_MODES:
+    DECODE_MODE = 'json'
+
+
+def loads(raw):
+    """bytes → Python об'єкт (orjson якщо є)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def decode(raw, mode=None):
+    """Розібрати відповідь у вибраному режимі (для scan повертає bytes як є)"""
+    mode = mode or DECODE_MODE
+    if not isinstance(raw, (bytes, bytearray)) or mode == 'scan':
+        return raw
+    if mode == 'orjson':
+        return loads(raw)
+    return json.loads(raw)
+
+
+# ==================== ФІЛЬТРОВАНИЙ РОЗБІР ====================
+
+_symbol_patterns = {}
+_field_patterns = {}
+
+
+def _symbol_pattern(field):
+    pattern = _symbol_patterns.get(field)
+    if pattern is None:
+        pattern = re.compile(rb'"' + field.encode() + rb'"\s*:\s*"([^"]+)"')
+        _symbol_patterns[field] = pattern
+    return pattern
+
+
+def _field_pattern(field):
+    # "field":"1.23" або "field":1.23 (null → порожнє значення)
+    pattern = _field_patterns.get(field)
+    if pattern is None:
+        pattern = re.compile(rb'"' + field.encode() + rb'"\s*:\s*"?([-+0-9.eE]*)')
+        _field_patterns[field] = pattern
+    return pattern
+
+
+def scan_records(raw, symbol_field, fields, lookup, upper=False):
+    """Знайти в bytes тікери з символами з lookup і витягнути тільки fields
+
+    Працює для відповідей, де кожен тікер - плаский JSON об'єкт
+    (Binance, MEXC, Bybit, Gate.io, HTX). Повертає [(pair_id, [float, ...]), ...];
+    відсутні / null поля = 0.0.
+    """
+    symbol_re = _symbol_pattern(symbol_field)
+    field_res = [_field_pattern(field) for field in fields]
+    records = []
+
+    for match in symbol_re.finditer(raw):
+        symbol = match.group(1).decode()
+        pair_id = lookup.get(symbol.upper() if upper else symbol)
+        if pair_id is None:
+            continue
+
+        # Межі плаского об'єкта навколо символу
+        start = raw.rfind(b'{', 0, match.start())
+        end = raw.find(b'}', match.end())
+        if start < 0 or end < 0:
+            continue
+
+        values = []
+        for field_re in field_res:
+            found = field_re.search(raw, start, end)
+            try:
+                values.append(float(found.group(1)) if found and found.group(1) else 0.0)
+            except ValueError:
+                values.append(0.0)
+        records.append((pair_id, values))
+    return records
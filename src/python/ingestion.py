@@ -0,0 +1,378 @@
+# src/python/ingestion.py - асинхронне отримання даних з бірж
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from replay import ReplayMiss, get_recorder, get_replayer
+from scheduler import get_scheduler, request_weight
+
+logger = logging.getLogger(__name__)
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+DEFAULT_TIMEOUT = 10          # секунд на один запит
+CONNECTIONS_PER_VENUE = 8     # розмір пулу з'єднань для однієї біржі
+KEEPALIVE_SECONDS = 60        # скільки тримати відкрите з'єднання без запитів
+
+# Хеджування: якщо відповіді немає довше p95 біржі - дублюємо запит
+LATENCY_WINDOW = 200          # останніх замірів на біржу
+HEDGE_MIN_SAMPLES = 20        # до цього - без хеджування (p95 ще не відомий)
+HEDGE_MIN_DELAY = 0.2         # секунд; раніше дублювати немає сенсу
+HEDGE_MAX_UTILIZATION = 0.7   # бюджет біржі завантажений сильніше - не дублюємо
+
+# Запобіжник: біржа з кількома помилками підряд пропускається на cool-down
+BREAKER_FAILURES = 3
+BREAKER_COOLDOWN = 30         # секунд, подвоюється при повторному збої
+BREAKER_MAX_COOLDOWN = 300
+
+
+class CircuitOpenError(Exception):
+    """Біржа тимчасово вимкнена запобіжником"""
+
+
+def _counts_as_failure(error):
+    """4xx на конкретний запит (невідомий символ тощо) - не проблема біржі
+
+    ReplayMiss - прогалина корпусу, а не збій біржі: запобіжник не рахує її.
+    """
+    if isinstance(error, ReplayMiss):
+        return False
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status in (418, 429)
+    return True
+
+
+def _replayed_error(url, status, headers):
+    """Записана відповідь з помилкою → такий самий виняток, як від мережі"""
+    info = aiohttp.RequestInfo(URL(url), 'GET', CIMultiDictProxy(CIMultiDict()))
+    return aiohttp.ClientResponseError(info, (), status=status, message='replay',
+                                       headers=CIMultiDictProxy(CIMultiDict(headers)))
+
+
+# ==================== СТАН БІРЖІ ====================
+
+class VenueHealth:
+    """Затримки (для p95) та запобіжник однієї біржі"""
+
+    def __init__(self, venue):
+        self.venue = venue
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.trips = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.last_error = None
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_after(self):
+        """Через скільки секунд дублювати запит (None - не дублювати)"""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.percentile(0.95))
+
+    def is_open(self, now=None):
+        return (now or time.monotonic()) < self.open_until
+
+    def success(self, latency):
+        self.latencies.append(latency)
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+
+    def deadline(self, latency):
+        """Запит скасовано дедлайном сканування: збій, а дедлайн - його затримка
+
+        Інакше біржа, завжди повільніша за дедлайн, не відкриває запобіжник
+        і не дає замірів для p95 - і кожне сканування чекає її до кінця.
+        """
+        self.latencies.append(latency)
+        self.failure(asyncio.TimeoutError(f"скасовано дедлайном через {latency:.1f} с"))
+
+    def failure(self, error):
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.failures >= BREAKER_FAILURES:
+            self.open_until = time.monotonic() + self.cooldown
+            self.trips += 1
+            logger.warning(f"Запобіжник: пропускаємо {self.venue} на {self.cooldown} с ({self.last_error})")
+            # Наступна спроба після cool-down - одна; збій знову відкриває довше
+            self.failures = BREAKER_FAILURES - 1
+            self.cooldown = min(BREAKER_MAX_COOLDOWN, self.cooldown * 2)
+
+    def get_status(self):
+        now = time.monotonic()
+        p50, p95, p99 = (self.percentile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            'samples': len(self.latencies),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'breaker_open': self.is_open(now),
+            'reopens_in': round(self.open_until - now, 1) if self.is_open(now) else None,
+            'trips': self.trips,
+            'last_error': self.last_error
+        }
+
+
+# ==================== ДВИГУН ====================
+
+class IngestionEngine:
+    """Асинхронний двигун запитів з постійним пулом з'єднань на кожну біржу
+
+    Event loop живе в окремому фоновому потоці, тому синхронний код
+    (Flask, консольні скрипти) може викликати fetch()/fetch_many()
+    без власного asyncio. TCP+TLS з'єднання перевикористовуються між циклами.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, connections_per_venue=CONNECTIONS_PER_VENUE):
+        self.timeout = timeout
+        self.connections_per_venue = connections_per_venue
+        self._loop = None
+        self._thread = None
+        self._sessions = {}
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Запустити фоновий event loop (один раз)"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='ingestion-loop',
+                    daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def _session(self, venue):
+        """Сесія біржі (створюється всередині event loop)"""
+        session = self._sessions.get(venue)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connections_per_venue,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._sessions[venue] = session
+        return session
+
+    def health(self, venue):
+        """Статистика затримок та запобіжник біржі"""
+        health = self._health.get(venue)
+        if health is None:
+            health = self._health.setdefault(venue, VenueHealth(venue))
+        return health
+
+    async def _attempt(self, venue, url, params, raw):
+        """Одна спроба запиту
+
+        Вага запиту резервується в планувальнику біржі; якщо бюджет
+        вичерпано - запит чекає, а не отримує 429. У режимі відтворення
+        відповідь береться з корпусу (replay.py) разом із записаним
+        статусом (429 / 5xx - той самий виняток), у режимі запису -
+        додатково пишеться в нього, включно з помилковими.
+        """
+        scheduler = get_scheduler()
+        replayer = get_replayer()
+        if replayer is not None:
+            entry = replayer.lookup(venue, url, params)
+            headers = entry.get('headers') or {}
+            scheduler.record_response(venue, entry['status'], headers)
+            if entry['status'] >= 400:
+                raise _replayed_error(url, entry['status'], headers)
+            body = entry['body'].encode('utf-8')
+            return body if raw else json.loads(body)
+        
+        delay = scheduler.reserve(venue, request_weight(venue, url, params))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        session = self._session(venue)
+        async with session.get(url, params=params) as response:
+            scheduler.record_response(venue, response.status, response.headers)
+            body = await response.read()
+            recorder = get_recorder()
+            if recorder is not None:
+                recorder.write(venue, url, params, response.status, body,
+                               scheduler.limit_headers(venue, response.headers))
+            response.raise_for_status()
+        return body if raw else json.loads(body)
+
+    async def fetch_json(self, venue, url, params=None, raw=False):
+        """Один GET запит через пул біржі (raw=True - тіло відповіді як bytes)
+
+        Якщо перша спроба триває довше p95 біржі, паралельно йде дубль -
+        повертається відповідь, що прийшла першою. Біржа з відкритим
+        запобіжником одразу дає CircuitOpenError; запит, скасований
+        дедлайном, рахується як збій (VenueHealth.deadline).
+        """
+        health = self.health(venue)
+        if health.is_open():
+            raise CircuitOpenError(f"{venue}: запобіжник відкрито ({health.last_error})")
+        
+        start = time.monotonic()
+        first = asyncio.ensure_future(self._attempt(venue, url, params, raw))
+        tasks = [first]
+        try:
+            hedge_after = health.hedge_after()
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done and get_scheduler().bucket(venue).utilization() < HEDGE_MAX_UTILIZATION:
+                    health.hedges += 1
+                    tasks.append(asyncio.ensure_future(self._attempt(venue, url, params, raw)))
+            
+            # Перша успішна відповідь; помилка - тільки якщо впали всі спроби
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            health.hedge_wins += 1
+                        health.success(time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            if _counts_as_failure(error):
+                health.failure(error)
+            raise error
+        except asyncio.CancelledError:
+            # Ззовні запит скасовує тільки дедлайн збору (gather_calls)
+            health.deadline(time.monotonic() - start)
+            raise
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def gather(self, jobs, raw=False, deadline=None):
+        """Паралельно виконати {name: (venue, url, params)}
+
+        Помилки не піднімаються - замість результату повертається виняток.
+        deadline (сек) обмежує весь збір: запити, що не встигли,
+        скасовуються і дають asyncio.TimeoutError.
+        """
+        return await self.gather_calls(
+            {name: self.fetch_json(*job, raw=raw) for name, job in jobs.items()}, deadline)
+
+    async def gather_calls(self, calls, deadline=None):
+        """Те саме для довільних корутин {name: coroutine}
+
+        Скасування самого збору (run не дочекався) скасовує і всі запити.
+        """
+        names = list(calls)
+        tasks = [asyncio.ensure_future(calls[name]) for name in names]
+        if not tasks:
+            return {}
+        try:
+            await asyncio.wait(tasks, timeout=deadline)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        results = {}
+        for name, task in zip(names, tasks):
+            if not task.done():
+                task.cancel()
+                results[name] = asyncio.TimeoutError(f"{name}: не встигла за {deadline} с")
+            else:
+                results[name] = task.exception() or task.result()
+        return results
+
+    def run(self, coro, timeout=None):
+        """Виконати корутину у фоновому loop і дочекатися результату
+
+        Якщо результату не дочекались (timeout, помилка), задача корутини
+        скасовується через loop - її запити завершуються в потоці loop.
+        """
+        try:
+            loop = self._ensure_loop()
+        except BaseException:
+            coro.close()   # не запланована - закривається тут
+            raise
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def submit(self, coro):
+        """Запустити корутину у фоновому loop без очікування (concurrent Future)"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    def fetch(self, venue, url, params=None):
+        """Синхронний GET (JSON)"""
+        return self.run(self.fetch_json(venue, url, params), timeout=self.timeout + 5)
+
+    def fetch_many(self, jobs, raw=False, deadline=None):
+        """Синхронно отримати всі запити одночасно"""
+        if not jobs:
+            return {}
+        return self.run(self.gather(jobs, raw, deadline), timeout=self.timeout + 5)
+
+    def get_status(self):
+        """Затримки, хеджування та запобіжники по біржах"""
+        return {venue: health.get_status() for venue, health in list(self._health.items())}
+
+    async def _close_sessions(self):
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+
+    def close(self):
+        """Закрити всі з'єднання та зупинити loop"""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_sessions(), loop).result(5)
+        except Exception as e:
+            logger.error(f"Помилка закриття сесій: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+        loop.close()
+
+
+# ==================== ГЛОБАЛЬНИЙ ЕКЗЕМПЛЯР ====================
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Отримати спільний двигун (один на процес)"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = IngestionEngine()
+            atexit.register(_engine.close)
+    return _engine
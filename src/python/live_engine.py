@@ -0,0 +1,501 @@
+# src/python/live_engine.py - інкрементальний арбітраж на потоці оновлень
+import heapq
+import logging
+import threading
+import time
+
+import numpy as np
+
+from exchanges_all import SNAPSHOT_TTL, VENUE_URLS
+from market_snapshot import MarketSnapshot, build_market_snapshot
+from opportunity_index import BASE_FILTERS, OpportunityIndex
+from price_consensus import count_reasons
+from spread_engine import MAX_QUOTE_AGE, evaluate_rows, group_rows
+from spread_history import get_history
+from spread_stats import get_spread_stats
+from ws_ingest import get_stream, start_stream
+
+logger = logging.getLogger(__name__)
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+POLL_INTERVAL = SNAPSHOT_TTL   # секунд між REST оновленнями бірж без живого потоку
+FLUSH_ROWS = 256               # змінених пар, після яких перерахунок не чекає читання
+INDEX_TTL = 1.0                # секунд, поки індекс запитів спільний (вік ніг у відповіді)
+
+
+# ==================== ІНДЕКСОВАНА КУПА ====================
+
+class OpportunityHeap:
+    """Max-купа пар за спредом з індексом позицій
+
+    set / remove - O(log n) для будь-якої пари, не тільки вершини;
+    top(n) - n кращих за O(n log n) без сортування всієї купи.
+    При рівному спреді вище пара з меншим ID (як stable sort у find_opportunities).
+    """
+
+    def __init__(self):
+        self.keys = []      # pair_id у порядку купи
+        self.spreads = {}   # pair_id → спред
+        self.pos = {}       # pair_id → позиція в keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.pos
+
+    def _above(self, a, b):
+        sa, sb = self.spreads[a], self.spreads[b]
+        return sa > sb or (sa == sb and a < b)
+
+    def _swap(self, i, j):
+        keys = self.keys
+        keys[i], keys[j] = keys[j], keys[i]
+        self.pos[keys[i]] = i
+        self.pos[keys[j]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if not self._above(self.keys[i], self.keys[parent]):
+                break
+            self._swap(i, parent)
+            i = parent
+        return i
+
+    def _sift_down(self, i):
+        n = len(self.keys)
+        while True:
+            best = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n and self._above(self.keys[child], self.keys[best]):
+                    best = child
+            if best == i:
+                return i
+            self._swap(i, best)
+            i = best
+
+    def _fix(self, i):
+        if self._sift_up(i) == i:
+            self._sift_down(i)
+
+    def set(self, key, spread):
+        """Додати пару або змінити її спред"""
+        self.spreads[key] = spread
+        i = self.pos.get(key)
+        if i is None:
+            i = len(self.keys)
+            self.keys.append(key)
+            self.pos[key] = i
+        self._fix(i)
+
+    def remove(self, key):
+        i = self.pos.pop(key, None)
+        if i is None:
+            return False
+        del self.spreads[key]
+        last = self.keys.pop()
+        if i < len(self.keys):
+            self.keys[i] = last
+            self.pos[last] = i
+            self._fix(i)
+        return True
+
+    def top(self, n=None):
+        """n кращих pair_id за спредом (None - повний рейтинг)"""
+        if n is None or n >= len(self.keys):
+            return sorted(self.keys, key=lambda key: (-self.spreads[key], key))
+        result = []
+        candidates = [(-self.spreads[self.keys[0]], self.keys[0], 0)] if self.keys and n > 0 else []
+        while candidates and len(result) < n:
+            _, key, i = heapq.heappop(candidates)
+            result.append(key)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self.keys):
+                    child_key = self.keys[child]
+                    heapq.heappush(candidates, (-self.spreads[child_key], child_key, child))
+        return result
+
+
+# ==================== ІНКРЕМЕНТАЛЬНИЙ ДВИГУН ====================
+
+# Поля evaluate_rows, що зберігаються для ніг можливості (порядок - як у legs)
+LEG_FIELDS = ('buy_idx', 'sell_idx', 'buy_row', 'sell_row', 'min_price', 'max_price',
+              'buy_volume', 'sell_volume', 'buy_rate', 'sell_rate', 'counts')
+
+class IncrementalEngine:
+    """Стан ринку та можливості, що перераховуються тільки для змінених пар
+
+    Стан - MarketSnapshot (pairs × exchanges), що оновлюється по комірках;
+    для змінених рядків викликається те саме ядро evaluate_rows, що й у
+    find_opportunities, тож результати збігаються з повним скануванням.
+    Пари, що проходять фільтри, лежать в OpportunityHeap.
+    Оновлення тільки записують комірки та позначають пари брудними;
+    перерахунок брудних пар - одним векторним проходом при читанні
+    (або коли їх накопичилось FLUSH_ROWS), бо ціна одного виклику NumPy
+    більша за ціну рядка. Застарівання ніг (max_age) перевіряється там
+    само: для кожної пари відомо, до якого моменту її результат актуальний.
+    """
+
+    def __init__(self, index, exchanges=None, max_age=MAX_QUOTE_AGE, **filters):
+        self.index = index
+        self.max_age = max_age
+        self.filters = filters
+        self.state = MarketSnapshot(index, exchanges)
+        self.heap = OpportunityHeap()
+        # pair_id представника монети → (buy, sell, buy_row, sell_row, buy_price, sell_price,
+        # buy_volume, sell_volume, buy_rate, sell_rate, exchanges)
+        self.legs = {}
+        self.suspicious = set()
+        # Спред і валідність кожного рядка (не тільки можливостей) - для SpreadStats
+        self.spreads = np.zeros(len(index))
+        self.valid = np.zeros(len(index), dtype=bool)
+        # Консенсус бірж: відкинуті ноги останнього перерахунку кожної пари
+        self.rejections = {}   # pair_id → [rejection]
+        self.rejected = np.zeros(len(index), dtype=bool)
+        self.valid_until = np.full(len(index), np.inf)
+        self.dirty = np.zeros(len(index), dtype=bool)
+        self.pending = 0
+        self.updates = 0
+        self.recomputed = 0
+        self.version = 0   # змінюється з кожним перерахунком
+        self.last_update = 0
+        self._lock = threading.Lock()
+
+    def _recompute(self, rows, now):
+        """Перерахувати рядки rows і оновити купу; повертає кількість рядків"""
+        if not len(rows):
+            return 0
+        result = evaluate_rows(self.state, rows, now, max_age=self.max_age, **self.filters)
+        if self.max_age is not None:
+            oldest = np.where(result['mask'], self.state.updated[rows], np.inf).min(axis=1)
+            self.valid_until[rows] = oldest + self.max_age
+        self.spreads[rows] = result['spread']
+        self.valid[rows] = result['enough'] & ~result['suspicious']
+        for row in rows[self.rejected[rows]].tolist():
+            del self.rejections[row]
+        self.rejected[rows] = False
+        for rejection in result['rejections']:
+            row = self.index.pair_id(rejection['pair'])
+            self.rejections.setdefault(row, []).append(rejection)
+            self.rejected[row] = True
+
+        for row, selected, suspicious, spread, legs in zip(
+                rows.tolist(), result['selected'].tolist(), result['suspicious'].tolist(),
+                result['spread'].tolist(),
+                zip(*(result[name].tolist() for name in LEG_FIELDS))):
+            if selected:
+                self.heap.set(row, spread)
+                self.legs[row] = legs
+            elif self.heap.remove(row):
+                del self.legs[row]
+            if suspicious:
+                self.suspicious.add(row)
+            else:
+                self.suspicious.discard(row)
+        self.recomputed += len(rows)
+        self.version += 1
+        return len(rows)
+
+    def update(self, exchange, records, now=None):
+        """Оновлення біржі: [(нативний символ, price, volume, bid, ask)]
+
+        Формат записів - як у TickerTable (ws_ingest), тож метод
+        підключається слухачем потоку. Повертає кількість перерахованих пар
+        (0, якщо перерахунок відкладено до читання).
+        """
+        col = self.state.exchange_ids.get(exchange)
+        if col is None:
+            return 0
+        lookup = self.index.by_native.get(exchange, {})
+        rows, values = [], []
+        for symbol, price, volume, bid, ask in records:
+            pair_id = lookup.get(symbol)
+            if pair_id is not None and price > 0:
+                rows.append(pair_id)
+                values.append((price, volume, bid, ask))
+        if not rows:
+            return 0
+
+        now = time.time() if now is None else now
+        rows = np.asarray(rows, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            state = self.state
+            state.prices[rows, col] = values[:, 0]
+            state.volumes[rows, col] = values[:, 1]
+            state.bids[rows, col] = values[:, 2]
+            state.asks[rows, col] = values[:, 3]
+            state.updated[rows, col] = now
+            state.mask[rows, col] = True
+            self.dirty[rows] = True
+            self.pending += len(rows)
+            self.updates += len(rows)
+            self.last_update = now
+            if self.pending >= FLUSH_ROWS:
+                return self._flush(now)
+            return 0
+
+    def apply_snapshot(self, snapshot, now=None):
+        """Повний знімок (REST): перераховуються тільки пари, де щось змінилось
+
+        Змінилось - ціна / об'єм / bid / ask / присутність на будь-якій
+        біржі знімка, або застаріла комірка отримала свіжі дані.
+        Перерахунок одразу (разом з відкладеними оновленнями потоку).
+        """
+        if snapshot.index is not self.index and snapshot.pairs != self.index.pairs:
+            raise ValueError("знімок побудовано для іншого універсуму")
+        names = [name for name in snapshot.exchanges if name in self.state.exchange_ids]
+        src = [snapshot.exchange_ids[name] for name in names]
+        cols = [self.state.exchange_ids[name] for name in names]
+        now = time.time() if now is None else now
+
+        with self._lock:
+            state = self.state
+            changed = np.zeros(len(self.index), dtype=bool)
+            for field in ('prices', 'volumes', 'bids', 'asks', 'mask'):
+                new = getattr(snapshot, field)[:, src]
+                target = getattr(state, field)
+                changed |= (new != target[:, cols]).any(axis=1)
+                target[:, cols] = new
+
+            new_updated = snapshot.updated[:, src]
+            if self.max_age is not None:
+                stale = now - state.updated[:, cols] > self.max_age
+                fresh = now - new_updated <= self.max_age
+                changed |= (stale & fresh & snapshot.mask[:, src]).any(axis=1)
+            state.updated[:, cols] = new_updated
+
+            self.dirty |= changed
+            self.updates += int(changed.sum())
+            self.last_update = now
+            return self._flush(now)
+
+    def _flush(self, now):
+        dirty = self.dirty | (self.valid_until < now)
+        # Змінився курс котирування (BTCUSDT...) - USD ціни всіх його ринків теж
+        layout = self.state.layout()
+        moved = [code for code, ref in enumerate(layout['refs']) if ref is not None and dirty[ref]]
+        if moved:
+            dirty |= np.isin(layout['quote_ids'], moved)
+        rows = group_rows(self.state, np.flatnonzero(dirty))
+        self.dirty[:] = False
+        self.pending = 0
+        return self._recompute(rows, now)
+
+    def flush(self, now=None):
+        """Перерахувати брудні пари та пари, у яких нога вийшла за max_age"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._flush(now)
+
+    def spread_sample(self, now=None):
+        """(спреди, валідність) всіх пар універсуму в порядку рядків індексу
+
+        Та сама вибірка, що й у find_opportunities (enough & ~suspicious),
+        включно з парами з нульовим чи від'ємним спредом.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._flush(now)
+            return self.spreads.copy(), self.valid.copy()
+
+    def top(self, n=None, now=None):
+        """n кращих можливостей у форматі find_opportunities (None - всі)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._flush(now)
+            exchanges = self.state.exchanges
+            pairs = self.index.pairs
+            updated = self.state.updated
+            opportunities = []
+            for row in self.heap.top(n):
+                b, a, br, sr, bp, sp, bv, sv, bq, sq, c = self.legs[row]
+                opportunities.append({
+                    'pair': pairs[row],
+                    'spread': self.heap.spreads[row],
+                    'buy': exchanges[b],
+                    'sell': exchanges[a],
+                    'buy_pair': pairs[br],
+                    'sell_pair': pairs[sr],
+                    'buy_price': bp,
+                    'sell_price': sp,
+                    'buy_volume': bv,
+                    'sell_volume': sv,
+                    'buy_rate': bq,
+                    'sell_rate': sq,
+                    'exchanges': c,
+                    'buy_age': round(now - float(updated[br, b]), 3),
+                    'sell_age': round(now - float(updated[sr, a]), 3)
+                })
+            return opportunities
+
+    def result(self, n=None):
+        """Відповідь у форматі analyze_arbitrage_fast(json_output=True)"""
+        opportunities = self.top(n)
+        with self._lock:
+            spreads = list(self.heap.spreads.values())
+            rejections = [r for row in sorted(self.rejections) for r in self.rejections[row]]
+        return {
+            'opportunities': opportunities,
+            'stats': {
+                'total_pairs': len(self.index),
+                'found_opportunities': len(spreads),
+                'avg_spread': sum(spreads) / len(spreads) if spreads else 0,
+                'max_spread': max(spreads) if spreads else 0,
+                'timestamp': time.time(),
+                'universe_version': self.index.version,
+                'rejected': count_reasons(rejections),
+                'mode': 'live'
+            },
+            'rejections': rejections
+        }
+
+    def get_status(self):
+        return {
+            'pairs': len(self.index),
+            'opportunities': len(self.heap),
+            'suspicious': len(self.suspicious),
+            'updates': self.updates,
+            'pending': self.pending,
+            'recomputed': self.recomputed,
+            'age': round(time.time() - self.last_update, 3) if self.last_update else None
+        }
+
+
+# ==================== ЖИВИЙ РЕЖИМ ====================
+
+class LiveFeed:
+    """Двигун, який живлять потік WebSocket і REST знімки решти бірж
+
+    index_source() - поточний SymbolIndex універсуму; якщо він змінився
+    (фонове оновлення), двигун і підписки будуються заново, а читачі
+    до переключення отримують результати старого двигуна.
+    """
+
+    def __init__(self, index_source, interval=POLL_INTERVAL, stream=False):
+        self.index_source = index_source
+        self.interval = interval
+        self.stream = stream
+        self.engine = None
+        self.polls = 0
+        self.last_poll = 0
+        self.last_error = None
+        self._indexed = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _attach(self, index):
+        engine = IncrementalEngine(index, list(VENUE_URLS), **BASE_FILTERS)
+        if self.stream:
+            stream = get_stream()
+            if stream is None or self.engine is not None:
+                stream = start_stream(index)
+            stream.add_listener(engine.update)
+        self.engine = engine
+        logger.info(f"Інкрементальний двигун: {len(index)} пар (універсум v{index.version})")
+
+    def poll(self):
+        """Один цикл: REST знімок (біржі з живим потоком - з таблиці) → двигун"""
+        index = self.index_source()
+        if self.engine is None or index is not self.engine.index:
+            self._attach(index)
+        snapshot = build_market_snapshot(index.pairs, index=index)
+        changed = self.engine.apply_snapshot(snapshot)
+        self.polls += 1
+        self.last_poll = time.time()
+
+        # Цикл = одне сканування для статистики (весь універсум) та історії спредів
+        spreads, valid = self.engine.spread_sample(self.last_poll)
+        get_spread_stats().observe(index.pairs, spreads, self.last_poll, valid=valid)
+        get_history().record(self.engine.top(now=self.last_poll), self.last_poll)
+        self.last_error = None
+        return changed
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Живий режим: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='live-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def ready(self):
+        return self.engine is not None and self.polls > 0
+
+    def result(self, n=None):
+        engine = self.engine
+        if engine is None:
+            return None
+        result = engine.result(n)
+        get_spread_stats().annotate(result['opportunities'])
+        return result
+
+    def query_index(self):
+        """(result, OpportunityIndex) поточного стану
+
+        Спільні для всіх запитів, поки стан не змінився (не довше INDEX_TTL).
+        """
+        engine = self.engine
+        if engine is None:
+            return None
+        engine.flush()
+        cached = self._indexed
+        if (cached is None or cached[0] is not engine or cached[1] != engine.version
+                or time.time() - cached[2] > INDEX_TTL):
+            result = engine.result()
+            get_spread_stats().annotate(result['opportunities'])
+            cached = (engine, engine.version, time.time(), result,
+                      OpportunityIndex(result['opportunities']))
+            self._indexed = cached
+        return cached[3], cached[4]
+
+    def get_status(self):
+        engine = self.engine
+        return dict(engine.get_status() if engine is not None else {},
+                    running=self._thread is not None and self._thread.is_alive(),
+                    polls=self.polls,
+                    poll_age=round(time.time() - self.last_poll, 3) if self.last_poll else None,
+                    last_error=self.last_error)
+
+
+# ==================== ГЛОБАЛЬНИЙ ЕКЗЕМПЛЯР ====================
+
+_live = None
+_live_lock = threading.Lock()
+
+
+def start_live(index_source, interval=POLL_INTERVAL, stream=False):
+    """Запустити живий режим (один на процес)"""
+    global _live
+    with _live_lock:
+        if _live is not None:
+            _live.stop()
+        _live = LiveFeed(index_source, interval, stream).start()
+    return _live
+
+
+def stop_live():
+    global _live
+    with _live_lock:
+        if _live is not None:
+            _live.stop()
+            _live = None
+
+
+def get_live():
+    """Активний живий режим або None"""
+    return _live
@@ -1,96 +1,81 @@
+import argparse
+import os
+import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from src.python.exchanges_all import ALL_EXCHANGES_FAST
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from exchanges_all import fetch_all_fast
+from symbols import QUOTE_ASSETS, split_symbol
+from universe import (MIN_VENUES, UNIVERSE_BIN, UNIVERSE_TEXT, append_history, build_universe,
+                      load_previous, popcount, save_universe)
 
 def get_all_prices_fast():
-    """Отримати всі ціни з 5 бірж швидко"""
+    """Отримати всі ціни з активних бірж швидко"""
     print("🚀 ОТРИМАННЯ ВСІХ ЦІН")
     
     start = time.time()
-    results = {}
     
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(func): name for name, func in ALL_EXCHANGES_FAST.items()}
-        
-        for future in futures:
-            exchange = futures[future]
-            try:
-                results[exchange] = future.result(timeout=10)
-            except:
-                results[exchange] = {}
+    # Всі біржі одночасно через постійні пули з'єднань
+    results = fetch_all_fast()
     
     print(f"⏱️  Час: {time.time() - start:.1f} сек")
     return results
 
-def create_3plus_file():
-    """Створити файл з парами на 3+ біржах"""
-    print("\n🎯 СТВОРЕННЯ ФАЙЛУ ПАР НА 3+ БІРЖАХ")
+def create_3plus_file(min_venues=MIN_VENUES, path=UNIVERSE_TEXT, bin_path=UNIVERSE_BIN):
+    """Створити файл з парами на min_venues+ біржах (N з M активних)
+
+    Покриття рахується бітовими масками; якщо склад змінився відносно
+    попереднього файлу - версія збільшується, а diff дописується в
+    universe_history.jsonl.
+    """
+    print(f"\n🎯 СТВОРЕННЯ ФАЙЛУ ПАР НА {min_venues}+ БІРЖАХ")
     print("=" * 60)
     
     # 1. Отримати всі ціни
     all_data = get_all_prices_fast()
+    exchanges = list(all_data)
+    total = len(exchanges)
     
-    # 2. Отримати USDT пари
-    usdt_pairs_by_exchange = {}
-    
-    for exchange, pairs in all_data.items():
-        if exchange == 'Gate.io':
-            # BTC_USDT → BTCUSDT
-            usdt_pairs = [p.replace('_USDT', 'USDT') for p in pairs.keys() 
-                         if p.endswith('_USDT')]
-        elif exchange == 'HTX':
-            # btcusdt → BTCUSDT
-            usdt_pairs = [p.upper() for p in pairs.keys() 
-                         if p.lower().endswith('usdt')]
-        else:
-            # BTCUSDT
-            usdt_pairs = [p for p in pairs.keys() if p.endswith('USDT')]
-        
-        usdt_pairs_by_exchange[exchange] = set(usdt_pairs)
-    
-    # 3. Всі унікальні USDT пари
-    all_usdt_pairs = set()
-    for pairs in usdt_pairs_by_exchange.values():
-        all_usdt_pairs.update(pairs)
-    
-    print(f"📈 Усього унікальних USDT пар: {len(all_usdt_pairs)}")
-    
-    # 4. Рахуємо кількість бірж для кожної пари
-    pair_coverage = {}
-    for pair in all_usdt_pairs:
-        count = sum(1 for exchange in usdt_pairs_by_exchange 
-                   if pair in usdt_pairs_by_exchange[exchange])
-        pair_coverage[pair] = count
-    
-    # 5. Беремо пари на 3, 4, 5 біржах
-    pairs_3plus = []
-    for count in [3, 4, 5]:
-        pairs = [p for p, c in pair_coverage.items() if c == count]
-        pairs_3plus.extend(pairs)
-        print(f"🎯 На {count}/5 біржах: {len(pairs):>4} пар")
+    # 2. Маска бірж для кожної пари з QUOTE_ASSETS (BTC_USDT / BTCUSDT → BTCUSDT, ETH-BTC → ETHBTC)
+    previous = load_previous(path, bin_path)
+    universe, diff = build_universe(all_data, exchanges, min_venues, previous)
     
-    # 6. Записуємо в файл
-    with open("pairs_3plus_of_5.txt", "w") as f:
-        f.write("# Пари на 3+ біржах (з 5)\n")
-        f.write(f"# Згенеровано: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"# Кількість: {len(pairs_3plus)}\n")
-        f.write("#" * 50 + "\n\n")
-        
-        for pair in sorted(pairs_3plus):
-            f.write(f"{pair}\n")
+    print(f"📈 Усього унікальних пар: {universe.seen}")
+    counts = universe.counts()
+    for count in range(min_venues, total + 1):
+        print(f"🎯 На {count}/{total} біржах: {counts.get(count, 0):>4} пар")
+    by_quote = {}
+    for pair in universe.pairs:
+        quote = split_symbol(pair)[1]
+        by_quote[quote] = by_quote.get(quote, 0) + 1
+    print("💱 За котируванням: " + ", ".join(f"{quote} {by_quote[quote]}"
+                                            for quote in QUOTE_ASSETS if quote in by_quote))
     
-    print(f"\n✅ Створено pairs_3plus_of_5.txt: {len(pairs_3plus)} пар")
+    # 3. Записуємо файли (бінарний для програм, текстовий для людей) та diff
+    save_universe(universe, path, bin_path)
+    print(f"\n✅ Створено {path} + {bin_path}: {len(universe)} пар, версія {universe.version}")
+    if previous is not None:
+        print(f"   +{len(diff['added'])} нових, -{len(diff['removed'])} видалених, "
+              f"{len(diff['changed'])} зі зміною бірж")
+    if previous is None or universe.version != previous.version:
+        append_history(universe, diff)
     
-    # 7. Топ-20 найпопулярніших
+    # 4. Топ-20 найпопулярніших
     print(f"\n🏆 ТОП-20 НАЙПОПУЛЯРНІШИХ ПАР:")
-    sorted_pairs = sorted(pair_coverage.items(), key=lambda x: (-x[1], x[0]))
-    for i, (pair, count) in enumerate(sorted_pairs[:20], 1):
-        print(f"{i:>2}. {pair:<12} {count}/5 бірж")
+    sorted_pairs = sorted(universe.masks.items(), key=lambda x: (-popcount(x[1]), x[0]))
+    for i, (pair, mask) in enumerate(sorted_pairs[:20], 1):
+        print(f"{i:>2}. {pair:<12} {popcount(mask)}/{total} бірж")
     
-    return pairs_3plus
+    return universe.pairs
 
 def main():
-    create_3plus_file()
+    parser = argparse.ArgumentParser(description="Універсум пар, що торгуються на кількох біржах")
+    parser.add_argument('--min-venues', type=int, default=MIN_VENUES, help="мінімум бірж для пари (N з M)")
+    parser.add_argument('--output', default=UNIVERSE_TEXT, help="текстовий список пар")
+    parser.add_argument('--binary', default=UNIVERSE_BIN, help="бінарний універсум (mmap)")
+    args = parser.parse_args()
+    create_3plus_file(args.min_venues, args.output, args.binary)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
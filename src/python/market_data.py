@@ -5,6 +5,9 @@ import threading
 import logging
 from datetime import datetime, timedelta
 
+from replay import wrap_ccxt
+from scheduler import get_scheduler
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -14,10 +17,10 @@ class BinanceDataStream:
     def __init__(self, symbol="SOL/USDT", timeframe="1m"):
         self.symbol = symbol
         self.timeframe = timeframe
-        self.exchange = ccxt.binance({
+        self.exchange = wrap_ccxt(ccxt.binance({
             'enableRateLimit': True,
             'options': {'defaultType': 'spot'}
-        })
+        }), 'Binance')
         self.is_running = False
         self.thread = None
         self.callbacks = []
@@ -59,10 +62,20 @@ class BinanceDataStream:
     
     def _stream_loop(self):
         """Основний цикл стримінгу"""
+        # Частоту задає планувальник: 5 с базово, 1-30 с залежно від бюджету Binance
+        scheduler = get_scheduler()
+        consumer = scheduler.register(f"stream:{self.symbol}", 'Binance', weight=2,
+                                      interval=5, min_interval=1, max_interval=30)
         while self.is_running:
             try:
+                scheduler.wait(consumer)
+                if not self.is_running:
+                    break
+                
                 # Отримуємо поточну ціну
+                scheduler.acquire('Binance', 2)
                 ticker = self.exchange.fetch_ticker(self.symbol)
+                scheduler.record_response('Binance', 200, self.exchange.last_response_headers or {})
                 current_price = ticker['last']
                 
                 if self.last_price != current_price:
@@ -85,12 +98,12 @@ class BinanceDataStream:
                         except Exception as e:
                             logger.error(f"Помилка в callback: {e}")
                 
-                # Затримка перед наступним оновленням
-                time.sleep(5)
-                
             except Exception as e:
+                if isinstance(e, ccxt.RateLimitExceeded):
+                    scheduler.record_response('Binance', 429, self.exchange.last_response_headers or {})
                 logger.error(f"Помилка в стримінгу: {e}")
                 time.sleep(10)
+        scheduler.unregister(consumer)
     
     def start(self):
         """Запустити стримінг"""
@@ -0,0 +1,280 @@
+# src/python/market_snapshot.py - колонковий знімок ринку (NumPy)
+import time
+
+import numpy as np
+
+from exchanges_all import get_payloads, record_decode, VENUE_URLS
+from fast_decode import decode, loads, scan_records, DECODE_MODE
+from symbols import USD_QUOTE, get_index
+from venues import VENUES, is_flat, iter_tickers, read_field
+from ws_ingest import get_stream
+
+# ==================== ПОЛЯ БІРЖ ====================
+# Де в сирій відповіді біржі лежать символ, ціна, bid / ask та об'єм -
+# з реєстру venues.py. Об'єм зберігається в котируванні пари (біржі з об'ємом
+# у базовому активі - 'base' - множаться на ціну); в USD ціни й об'єми
+# переводять курси котирувань того ж знімка (quote_rates).
+
+# Стейблкоїни без власного курсу в знімку вважаються 1 USD;
+# решта котирувань (BTC, ETH) без курсу - NaN, такі ноги не торгуються
+STABLE_QUOTES = ('USDT', 'USDC', 'FDUSD')
+
+
+# ==================== ЗНІМОК ====================
+
+_layouts = {}   # id(index) → (index, розкладка)
+
+
+def base_groups(base_ids):
+    """Рядки, згруповані за базовим активом: (order, starts, group, segment)
+
+    order - позиції, впорядковані за активом (стабільно), starts - початки
+    груп в order, group - група кожної позиції order, segment - група
+    кожного рядка (для розкладання результатів груп назад по рядках).
+    """
+    order = np.argsort(base_ids, kind='stable')
+    ordered = base_ids[order]
+    starts = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+    first = np.zeros(len(order), dtype=np.intp)
+    first[starts] = 1
+    group = np.cumsum(first) - 1
+    segment = np.empty(len(order), dtype=np.intp)
+    segment[order] = group
+    return order, starts, group, segment
+
+
+def pair_layout(index):
+    """Масиви індексу для векторних операцій - раз на індекс
+
+    {'quote_ids': код котирування пари, 'refs': ID пар QUOTE/USDT,
+     'rated': коди котирувань з парою курсу, 'rated_refs': їх пари курсу,
+     'rated_stable': чи стейблкоїн, 'unrated': коди котирувань без курсу
+     (не стейблкоїни), 'base_ids': код базового активу пари, 'reps': код
+     активу → ID пари, від імені якої він звітується, 'grouped': чи є
+     активи з кількома ринками, 'groups': base_groups усього індексу}
+    """
+    cached = _layouts.get(id(index))
+    if cached is None or cached[0] is not index:
+        if len(_layouts) >= 4:
+            _layouts.clear()
+        refs = index.quote_refs()
+        quotes = list(zip(index.quote_assets, refs))
+        rated = [code for code, (quote, ref) in enumerate(quotes)
+                 if quote != USD_QUOTE and ref is not None]
+        base_ids = np.asarray(index.base_ids, dtype=np.intp)
+        reps = np.asarray(index.base_pairs(), dtype=np.intp)
+        cached = _layouts[id(index)] = (index, {
+            'quote_ids': np.asarray(index.quote_ids, dtype=np.intp),
+            'refs': refs,
+            'rated': np.asarray(rated, dtype=np.intp),
+            'rated_refs': np.asarray([refs[code] for code in rated], dtype=np.intp),
+            'rated_stable': np.asarray([quotes[code][0] in STABLE_QUOTES for code in rated], dtype=bool),
+            'unrated': [code for code, (quote, ref) in enumerate(quotes)
+                        if ref is None and quote != USD_QUOTE and quote not in STABLE_QUOTES],
+            'base_ids': base_ids,
+            'reps': reps,
+            'grouped': len(reps) < len(base_ids),
+            'groups': base_groups(base_ids)
+        })
+    return cached[1]
+
+
+class MarketSnapshot:
+    """Ціни, об'єми (у котируванні) та маска присутності як масиви pairs × exchanges
+
+    Рядок = ID пари з SymbolIndex (порядок універсуму),
+    стовпець = біржа з self.exchanges. bids / asks - кращі ціни стакану
+    з того ж тікера (0 якщо біржа їх не віддала), updated - час отримання
+    кожної комірки (для віку даних кожної ноги угоди).
+    """
+
+    def __init__(self, index, exchanges=None, timestamp=None):
+        self.index = index
+        self.exchanges = list(exchanges if exchanges is not None else index.exchanges)
+        self.exchange_ids = {name: i for i, name in enumerate(self.exchanges)}
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+        shape = (len(index), len(self.exchanges))
+        self.prices = np.zeros(shape, dtype=np.float64)
+        self.volumes = np.zeros(shape, dtype=np.float64)
+        self.bids = np.zeros(shape, dtype=np.float64)
+        self.asks = np.zeros(shape, dtype=np.float64)
+        self.mask = np.zeros(shape, dtype=bool)
+        self.updated = np.zeros(shape, dtype=np.float64)
+        self.errors = {}   # біржа → помилка розбору її відповіді
+
+    @property
+    def pairs(self):
+        return self.index.pairs
+
+    def layout(self):
+        """Масиви індексу знімка (pair_layout)"""
+        return pair_layout(self.index)
+
+    def quote_rates(self):
+        """(коди котирувань рядків, курси котирування × біржа в USD)
+
+        Курс - ціна QUOTE/USDT у цьому ж знімку: на тій самій біржі, а
+        де її немає - медіана інших бірж. Таблиця мала (кілька котирувань);
+        курс комірки (рядок, біржа) - table[codes[рядок], біржа].
+        """
+        layout = pair_layout(self.index)
+        table = np.ones((len(layout['refs']), len(self.exchanges)))
+        rated, refs = layout['rated'], layout['rated_refs']
+        if len(rated):
+            # Одна операція на всі котирування: медіана по біржах з ціною
+            # (NaN сортуються в кінець), пропуски - медіаною
+            present = self.mask[refs]
+            prices = np.where(present, self.prices[refs], np.nan)
+            counts = present.sum(axis=1)
+            ordered = np.sort(prices, axis=1)
+            local = np.arange(len(rated))
+            median = (ordered[local, np.maximum(counts - 1, 0) // 2]
+                      + ordered[local, np.maximum(counts, 1) // 2]) / 2
+            table[rated] = np.where(present, prices, median[:, None])
+            table[rated[(counts == 0) & layout['rated_stable']]] = 1.0
+        table[layout['unrated']] = np.nan
+        return layout['quote_ids'], table
+
+    def fill_venue(self, exchange, payload):
+        """Заповнити стовпець біржі прямо з сирої JSON відповіді"""
+        col = self.exchange_ids[exchange]
+        adapter = VENUES[exchange]
+        lookup = self.index.by_native[exchange]
+        price_key, volume_key = adapter['price'], adapter['volume']
+        bid_key, ask_key = adapter['bid'], adapter['ask']
+
+        rows, prices, volumes, bids, asks = [], [], [], [], []
+        for symbol, item in iter_tickers(exchange, payload):
+            pair_id = lookup.get(symbol)
+            if pair_id is None:
+                continue
+            rows.append(pair_id)
+            prices.append(read_field(item, price_key))
+            volumes.append(read_field(item, volume_key))
+            bids.append(read_field(item, bid_key))
+            asks.append(read_field(item, ask_key))
+
+        if rows:
+            rows = np.asarray(rows, dtype=np.intp)
+            self.prices[rows, col] = prices
+            self.volumes[rows, col] = volumes
+            self.bids[rows, col] = bids
+            self.asks[rows, col] = asks
+            self.mask[rows, col] = self.prices[rows, col] > 0
+            self._volume_to_quote(exchange, rows, col)
+        return len(rows)
+
+    def fill_venue_bytes(self, exchange, raw):
+        """Заповнити стовпець біржі з bytes без побудови словників (режим scan)"""
+        if not is_flat(exchange):
+            return self.fill_venue(exchange, loads(raw))
+        col = self.exchange_ids[exchange]
+        adapter = VENUES[exchange]
+        records = scan_records(
+            raw, adapter['symbol'],
+            (adapter['price'], adapter['volume'], adapter['bid'], adapter['ask']),
+            self.index.by_native[exchange], upper=True)
+        if not records:
+            return 0
+
+        rows = np.fromiter((pair_id for pair_id, _ in records), dtype=np.intp, count=len(records))
+        values = np.array([v for _, v in records], dtype=np.float64)
+        self.prices[rows, col] = values[:, 0]
+        self.volumes[rows, col] = values[:, 1]
+        self.bids[rows, col] = values[:, 2]
+        self.asks[rows, col] = values[:, 3]
+        self.mask[rows, col] = values[:, 0] > 0
+        self._volume_to_quote(exchange, rows, col)
+        return len(records)
+
+    def _volume_to_quote(self, exchange, rows, col):
+        if VENUES[exchange]['volume_unit'] == 'base':
+            self.volumes[rows, col] *= self.prices[rows, col]
+
+    def fill_table(self, exchange, rows):
+        """Заповнити стовпець біржі з таблиці тікерів {symbol: (price, volume, bid, ask, ts)}"""
+        col = self.exchange_ids[exchange]
+        found = 0
+        for pair_id, symbol in enumerate(self.index.native[exchange]):
+            row = rows.get(symbol)
+            if row is None or row[0] <= 0:
+                continue
+            self.prices[pair_id, col] = row[0]
+            self.volumes[pair_id, col] = row[1]
+            self.bids[pair_id, col] = row[2]
+            self.asks[pair_id, col] = row[3]
+            self.updated[pair_id, col] = row[4]
+            self.mask[pair_id, col] = True
+            found += 1
+        return found
+
+    @classmethod
+    def from_payloads(cls, payloads, index, timestamp=None, mode=None, fetched_at=None):
+        """Зібрати знімок з {exchange: відповідь}; None = біржа недоступна
+
+        Відповідь - bytes або вже розібраний JSON; mode - режим fast_decode;
+        fetched_at - {exchange: час отримання} (за замовчуванням timestamp).
+        Біржа, відповідь якої не розібралась, лишається порожнім стовпцем,
+        а помилка - в snapshot.errors {exchange: текст}.
+        """
+        mode = mode or DECODE_MODE
+        snapshot = cls(index, list(payloads), timestamp)
+        fetched_at = fetched_at or {}
+        for exchange, payload in payloads.items():
+            if payload is None or exchange not in VENUES:
+                continue
+            try:
+                payload = decode(payload, mode)
+                if isinstance(payload, (bytes, bytearray)):
+                    snapshot.fill_venue_bytes(exchange, payload)
+                else:
+                    snapshot.fill_venue(exchange, payload)
+            except (KeyError, TypeError, ValueError) as e:
+                snapshot.errors[exchange] = f"{type(e).__name__}: {e}"
+            col = snapshot.exchange_ids[exchange]
+            snapshot.updated[:, col] = np.where(
+                snapshot.mask[:, col], fetched_at.get(exchange, snapshot.timestamp), 0.0)
+        return snapshot
+
+    def ages(self, now=None):
+        """Вік кожної комірки в секундах (inf де даних немає)"""
+        now = self.timestamp if now is None else now
+        return np.where(self.mask, now - self.updated, np.inf)
+
+    def venue_counts(self):
+        """Скільки бірж має кожну пару"""
+        return self.mask.sum(axis=1)
+
+    def nbytes(self):
+        return (self.prices.nbytes + self.volumes.nbytes + self.bids.nbytes
+                + self.asks.nbytes + self.mask.nbytes)
+
+
+def build_market_snapshot(pairs, max_age=None, index=None):
+    """Знімок для списку пар з поточних даних бірж
+
+    Якщо запущено потоковий режим (ws_ingest), біржі з живим потоком
+    беруться з таблиці тікерів, решта - з REST кешу, де оновлюються
+    тільки біржі з простроченим TTL (по можливості - тільки символи пар).
+    """
+    exchanges = list(VENUE_URLS)
+    if index is None or index.exchanges != exchanges:
+        index = get_index(pairs, exchanges)
+
+    stream = get_stream()
+    streamed = stream.fresh_venues() if stream is not None else []
+    rest = [name for name in exchanges if name not in streamed]
+    universe = {name: index.native[name] for name in rest}
+    payloads, fetched_at = get_payloads(max_age, rest, universe) if rest else ({}, {})
+
+    snapshot = MarketSnapshot.from_payloads(
+        {name: payloads.get(name) for name in exchanges},
+        index, time.time(), fetched_at=fetched_at)
+    for exchange in rest:
+        if payloads.get(exchange) is not None:
+            record_decode(exchange, snapshot.errors.get(exchange))
+    for exchange in streamed:
+        if exchange in snapshot.exchange_ids:
+            snapshot.fill_table(exchange, stream.table.rows(exchange))
+    return snapshot
@@ -0,0 +1,201 @@
+# src/python/opportunity_index.py - запити до можливостей без повторного сканування
+import base64
+import bisect
+import binascii
+import json
+
+from spread_engine import MAX_SPREAD, MIN_EXCHANGES, MIN_SPREAD, MIN_VOLUME
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+# Сканування рахує ширший набір, ніж показується за замовчуванням:
+# фільтри запиту звужують його вже по індексах, без нового сканування
+BASE_FILTERS = {'min_spread': 0.0, 'max_spread': float('inf'), 'min_volume': 0, 'min_exchanges': 2}
+
+# Параметри запиту за замовчуванням = колишні жорсткі фільтри
+DEFAULT_QUERY = {
+    'min_spread': MIN_SPREAD,        # %, не включно
+    'max_spread': MAX_SPREAD,        # %, не включно
+    'min_volume': MIN_VOLUME,        # USD на кожній нозі, не включно
+    'min_exchanges': MIN_EXCHANGES,  # мінімум бірж з ціною
+    'buy': None,                     # біржа купівлі
+    'sell': None,                    # біржа продажу
+    'limit': None,                   # None - всі
+    'cursor': None,                  # next_cursor попередньої сторінки
+    'sort': 'spread'                 # spread - за спредом, zscore - за відхиленням від норми пари
+}
+
+SORTS = ('spread', 'zscore')
+
+
+class QueryError(ValueError):
+    """Некоректний параметр запиту"""
+
+
+def parse_query(args):
+    """Параметри запиту (request.args або dict) → повний запит з типами"""
+    query = dict(DEFAULT_QUERY)
+    try:
+        for name in ('min_spread', 'max_spread', 'min_volume'):
+            if args.get(name) not in (None, ''):
+                query[name] = float(args[name])
+        for name in ('min_exchanges', 'limit'):
+            if args.get(name) not in (None, ''):
+                query[name] = int(args[name])
+    except ValueError as e:
+        raise QueryError(f"некоректне число: {e}")
+    if any(query[name] != query[name] for name in ('min_spread', 'max_spread', 'min_volume')):
+        raise QueryError("некоректне число: nan")
+    if query['limit'] is not None and query['limit'] < 1:
+        raise QueryError("limit має бути >= 1")
+    for name in ('buy', 'sell', 'cursor', 'sort'):
+        if args.get(name):
+            query[name] = args[name].strip()
+    if query['sort'] not in SORTS:
+        raise QueryError(f"sort має бути одним з {', '.join(SORTS)}")
+    if query['cursor']:
+        query['cursor'] = decode_cursor(query['cursor'])
+    return query
+
+
+# ==================== КУРСОР ====================
+# Курсор - ключ останнього елемента сторінки (спред або z-оцінка, пара), а не
+# номер позиції: після нового сканування сторінки продовжуються з того ж місця.
+
+def sort_value(opportunity, sort):
+    """Значення, за яким сортується можливість (↓); без z-оцінки - в кінці"""
+    if sort == 'zscore':
+        z = opportunity.get('zscore')
+        return float('-inf') if z is None else z
+    return opportunity['spread']
+
+
+def encode_cursor(opportunity, sort='spread'):
+    raw = json.dumps([sort_value(opportunity, sort), opportunity['pair']]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        spread, pair = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(spread), str(pair)
+    except (ValueError, TypeError, binascii.Error):
+        raise QueryError("некоректний cursor")
+
+
+# ==================== ІНДЕКС ====================
+
+class OpportunityIndex:
+    """Можливості одного обчислення з вторинними індексами
+
+    items - впорядковані за спредом ↓, парою ↑. Індекс спреду -
+    бісекція по цьому порядку (діапазон спреду = зріз позицій),
+    індекси бірж - позиції купівлі / продажу кожної біржі в тому ж
+    порядку. Запит перебирає найвужчий з кандидатів і перевіряє решту
+    умов; один індекс обслуговує всі запити до наступного обчислення.
+    Порядок за z-оцінкою (sort=zscore) - другий список позицій, теж
+    побудований один раз; фільтр спреду тоді перевіряється по позиції.
+    """
+
+    def __init__(self, opportunities):
+        self.items = sorted(opportunities, key=lambda o: (-o['spread'], o['pair']))
+        self.keys = [(-o['spread'], o['pair']) for o in self.items]
+        self.neg_spreads = [key[0] for key in self.keys]
+        z_keys = [(-sort_value(o, 'zscore'), o['pair']) for o in self.items]
+        self.z_order = sorted(range(len(self.items)), key=z_keys.__getitem__)
+        self.z_keys = [z_keys[pos] for pos in self.z_order]
+        self.by_buy = {}
+        self.by_sell = {}
+        for pos, opportunity in enumerate(self.items):
+            self.by_buy.setdefault(opportunity['buy'].lower(), []).append(pos)
+            self.by_sell.setdefault(opportunity['sell'].lower(), []).append(pos)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _range(self, query):
+        """[start, end) позицій, що проходять умову спреду"""
+        start = bisect.bisect_right(self.neg_spreads, -query['max_spread'])
+        end = bisect.bisect_left(self.neg_spreads, -query['min_spread'])
+        return start, end
+
+    def _cursor_position(self, query, keys):
+        """Перше місце в порядку keys після курсора (0 - без курсора)"""
+        if query['cursor'] is None:
+            return 0
+        value, pair = query['cursor']
+        return bisect.bisect_right(keys, (-value, pair))
+
+    def _candidates(self, query, start, end):
+        """Позиції для перебору: зріз найвужчого індексу"""
+        best = range(start, end)
+        for venue, positions in ((query['buy'], self.by_buy), (query['sell'], self.by_sell)):
+            if venue is None:
+                continue
+            positions = positions.get(venue.lower(), [])
+            lo = bisect.bisect_left(positions, start)
+            hi = bisect.bisect_left(positions, end)
+            if hi - lo < len(best):
+                best = positions[lo:hi]
+        return best
+
+    def query(self, query):
+        """Сторінка можливостей та підсумок по всіх збігах
+
+        Підсумок (matched / avg_spread / max_spread) - по всьому запиту,
+        курсор зсуває тільки початок сторінки.
+        Повертає {'opportunities', 'matched', 'avg_spread', 'max_spread', 'next_cursor'}.
+        """
+        start, end = self._range(query)
+        sort = query.get('sort', 'spread')
+        if sort == 'zscore':
+            # (місце в порядку, позиція): спред - умова на позицію
+            ranked = ((rank, pos) for rank, pos in enumerate(self.z_order) if start <= pos < end)
+            first = self._cursor_position(query, self.z_keys)
+        else:
+            ranked = ((pos, pos) for pos in self._candidates(query, start, end))
+            first = self._cursor_position(query, self.keys)
+        buy = query['buy'].lower() if query['buy'] else None
+        sell = query['sell'].lower() if query['sell'] else None
+        min_volume = query['min_volume']
+        min_exchanges = query['min_exchanges']
+        limit = query['limit']
+
+        page, matched, remaining, total_spread, max_spread = [], 0, 0, 0.0, 0.0
+        for rank, pos in ranked:
+            o = self.items[pos]
+            if ((buy is not None and o['buy'].lower() != buy)
+                    or (sell is not None and o['sell'].lower() != sell)
+                    or o['buy_volume'] <= min_volume or o['sell_volume'] <= min_volume
+                    or o['exchanges'] < min_exchanges):
+                continue
+            max_spread = max(max_spread, o['spread'])
+            matched += 1
+            total_spread += o['spread']
+            if rank < first:
+                continue
+            remaining += 1
+            if limit is None or len(page) < limit:
+                page.append(o)
+
+        return {
+            'opportunities': page,
+            'matched': matched,
+            'avg_spread': total_spread / matched if matched else 0,
+            'max_spread': max_spread,
+            'next_cursor': encode_cursor(page[-1], sort) if page and remaining > len(page) else None
+        }
+
+
+def answer_query(result, index, query):
+    """Відповідь /arbitrage: сторінка запиту + статистика обчислення"""
+    answer = index.query(query)
+    stats = dict(result.get('stats', {}),
+                 found_opportunities=answer['matched'],
+                 avg_spread=answer['avg_spread'],
+                 max_spread=answer['max_spread'])
+    return {
+        'opportunities': answer['opportunities'],
+        'stats': stats,
+        'next_cursor': answer['next_cursor']
+    }
@@ -0,0 +1,204 @@
+# src/python/price_consensus.py - консенсус цін між біржами: множники 10ⁿ та викиди
+import threading
+
+import numpy as np
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+MIN_CONSENSUS = 3        # бірж з ціною, щоб медіана пари мала голос більшості
+SCALE_TOLERANCE = 0.05   # |log10(ціна / медіана) - n| для множника 10ⁿ (≈ ±12%)
+MAX_EXPONENT = 6         # |n| більше - не одиниці виміру, а інший актив
+OUTLIER_MADS = 8.0       # викид: відхилення від медіани > OUTLIER_MADS робастних σ...
+MAX_DEVIATION = 2.0      # ...і не менше ніж у MAX_DEVIATION разів (спред > 100% - не арбітраж)
+CONFIRM_HITS = 3         # однакових виявлень, після яких множник пари / біржі в кеші
+
+# Причини у rejections
+SCALED = 'scale'              # нога на 10ⁿ від медіани: відкинута, поки множник не підтверджено
+OUTLIER = 'outlier'           # нога відкинута, пара рахується без неї
+NO_CONSENSUS = 'no_consensus' # < MIN_CONSENSUS бірж і ціни розходяться - пара відкинута
+
+MAD_SIGMA = 1.4826            # MAD → σ для нормального розподілу
+
+
+# ==================== КЕШ МНОЖНИКІВ ====================
+
+class ScaleCache:
+    """Підтверджені множники: (пара, біржа) → n, ціна біржі × 10ⁿ
+
+    Виявлення при консенсусі накопичуються (pending), нога до того
+    відкидається; після CONFIRM_HITS однакових множник застосовується
+    до цін ще до медіани - і там, де консенсусу вже немає (лишилось дві біржі). Якщо біржа виправила
+    одиниці, виявлення дає протилежний множник і запис зникає тим самим шляхом.
+    Для знімка кеш розгортається в матрицю (пари × біржі) один раз на версію.
+    """
+
+    def __init__(self, confirm=CONFIRM_HITS):
+        self.confirm = confirm
+        self.confirmed = {}   # (пара, біржа) → n
+        self.pending = {}     # (пара, біржа) → (n, виявлень)
+        self.version = 0
+        self._matrices = {}   # id(index) → (index, біржі, версія, матриця)
+        self._lock = threading.Lock()
+
+    def matrix(self, snapshot):
+        """Показники n для всіх комірок знімка (int8, 0 - без множника)"""
+        key = id(snapshot.index)
+        exchanges = tuple(snapshot.exchanges)
+        with self._lock:
+            cached = self._matrices.get(key)
+            if (cached is not None and cached[0] is snapshot.index
+                    and cached[1] == exchanges and cached[2] == self.version):
+                return cached[3]
+            matrix = np.zeros((len(snapshot.index), len(exchanges)), np.int8)
+            for (pair, exchange), n in self.confirmed.items():
+                row = snapshot.index.pair_id(pair)
+                col = snapshot.exchange_ids.get(exchange)
+                if row is not None and col is not None:
+                    matrix[row, col] = n
+            if len(self._matrices) >= 4:
+                self._matrices.clear()
+            self._matrices[key] = (snapshot.index, exchanges, self.version, matrix)
+            return matrix
+
+    def observe(self, detections):
+        """[(пара, біржа, n)] - виявлені множники поверх уже застосованих"""
+        with self._lock:
+            for pair, exchange, n in detections:
+                key = (pair, exchange)
+                total = self.confirmed.get(key, 0) + n
+                prev, hits = self.pending.get(key, (None, 0))
+                hits = hits + 1 if prev == total else 1
+                if hits < self.confirm:
+                    self.pending[key] = (total, hits)
+                    continue
+                self.pending.pop(key, None)
+                if total:
+                    self.confirmed[key] = total
+                else:
+                    self.confirmed.pop(key, None)
+                self.version += 1
+
+    def get_status(self):
+        return {
+            'confirmed': {f"{pair}@{exchange}": n for (pair, exchange), n in self.confirmed.items()},
+            'pending': len(self.pending),
+            'version': self.version
+        }
+
+
+_scales = None
+_scales_lock = threading.Lock()
+
+
+def get_scale_cache():
+    """Спільний кеш процесу (сканування і живий двигун)"""
+    global _scales
+    with _scales_lock:
+        if _scales is None:
+            _scales = ScaleCache()
+        return _scales
+
+
+# ==================== КОНСЕНСУС ====================
+
+def _row_median(values, counts):
+    """Медіана кожного рядка по не-NaN значеннях (NaN сортуються в кінець)"""
+    ordered = np.sort(values, axis=1)
+    lo = np.maximum(counts - 1, 0) // 2
+    hi = np.maximum(counts, 1) // 2
+    local = np.arange(len(values))
+    return (ordered[local, lo] + ordered[local, hi]) / 2
+
+
+def apply_consensus(snapshot, rows, prices, mask, *scaled, scales=None):
+    """Узгодити ціни рядків rows з медіаною бірж (масиви змінюються на місці)
+
+    prices / mask - ціни і маска рядків; scaled - масиви (bid / ask), що
+    множаться разом з цінами. Кроки: підтверджені множники з кешу →
+    медіана бірж → ноги, що відрізняються на 10ⁿ, виключаються з mask і
+    йдуть у кеш як виявлення (торгуються лише після підтвердження) →
+    ноги далі за робастний поріг виключаються з mask → пари без
+    консенсусу з розбіжними цінами позначаються як підозрілі.
+    Повертає (suspicious, scaled_count, rejections); scaled_count - ноги,
+    перераховані підтвердженими множниками; rejections - список
+    {'pair', 'exchange', 'reason', 'price', 'median', 'factor'}.
+    """
+    scales = get_scale_cache() if scales is None else scales
+    exps = scales.matrix(snapshot)[rows] if scales.confirmed else None
+    scaled_count = 0
+    if exps is not None and exps.any():
+        cached_rows, cached_cols = np.nonzero((exps != 0) & mask)
+        factor = 10.0 ** exps[cached_rows, cached_cols]
+        for array in (prices,) + scaled:
+            array[cached_rows, cached_cols] *= factor
+        scaled_count = len(cached_rows)
+
+    # Медіана бірж; без консенсусу - NaN, і всі порівняння нижче хибні
+    counts = mask.sum(axis=1)
+    consensus = counts >= MIN_CONSENSUS
+    masked = np.where(mask, prices, np.nan)
+    median = _row_median(masked, counts)
+    median[~consensus] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.log10(masked / median[:, None])
+
+    # Множник 10ⁿ: рівно на степінь десяти від більшості. Неперевірений
+    # множник може бути іншим токеном з ціною ~10ⁿ - нога не торгується
+    exponent = np.rint(ratio)
+    unit = ((np.abs(ratio - exponent) < SCALE_TOLERANCE) & (exponent != 0)
+            & (np.abs(exponent) <= MAX_EXPONENT))
+    unit_rows, unit_cols = np.nonzero(unit) if unit.any() else (np.zeros(0, np.intp),) * 2
+    shifts = -exponent[unit_rows, unit_cols]
+    deviation = np.abs(ratio)
+    if len(unit_rows):
+        mask[unit_rows, unit_cols] = False
+        deviation[unit_rows, unit_cols] = np.nan
+        dev_counts = counts - unit.sum(axis=1)
+    else:
+        dev_counts = counts
+
+    # Викиди: далі за поріг по робастному розкиду (MAD) пари
+    mad = _row_median(deviation, dev_counts)
+    threshold = np.fmax(OUTLIER_MADS * MAD_SIGMA * mad, np.log10(MAX_DEVIATION))
+    with np.errstate(invalid='ignore'):
+        outlier = deviation > threshold[:, None]
+    outliers = list(zip(*np.nonzero(outlier))) if outlier.any() else []
+    if outliers:
+        mask &= ~outlier
+
+    # Без консенсусу невідомо, яка з бірж помиляється
+    suspicious = ~consensus & (counts >= 2)
+    undecided = np.flatnonzero(suspicious)
+    lo = np.fmin.reduce(masked[undecided], axis=1)
+    hi = np.fmax.reduce(masked[undecided], axis=1)
+    spread_out = hi / lo > MAX_DEVIATION
+    suspicious[undecided] = spread_out
+
+    # Структурований звіт (тільки позначені комірки - їх одиниці)
+    ids = np.arange(len(snapshot.pairs))[rows]
+    pairs, exchanges = snapshot.pairs, snapshot.exchanges
+    rejections = []
+    detections = []
+    for r, c, n, price in zip(unit_rows.tolist(), unit_cols.tolist(), shifts.tolist(),
+                              prices[unit_rows, unit_cols].tolist()):
+        n = int(n)
+        detections.append((pairs[ids[r]], exchanges[c], n))
+        rejections.append({'pair': pairs[ids[r]], 'exchange': exchanges[c], 'reason': SCALED,
+                           'price': price, 'median': float(median[r]), 'factor': 10.0 ** n})
+    for r, c in outliers:
+        rejections.append({'pair': pairs[ids[r]], 'exchange': exchanges[c], 'reason': OUTLIER,
+                           'price': float(prices[r, c]), 'median': float(median[r]), 'factor': None})
+    for r, high, low in zip(undecided[spread_out].tolist(), hi[spread_out].tolist(), lo[spread_out].tolist()):
+        rejections.append({'pair': pairs[ids[r]], 'exchange': None, 'reason': NO_CONSENSUS,
+                           'price': high, 'median': None, 'factor': high / low})
+    if detections:
+        scales.observe(detections)
+    return suspicious, scaled_count, rejections
+
+
+def count_reasons(rejections):
+    """{причина: кількість} для статистики"""
+    counts = {}
+    for rejection in rejections:
+        counts[rejection['reason']] = counts.get(rejection['reason'], 0) + 1
+    return counts
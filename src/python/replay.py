@@ -0,0 +1,281 @@
+# src/python/replay.py - запис та відтворення відповідей бірж
+import argparse
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+logger = logging.getLogger(__name__)
+
+# ==================== НАЛАШТУВАННЯ ====================
+# SOLIPSIST_RECORD=corpus.jsonl.gz  - писати всі відповіді бірж у корпус
+# SOLIPSIST_REPLAY=corpus.jsonl.gz  - віддавати відповіді з корпусу замість мережі
+# SOLIPSIST_REPLAY_SPEED=1          - 1 = як записано, 10 = в 10 разів швидше,
+#                                     0 = кожен запит бере наступний запис
+
+RECORD_ENV = 'SOLIPSIST_RECORD'
+REPLAY_ENV = 'SOLIPSIST_REPLAY'
+SPEED_ENV = 'SOLIPSIST_REPLAY_SPEED'
+
+# Параметри, що змінюються від запиту до запиту і не впливають на відповідь
+VOLATILE_PARAMS = ('timestamp', 'signature', 'recvWindow', '_')
+
+
+class ReplayMiss(Exception):
+    """У корпусі немає відповіді на цей запит"""
+
+
+def request_key(venue, url, params=None):
+    """Ключ запиту: біржа + шлях + відсортовані параметри (без хоста)"""
+    parsed = urlparse(url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k not in VOLATILE_PARAMS]
+    query += [(k, str(v)) for k, v in (params or {}).items() if k not in VOLATILE_PARAMS]
+    return f"{venue} {parsed.path}?{urlencode(sorted(query))}"
+
+
+# ==================== ЗАПИС ====================
+
+class Recorder:
+    """Дописує відповіді в gzip JSONL: один рядок = один запит"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'at', encoding='utf-8')
+
+    def write(self, venue, url, params, status, body, headers=None):
+        """body - bytes відповіді (або вже розібраний JSON для ccxt)
+
+        Пишуться і помилкові відповіді (429, 5xx) разом із заголовками лімітів -
+        відтворення повторює на них запобіжник і планувальник.
+        """
+        if isinstance(body, (bytes, bytearray)):
+            body = body.decode('utf-8', errors='replace')
+        else:
+            body = json.dumps(body)
+        line = json.dumps({
+            't': time.time(),
+            'key': request_key(venue, url, params),
+            'venue': venue,
+            'status': status,
+            'headers': headers or {},
+            'body': body
+        })
+        with self._lock:
+            self._file.write(line + '\n')
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        logger.info(f"Корпус {self.path}: записано {self.count} відповідей")
+
+
+# ==================== ВІДТВОРЕННЯ ====================
+
+def load_corpus(path):
+    """Всі записи корпусу, відсортовані за часом"""
+    entries = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry['t'])
+    return entries
+
+
+class Replayer:
+    """Віддає записані відповіді за ключем запиту
+
+    Віртуальний час стартує з першим запитом і йде зі швидкістю speed:
+    запит отримує останній запис свого ключа, зроблений не пізніше
+    віртуального часу. speed=0 - покроковий режим (кожен запит - наступний
+    запис ключа, останній повторюється).
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = float(speed)
+        self.entries = load_corpus(path)
+        self.by_key = {}
+        for entry in self.entries:
+            self.by_key.setdefault(entry['key'], []).append(entry)
+        self.t0 = self.entries[0]['t'] if self.entries else 0.0
+        self.started = None
+        self.cursors = {}
+        self.served = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def virtual_time(self):
+        if self.started is None:
+            self.started = time.monotonic()
+        return self.t0 + (time.monotonic() - self.started) * self.speed
+
+    def lookup(self, venue, url, params=None):
+        """Запис для запиту або ReplayMiss"""
+        key = request_key(venue, url, params)
+        with self._lock:
+            records = self.by_key.get(key)
+            if not records:
+                self.misses += 1
+                raise ReplayMiss(f"немає в корпусі: {key}")
+
+            cursor = self.cursors.get(key, -1)
+            if self.speed <= 0:
+                cursor = min(cursor + 1, len(records) - 1)
+            else:
+                now = self.virtual_time()
+                cursor = max(cursor, 0)
+                while cursor + 1 < len(records) and records[cursor + 1]['t'] <= now:
+                    cursor += 1
+            self.cursors[key] = cursor
+            self.served += 1
+            return records[cursor]
+
+    def body(self, venue, url, params=None):
+        """Тіло відповіді як bytes"""
+        return self.lookup(venue, url, params)['body'].encode('utf-8')
+
+    def get_status(self):
+        return {
+            'path': self.path,
+            'speed': self.speed,
+            'entries': len(self.entries),
+            'served': self.served,
+            'misses': self.misses,
+            'elapsed': round(self.virtual_time() - self.t0, 3)
+        }
+
+
+class ReplayResponse:
+    """Мінімальна заміна requests.Response для SimpleBinanceClient"""
+
+    def __init__(self, entry):
+        self.status_code = entry['status']
+        self.headers = {}
+        self.content = entry['body'].encode('utf-8')
+        self.text = entry['body']
+
+    def json(self):
+        return json.loads(self.text)
+
+
+# ==================== ГЛОБАЛЬНИЙ СТАН ====================
+
+_recorder = None
+_replayer = None
+_state_lock = threading.Lock()
+_env_lock = threading.Lock()
+_env_checked = False
+
+
+def _init_from_env():
+    global _env_checked
+    if _env_checked:
+        return
+    with _env_lock:
+        if _env_checked:
+            return
+        if os.environ.get(REPLAY_ENV):
+            start_replay(os.environ[REPLAY_ENV], float(os.environ.get(SPEED_ENV, 1)))
+        elif os.environ.get(RECORD_ENV):
+            start_recording(os.environ[RECORD_ENV])
+        _env_checked = True
+
+
+def start_recording(path):
+    """Писати всі відповіді бірж у корпус path"""
+    global _recorder
+    with _state_lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = Recorder(path)
+    atexit.register(_recorder.close)
+    logger.info(f"Запис відповідей у {path}")
+    return _recorder
+
+
+def start_replay(path, speed=1.0):
+    """Відповідати з корпусу path замість мережі"""
+    global _replayer
+    with _state_lock:
+        _replayer = Replayer(path, speed)
+    logger.info(f"Відтворення {path}: {len(_replayer.entries)} записів, швидкість {speed}")
+    return _replayer
+
+
+def stop():
+    global _recorder, _replayer
+    with _state_lock:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = None
+        _replayer = None
+
+
+def get_recorder():
+    _init_from_env()
+    return _recorder
+
+
+def get_replayer():
+    _init_from_env()
+    return _replayer
+
+
+def wrap_ccxt(exchange, venue):
+    """Пропустити HTTP запити ccxt біржі через запис / відтворення
+
+    Підміняє exchange.fetch(): ccxt повертає з нього вже розібраний JSON,
+    тож у корпус пишеться саме він.
+    """
+    original = exchange.fetch
+
+    def fetch(url, method='GET', headers=None, body=None):
+        replayer = get_replayer()
+        if replayer is not None:
+            return json.loads(replayer.lookup(venue, url)['body'])
+        result = original(url, method, headers, body)
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.write(venue, url, None, 200, result)
+        return result
+
+    exchange.fetch = fetch
+    return exchange
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Корпус відповідей бірж")
+    parser.add_argument('path', help="файл корпусу (.jsonl.gz)")
+    args = parser.parse_args()
+
+    entries = load_corpus(args.path)
+    if not entries:
+        print("⚠️  Корпус порожній")
+        return
+
+    print("=" * 80)
+    print(f"📼 КОРПУС {args.path}")
+    print(f"   Записів: {len(entries)}, тривалість {entries[-1]['t'] - entries[0]['t']:.1f} с")
+    print("=" * 80)
+    by_key = {}
+    for entry in entries:
+        count, size = by_key.get(entry['key'], (0, 0))
+        by_key[entry['key']] = (count + 1, size + len(entry['body']))
+    for key, (count, size) in sorted(by_key.items()):
+        print(f"{count:>5} × {size / count / 1024:>8.1f} KB  {key}")
+
+
+if __name__ == '__main__':
+    main()
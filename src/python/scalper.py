@@ -8,6 +8,9 @@ import threading
 from datetime import datetime
 from collections import deque
 
+from replay import get_recorder, get_replayer, ReplayResponse
+from scheduler import get_scheduler, request_weight
+
 # Налаштування логування
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,11 +22,26 @@ class SimpleBinanceClient:
     def __init__(self):
         self.base_url = "https://api.binance.com/api/v3"
     
+    def _get(self, url, params, timeout):
+        """GET з урахуванням ліміту ваги Binance (та запису / відтворення)"""
+        replayer = get_replayer()
+        if replayer is not None:
+            return ReplayResponse(replayer.lookup('Binance', url, params))
+        
+        scheduler = get_scheduler()
+        scheduler.acquire('Binance', request_weight('Binance', url, params))
+        response = requests.get(url, params=params, timeout=timeout)
+        scheduler.record_response('Binance', response.status_code, response.headers)
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.write('Binance', url, params, response.status_code, response.content)
+        return response
+    
     def get_current_price(self, symbol="SOLUSDT"):
         """Отримати поточну ціну"""
         try:
             url = f"{self.base_url}/ticker/price"
-            response = requests.get(url, params={"symbol": symbol}, timeout=5)
+            response = self._get(url, {"symbol": symbol}, timeout=5)
             data = response.json()
             return float(data['price'])
         except Exception as e:
@@ -39,7 +57,7 @@ class SimpleBinanceClient:
                 "interval": interval,
                 "limit": limit
             }
-            response = requests.get(url, params=params, timeout=10)
+            response = self._get(url, params, timeout=10)
             data = response.json()
             
             candles = []
@@ -208,13 +226,20 @@ class EMAScalperSimple:
         
         self.running = True
         
+        # Інтервал опитування 1-10 с підлаштовує планувальник за бюджетом Binance
+        scheduler = get_scheduler()
+        consumer = scheduler.register(f"scalper:{self.symbol}", 'Binance', weight=4,
+                                      interval=2, min_interval=1, max_interval=10)
+        
         def stream_loop():
             logger.info("Запуск потоку даних...")
             while self.running:
                 try:
+                    scheduler.wait(consumer)
+                    if not self.running:
+                        break
                     if self.update_price():
                         logger.debug("Оновлення ціни успішне")
-                    time.sleep(2)  # Оновлюємо кожні 2 секунди
                 except Exception as e:
                     logger.error(f"Помилка в потоці: {e}")
                     time.sleep(5)
@@ -228,6 +253,7 @@ class EMAScalperSimple:
         self.running = False
         if self.stream_thread:
             self.stream_thread.join(timeout=5)
+        get_scheduler().unregister(f"scalper:{self.symbol}")
         logger.info("Потік даних зупинено")
     
     def get_status(self):
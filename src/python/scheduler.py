@@ -0,0 +1,265 @@
+# src/python/scheduler.py - планувальник запитів з урахуванням лімітів бірж
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# ==================== ЛІМІТИ БІРЖ ====================
+# capacity - вага за вікно window (сек); headers - звідки брати фактичне використання.
+# Значення трохи нижчі за офіційні, щоб лишався запас.
+
+VENUE_LIMITS = {
+    'Binance': {'capacity': 5400, 'window': 60,
+                'used_header': 'X-MBX-USED-WEIGHT-1M'},
+    'Bybit': {'capacity': 550, 'window': 5,
+              'remain_header': 'X-Bapi-Limit-Status', 'limit_header': 'X-Bapi-Limit'},
+    'MEXC': {'capacity': 450, 'window': 10},
+    'Gate.io': {'capacity': 180, 'window': 10,
+                'remain_header': 'X-Gate-RateLimit-Requests-Remain',
+                'limit_header': 'X-Gate-RateLimit-Limit'},
+    'HTX': {'capacity': 700, 'window': 10},
+    'OKX': {'capacity': 18, 'window': 2},
+    'KuCoin': {'capacity': 1800, 'window': 30},
+    'Bitget': {'capacity': 18, 'window': 1},
+    'Kraken': {'capacity': 1, 'window': 1},
+}
+
+DEFAULT_LIMIT = {'capacity': 100, 'window': 10}
+
+# Вага запиту за шляхом (все інше = 1)
+REQUEST_WEIGHTS = {
+    'Binance': {'/api/v3/ticker/24hr': 80, '/api/v3/ticker/price': 4,
+                '/api/v3/depth': 5, '/api/v3/klines': 2, '/api/v3/ticker/bookTicker': 4},
+    'MEXC': {'/api/v3/ticker/24hr': 40, '/api/v3/ticker/price': 2, '/api/v3/depth': 1},
+    'KuCoin': {'/api/v1/market/allTickers': 15, '/api/v1/market/orderbook/level2_20': 2},
+}
+
+# Межі завантаження бакета для адаптації частоти
+SPEED_UP_BELOW = 0.5       # використано < 50% - можна частіше
+BACK_OFF_ABOVE = 0.8       # використано > 80% - рідше
+SPEED_UP_FACTOR = 0.8
+BACK_OFF_FACTOR = 1.5
+
+
+def request_weight(venue, url, params=None):
+    """Вага запиту за таблицею REQUEST_WEIGHTS"""
+    path = urlparse(url).path
+    weight = REQUEST_WEIGHTS.get(venue, {}).get(path, 1)
+    # Binance: тікер по одному символу значно дешевший за повний дамп,
+    # список symbols=[...] коштує 2 / 40 / 80 залежно від кількості
+    if venue == 'Binance' and params and path.startswith('/api/v3/ticker'):
+        if 'symbol' in params:
+            weight = 2
+        elif 'symbols' in params:
+            count = len(json.loads(params['symbols']))
+            weight = 2 if count <= 20 else 40 if count <= 100 else 80
+    return weight
+
+
+# ==================== TOKEN BUCKET ====================
+
+class TokenBucket:
+    """Бакет ваги: поповнюється рівномірно, capacity за window секунд"""
+
+    def __init__(self, capacity, window):
+        self.capacity = float(capacity)
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, weight):
+        """Зарезервувати вагу; повертає скільки секунд треба почекати"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= weight
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now, 0.0)
+
+    def delay_for(self, weight):
+        """Скільки чекати, щоб вистачило ваги (без резервування)"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            shortage = weight - self.tokens
+            delay = shortage / self.rate if shortage > 0 else 0.0
+            return max(delay, self.blocked_until - now, 0.0)
+
+    def sync_used(self, used):
+        """Біржа повідомила фактичне використання у вікні"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    def block(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+    def utilization(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return min(1.0, max(0.0, 1 - self.tokens / self.capacity))
+
+
+# ==================== ПЛАНУВАЛЬНИК ====================
+
+class PollScheduler:
+    """Спільний облік ваги запитів по біржах та адаптивна частота споживачів
+
+    Кожен споживач (потік цін, скальпер, сканер) реєструє свою біржу,
+    вагу одного опитування та межі інтервалу; wait() сам прискорюється,
+    коли бюджет біржі простоює, і відступає при навантаженні або 429.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(VENUE_LIMITS)
+        self.limits.update(limits or {})
+        self.buckets = {}
+        self.consumers = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, venue):
+        with self._lock:
+            bucket = self.buckets.get(venue)
+            if bucket is None:
+                limit = self.limits.get(venue, DEFAULT_LIMIT)
+                bucket = TokenBucket(limit['capacity'], limit['window'])
+                self.buckets[venue] = bucket
+                self.stats[venue] = {'requests': 0, 'weight': 0, 'throttled': 0, 'last_status': None}
+            return bucket
+
+    def reserve(self, venue, weight=1):
+        """Зарезервувати вагу запиту; повертає затримку в секундах"""
+        delay = self.bucket(venue).reserve(weight)
+        stats = self.stats[venue]
+        stats['requests'] += 1
+        stats['weight'] += weight
+        return delay
+
+    def acquire(self, venue, weight=1):
+        """Блокуюча версія reserve() для синхронного коду"""
+        delay = self.reserve(venue, weight)
+        if delay > 0:
+            time.sleep(delay)
+
+    def limit_headers(self, venue, headers):
+        """Заголовки відповіді, які читає record_response (для корпусу replay.py)"""
+        limit = self.limits.get(venue, DEFAULT_LIMIT)
+        names = [limit.get(key) for key in ('used_header', 'remain_header', 'limit_header')]
+        return {name: headers[name] for name in names + ['Retry-After']
+                if name and headers.get(name) is not None}
+
+    def record_response(self, venue, status, headers):
+        """Врахувати відповідь біржі: заголовки використання та 429/418"""
+        bucket = self.bucket(venue)
+        limit = self.limits.get(venue, DEFAULT_LIMIT)
+        self.stats[venue]['last_status'] = status
+
+        try:
+            if limit.get('used_header') and headers.get(limit['used_header']):
+                bucket.sync_used(float(headers[limit['used_header']]))
+            elif limit.get('remain_header') and headers.get(limit['remain_header']):
+                remain = float(headers[limit['remain_header']])
+                total = float(headers.get(limit.get('limit_header')) or limit['capacity'])
+                bucket.sync_used(bucket.capacity * (1 - remain / total) if total else 0)
+        except (TypeError, ValueError):
+            pass
+
+        if status in (418, 429):
+            retry_after = headers.get('Retry-After')
+            try:
+                pause = float(retry_after) if retry_after else limit['window']
+            except ValueError:
+                pause = limit['window']
+            bucket.block(pause)
+            self.stats[venue]['throttled'] += 1
+            for consumer in self.consumers.values():
+                if consumer['venue'] == venue:
+                    consumer['interval'] = min(consumer['max_interval'],
+                                               consumer['interval'] * BACK_OFF_FACTOR * 2)
+            logger.warning(f"{venue}: {status}, пауза {pause:.0f} с")
+
+    # ---------- споживачі ----------
+
+    def register(self, name, venue, weight=1, interval=5, min_interval=1, max_interval=60):
+        """Зареєструвати споживача з базовим інтервалом та межами"""
+        with self._lock:
+            self.consumers[name] = {
+                'venue': venue, 'weight': weight, 'interval': float(interval),
+                'min_interval': float(min_interval), 'max_interval': float(max_interval),
+                'next_run': 0.0, 'runs': 0
+            }
+        return name
+
+    def unregister(self, name):
+        with self._lock:
+            self.consumers.pop(name, None)
+
+    def _adapt(self, consumer):
+        utilization = self.bucket(consumer['venue']).utilization()
+        if utilization > BACK_OFF_ABOVE:
+            consumer['interval'] = min(consumer['max_interval'], consumer['interval'] * BACK_OFF_FACTOR)
+        elif utilization < SPEED_UP_BELOW:
+            consumer['interval'] = max(consumer['min_interval'], consumer['interval'] * SPEED_UP_FACTOR)
+
+    def wait(self, name, stop_event=None):
+        """Почекати до наступного опитування споживача
+
+        Тільки задає темп: вагу резервує сам запит (reserve / acquire).
+        Повертає False, якщо stop_event встановлено під час очікування.
+        """
+        consumer = self.consumers[name]
+        self._adapt(consumer)
+        now = time.monotonic()
+        delay = max(0.0, consumer['next_run'] - now)
+        delay = max(delay, self.bucket(consumer['venue']).delay_for(consumer['weight']))
+
+        if delay > 0:
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        consumer['next_run'] = time.monotonic() + consumer['interval']
+        consumer['runs'] += 1
+        return True
+
+    def get_status(self):
+        return {
+            'venues': {
+                venue: dict(self.stats[venue],
+                            utilization=round(bucket.utilization(), 3),
+                            capacity=bucket.capacity)
+                for venue, bucket in list(self.buckets.items())
+            },
+            'consumers': {
+                name: {'venue': c['venue'], 'interval': round(c['interval'], 2), 'runs': c['runs']}
+                for name, c in list(self.consumers.items())
+            }
+        }
+
+
+# ==================== ГЛОБАЛЬНИЙ ЕКЗЕМПЛЯР ====================
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Спільний планувальник (один на процес)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PollScheduler()
+    return _scheduler
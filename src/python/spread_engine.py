@@ -0,0 +1,211 @@
+# src/python/spread_engine.py - векторний пошук міжбіржового арбітражу
+import numpy as np
+
+from market_snapshot import base_groups
+from price_consensus import apply_consensus, count_reasons
+
+# ==================== ФІЛЬТРИ ====================
+
+MIN_SPREAD = 1.0          # %, не включно
+MAX_SPREAD = 100.0        # %, не включно
+MIN_VOLUME = 100000       # USD на кожній стороні угоди
+MIN_EXCHANGES = 3         # мінімум бірж з ціною
+MAX_QUOTE_AGE = 60        # секунд; старіші ціни не беруть участі в аналізі
+
+# Ціни в інших одиницях (×10ⁿ) і абсурдні ноги - price_consensus.py
+
+
+def group_rows(snapshot, rows):
+    """Рядки rows разом з усіма ринками їх базових активів
+
+    evaluate_rows порівнює ринки однієї монети між собою, тож перераховувати
+    треба всю групу (живий двигун: змінився SOL/USDC - перерахунок і SOL/USDT).
+    """
+    layout = snapshot.layout()
+    if not layout['grouped']:
+        return rows
+    base_ids = layout['base_ids']
+    touched = np.zeros(len(layout['reps']), dtype=bool)
+    touched[base_ids[rows]] = True
+    return np.flatnonzero(touched[base_ids])
+
+
+def _group_pick(values, order, starts, group, best):
+    """Рядок з кращим значенням у кожній групі (best - np.fmin / np.fmax)
+
+    order - рядки, впорядковані за групами (starts - початки груп, group -
+    група кожної позиції order); нічия - перший рядок групи, NaN не обирається,
+    якщо в групі є число.
+    """
+    ranked = values[order]
+    target = best.reduceat(ranked, starts)[group]
+    hits = np.flatnonzero((ranked == target) | (target != target))
+    return order[hits[np.concatenate(([True], group[hits[1:]] != group[hits[:-1]]))]]
+
+
+def evaluate_rows(snapshot, rows, now=None, min_spread=MIN_SPREAD, max_spread=MAX_SPREAD,
+                  min_volume=MIN_VOLUME, min_exchanges=MIN_EXCHANGES,
+                  max_age=MAX_QUOTE_AGE, scales=None):
+    """Кращі ноги, спред і фільтри для рядків rows знімка (масиви по рядках)
+
+    rows - масив ID пар за зростанням або slice(None) для всіх (з усіма
+    ринками кожної монети - group_rows); now - момент, від якого рахується вік комірок
+    (за замовчуванням snapshot.timestamp).
+    Перед вибором ніг ціни проходять консенсус бірж (price_consensus):
+    scales - ScaleCache (None - спільний кеш процесу).
+    Ціни та об'єми ніг переводяться в USD курсами котирувань знімка (ноги
+    без курсу не торгуються), і кращі купівля / продаж шукаються серед усіх
+    ринків монети: SOL/USDC на одній біржі проти SOL/USDT на іншій.
+    Результат монети - у рядку її пари-представника (SymbolIndex.base_pairs),
+    решта її рядків не відбираються; buy_row / sell_row - ID пар ніг.
+    Спільне ядро find_opportunities та інкрементального live_engine.
+    """
+    now = snapshot.timestamp if now is None else now
+    present = snapshot.mask[rows]
+    ages = np.where(present, now - snapshot.updated[rows], np.inf)
+    prices = snapshot.prices[rows].copy()
+    mask = present & (prices > 0)
+    if max_age is not None:
+        mask &= ages <= max_age
+    asks = np.where(snapshot.asks[rows] > 0, snapshot.asks[rows], prices)
+    bids = np.where(snapshot.bids[rows] > 0, snapshot.bids[rows], prices)
+    suspicious, scaled, rejections = apply_consensus(snapshot, rows, prices, mask, asks, bids,
+                                                     scales=scales)
+
+    # Ціни ніг у USD; рядки без консенсусу ніг не дають
+    layout = snapshot.layout()
+    _, usd = snapshot.quote_rates()
+    ids = np.arange(len(snapshot.index))[rows]
+    local = np.arange(len(ids))
+    rates = usd[layout['quote_ids'][ids]]
+    legs = mask & ~suspicious[:, None]
+    if np.isnan(usd).any():
+        legs &= ~np.isnan(rates)
+    lo = np.where(legs, asks * rates, np.inf)
+    hi = np.where(legs, bids * rates, -np.inf)
+    row_buy = lo.argmin(axis=1)
+    row_sell = hi.argmax(axis=1)
+    row_lo = lo[local, row_buy]
+    row_hi = hi[local, row_sell]
+
+    # Монета з кількома ринками: кращі ноги серед усіх її рядків
+    counts = mask.sum(axis=1)
+    clean = legs.any(axis=1)
+    blocked = ~clean & suspicious
+    buy_row = sell_row = local
+    report = np.ones(len(ids), dtype=bool)
+    if layout['grouped']:
+        base = layout['base_ids'][ids]
+        # Повне сканування - групи індексу готові (pair_layout)
+        full = len(ids) == len(snapshot.index)
+        order, starts, group, segment = layout['groups'] if full else base_groups(base)
+        buy_row = _group_pick(row_lo, order, starts, group, np.fmin)[segment]
+        sell_row = _group_pick(row_hi, order, starts, group, np.fmax)[segment]
+        counts = np.logical_or.reduceat(mask[order], starts, axis=0).sum(axis=1)[segment]
+        clean = np.logical_or.reduceat(clean[order], starts)[segment]
+        blocked = ~clean & np.logical_or.reduceat(suspicious[order], starts)[segment]
+        report = layout['reps'][base] == ids
+
+    buy_idx = row_buy[buy_row]
+    sell_idx = row_sell[sell_row]
+    min_price = row_lo[buy_row]
+    max_price = row_hi[sell_row]
+    buy_rate = rates[buy_row, buy_idx]
+    sell_rate = rates[sell_row, sell_idx]
+    volumes = snapshot.volumes[rows]
+    buy_volume = volumes[buy_row, buy_idx] * buy_rate
+    sell_volume = volumes[sell_row, sell_idx] * sell_rate
+
+    # Без жодної ноги з курсом (і не через консенсус) - монета не аналізується
+    enough = report & (counts >= min_exchanges) & (clean | blocked)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = np.where(enough & clean, (max_price - min_price) / min_price * 100, 0.0)
+
+    suspicious = blocked & enough
+    selected = (enough & ~suspicious
+                & (spread > min_spread) & (spread < max_spread)
+                & (buy_volume > min_volume) & (sell_volume > min_volume))
+    return {
+        'mask': mask, 'counts': counts, 'enough': enough,
+        'buy_idx': buy_idx, 'sell_idx': sell_idx,
+        'buy_row': ids[buy_row], 'sell_row': ids[sell_row],
+        'min_price': min_price, 'max_price': max_price,
+        'buy_volume': buy_volume, 'sell_volume': sell_volume,
+        'buy_rate': buy_rate, 'sell_rate': sell_rate,
+        'buy_age': ages[buy_row, buy_idx], 'sell_age': ages[sell_row, sell_idx],
+        'spread': spread, 'suspicious': suspicious, 'selected': selected,
+        'scaled': scaled, 'rejections': rejections
+    }
+
+
+def find_opportunities(snapshot, min_spread=MIN_SPREAD, max_spread=MAX_SPREAD,
+                       min_volume=MIN_VOLUME, min_exchanges=MIN_EXCHANGES,
+                       max_age=MAX_QUOTE_AGE, stats=None, scales=None):
+    """Всі пари знімка за кілька операцій над масивами
+
+    Купівля - по кращому ask, продаж - по кращому bid; якщо біржа не
+    віддала bid/ask, для неї використовується остання ціна угоди.
+    Комірки старші max_age секунд ігноруються; кожна можливість
+    отримує вік даних обох ніг (buy_age / sell_age).
+    Можливість - монета (pair - її пара-представник): ноги можуть бути
+    на різних котируваннях (buy_pair / sell_pair), ціни й об'єми - в USD,
+    buy_rate / sell_rate - курси котирувань ніг.
+    Повертає (opportunities, info): список словників у форматі
+    analyze_single_pair, відсортований за спредом, та лічильники фільтрів.
+    stats - SpreadStats (spread_stats.py): сканування оновлює статистику
+    всіх пар з достатньою кількістю бірж, а можливості отримують zscore
+    відносно статистики до цього сканування (None - мало історії).
+    """
+    result = evaluate_rows(snapshot, slice(None), None, min_spread, max_spread,
+                           min_volume, min_exchanges, max_age, scales)
+    spread = result['spread']
+    picked = np.flatnonzero(result['selected'])
+    picked = picked[np.argsort(-spread[picked], kind='stable')]
+    if stats is not None:
+        z = np.round(stats.observe(snapshot.pairs, spread, snapshot.timestamp,
+                                   valid=result['enough'] & ~result['suspicious'])[picked], 3)
+    else:
+        z = np.full(len(picked), np.nan)
+
+    exchanges = snapshot.exchanges
+    pairs = snapshot.pairs
+    opportunities = [
+        {
+            'pair': pairs[row],
+            'spread': s,
+            'buy': exchanges[b],
+            'sell': exchanges[a],
+            'buy_pair': pairs[br],
+            'sell_pair': pairs[sr],
+            'buy_price': bp,
+            'sell_price': sp,
+            'buy_volume': bv,
+            'sell_volume': sv,
+            'buy_rate': bq,
+            'sell_rate': sq,
+            'exchanges': c,
+            'buy_age': round(ba, 3),
+            'sell_age': round(sa, 3),
+            'zscore': None if zs != zs else zs
+        }
+        for row, s, b, a, br, sr, bp, sp, bv, sv, bq, sq, c, ba, sa, zs in zip(
+            picked.tolist(), spread[picked].tolist(),
+            result['buy_idx'][picked].tolist(), result['sell_idx'][picked].tolist(),
+            result['buy_row'][picked].tolist(), result['sell_row'][picked].tolist(),
+            result['min_price'][picked].tolist(), result['max_price'][picked].tolist(),
+            result['buy_volume'][picked].tolist(), result['sell_volume'][picked].tolist(),
+            result['buy_rate'][picked].tolist(), result['sell_rate'][picked].tolist(),
+            result['counts'][picked].tolist(),
+            result['buy_age'][picked].tolist(), result['sell_age'][picked].tolist(),
+            z.tolist()
+        )
+    ]
+
+    info = {
+        'analyzed': int(result['enough'].sum()),
+        'suspicious': [pairs[row] for row in np.flatnonzero(result['suspicious']).tolist()],
+        'scaled': result['scaled'],
+        'rejections': result['rejections'],
+        'rejected': count_reasons(result['rejections'])
+    }
+    return opportunities, info
@@ -0,0 +1,247 @@
+# src/python/spread_history.py - історія спредів пар у кільцевих буферах фіксованого розміру
+import threading
+import time
+
+import numpy as np
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+HISTORY_INTERVAL = 60          # секунд на один слот (у слоті - пік спреду пари за всі сканування інтервалу)
+HISTORY_SLOTS = 2 * 24 * 60    # слотів на пару: 2 доби по хвилині
+MAX_PAIRS = 10000              # пар понад межу не записуються (лічильник dropped)
+GROW_ROWS = 1024               # рядків, на які масиви ростуть при нових парах
+
+# Пам'ять: 6 байт на (пару, слот) - спред float32 + біржі купівлі / продажу uint8.
+# 10k пар × 2880 слотів ≈ 165 MB на максимумі; реально - тільки пари, що траплялись.
+
+
+# ==================== СХОВИЩЕ ====================
+
+class SpreadHistory:
+    """Кільце слотів за часом, спільне для всіх пар
+
+    Слот = номер інтервалу (bucket) за модулем кількості слотів; stamp[slot]
+    - який інтервал зараз у слоті, тож перезапис старих даних і пропуски
+    (сервер не сканував) не потребують окремих покажчиків. Масиви -
+    (пари, слоти): історія пари - один рядок, інтервал - один стовпчик.
+    Кілька сканувань одного інтервалу зливаються: у слоті лишається
+    максимальний спред пари з біржами того сканування, а times[slot] - час
+    останнього з них. Код біржі 0 - пари не було в жодному скануванні інтервалу.
+    """
+
+    def __init__(self, slots=HISTORY_SLOTS, interval=HISTORY_INTERVAL, max_pairs=MAX_PAIRS):
+        self.slots = slots
+        self.interval = interval
+        self.max_pairs = max_pairs
+        self.rows = {}                       # пара → рядок
+        self.pairs = []                      # рядок → пара
+        self.codes = {}                      # біржа → код (1..255)
+        self.venues = [None]                 # код → біржа
+        self.spread = np.zeros((0, slots), np.float32)
+        self.buy = np.zeros((0, slots), np.uint8)
+        self.sell = np.zeros((0, slots), np.uint8)
+        self.stamp = np.full(slots, -1, np.int64)   # інтервал у слоті (-1 - порожній)
+        self.times = np.zeros(slots)                # час сканування, записаного в слот
+        self.scans = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    # ---------- запис ----------
+
+    def _grow(self):
+        rows = min(len(self.spread) + GROW_ROWS, self.max_pairs)
+        for name in ('spread', 'buy', 'sell'):
+            old = getattr(self, name)
+            new = np.zeros((rows, self.slots), old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _row(self, pair):
+        row = self.rows.get(pair)
+        if row is None:
+            if len(self.pairs) >= self.max_pairs:
+                return None
+            if len(self.pairs) == len(self.spread):
+                self._grow()
+            row = self.rows[pair] = len(self.pairs)
+            self.pairs.append(pair)
+        return row
+
+    def _code(self, venue):
+        code = self.codes.get(venue)
+        if code is None:
+            code = self.codes[venue] = len(self.venues)
+            self.venues.append(venue)
+        return code
+
+    def record(self, opportunities, timestamp=None):
+        """Записати одне сканування (можливості з pair / buy / sell / spread)
+
+        Сканування того ж інтервалу, що вже в слоті, оновлює тільки пари, де
+        спред вищий за записаний (пік між двома 30 с скануваннями не губиться).
+        Повертає кількість пар сканування (0 - інтервал слоту вже перезаписано).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        bucket = int(timestamp // self.interval)
+        slot = bucket % self.slots
+        with self._lock:
+            if bucket < self.stamp[slot]:
+                return 0
+            rows, buys, sells, spreads = [], [], [], []
+            for o in opportunities:
+                row = self._row(o['pair'])
+                if row is None:
+                    self.dropped += 1
+                    continue
+                rows.append(row)
+                buys.append(self._code(o['buy']))
+                sells.append(self._code(o['sell']))
+                spreads.append(o['spread'])
+
+            # Новий інтервал: пари попереднього кола кільця - відсутні
+            if bucket != self.stamp[slot]:
+                self.buy[:, slot] = 0
+                self.sell[:, slot] = 0
+                self.spread[:, slot] = 0
+                self.stamp[slot] = bucket
+                self.times[slot] = timestamp
+            count = len(rows)
+            rows = np.asarray(rows, np.intp)
+            spreads = np.asarray(spreads, np.float32)
+            higher = (self.buy[rows, slot] == 0) | (spreads > self.spread[rows, slot])
+            rows = rows[higher]
+            self.buy[rows, slot] = np.asarray(buys, np.uint8)[higher]
+            self.sell[rows, slot] = np.asarray(sells, np.uint8)[higher]
+            self.spread[rows, slot] = spreads[higher]
+            self.times[slot] = max(self.times[slot], timestamp)
+            self.scans += 1
+        return count
+
+    # ---------- читання ----------
+
+    def _slots(self, since, until):
+        """(слоти, інтервали) сканованих інтервалів діапазону, від старих до нових"""
+        last = int(self.stamp.max())
+        if last < 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        end = last if until is None else min(last, int(until // self.interval))
+        start = end - self.slots + 1
+        if since is not None:
+            start = max(start, int(since // self.interval))
+        buckets = np.arange(start, end + 1, dtype=np.int64)
+        slots = buckets % self.slots
+        scanned = self.stamp[slots] == buckets
+        return slots[scanned], buckets[scanned]
+
+    def _summary(self, present, spreads, times):
+        """Підсумок рядка: present / spreads / times - по сканованих слотах"""
+        if not present.any():
+            return None
+        values = spreads[present]
+        seen = times[present]
+        # Безперервна присутність до останнього сканування діапазону
+        streak_since = None
+        if present[-1]:
+            gaps = np.flatnonzero(~present)
+            streak_since = float(times[gaps[-1] + 1] if len(gaps) else times[0])
+        return {
+            'samples': int(present.sum()),
+            'avg_spread': round(float(values.mean()), 4),
+            'max_spread': round(float(values.max()), 4),
+            'last_spread': round(float(values[-1]), 4),
+            'first_seen': float(seen[0]),
+            'last_seen': float(seen[-1]),
+            'streak_since': streak_since,
+            'streak': round(float(times[-1]) - streak_since, 3) if streak_since is not None else 0
+        }
+
+    def pair(self, pair, since=None, until=None, min_spread=0.0):
+        """Історія однієї пари: точки (спред > min_spread) та підсумок
+
+        Точка - пік спреду за інтервал (interval секунд) з біржами цього піку;
+        timestamp - час останнього сканування інтервалу.
+        """
+        with self._lock:
+            row = self.rows.get(pair)
+            slots, _ = self._slots(since, until)
+            times = self.times[slots]
+            if row is None:
+                spreads = np.zeros(len(slots), np.float32)
+                buys = sells = np.zeros(len(slots), np.uint8)
+            else:
+                spreads = self.spread[row, slots]
+                buys = self.buy[row, slots]
+                sells = self.sell[row, slots]
+            venues = list(self.venues)
+
+        present = (buys > 0) & (spreads > min_spread)
+        points = [
+            {'timestamp': float(times[i]), 'buy': venues[buys[i]],
+             'sell': venues[sells[i]], 'spread': round(float(spreads[i]), 4)}
+            for i in np.flatnonzero(present)
+        ]
+        return {
+            'pair': pair,
+            'interval': self.interval,
+            'scans': len(slots),
+            'points': points,
+            'summary': self._summary(present, spreads, times)
+        }
+
+    def range(self, since=None, until=None, min_spread=0.0, limit=None):
+        """Пари, що траплялись у діапазоні (спред > min_spread), за макс. спредом ↓
+
+        Копіюється тільки блок (пари × скановані слоти діапазону).
+        """
+        with self._lock:
+            slots, _ = self._slots(since, until)
+            n = len(self.pairs)
+            times = self.times[slots]
+            spreads = self.spread[:n][:, slots]
+            present = self.buy[:n][:, slots] > 0
+            pairs = list(self.pairs)
+
+        present &= spreads > min_spread
+        rows = np.flatnonzero(present.any(axis=1))
+        peak = np.where(present[rows], spreads[rows], -np.inf).max(axis=1)
+        rows = rows[np.lexsort((rows, -peak))]
+        if limit is not None:
+            rows = rows[:limit]
+        return {
+            'since': float(times[0]) if len(slots) else None,
+            'until': float(times[-1]) if len(slots) else None,
+            'interval': self.interval,
+            'scans': len(slots),
+            'matched': int(present.any(axis=1).sum()),
+            'pairs': [dict(pair=pairs[row], **self._summary(present[row], spreads[row], times))
+                      for row in rows]
+        }
+
+    def get_status(self):
+        last = int(self.stamp.max())
+        return {
+            'pairs': len(self.pairs),
+            'capacity': len(self.spread),
+            'max_pairs': self.max_pairs,
+            'slots': self.slots,
+            'interval': self.interval,
+            'scans': self.scans,
+            'dropped': self.dropped,
+            'bytes': self.spread.nbytes + self.buy.nbytes + self.sell.nbytes,
+            'last_scan': float(self.times[last % self.slots]) if last >= 0 else None
+        }
+
+
+# ==================== ГЛОБАЛЬНИЙ ЕКЗЕМПЛЯР ====================
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_history():
+    """Спільна історія процесу (сканування API і живий режим пишуть сюди)"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = SpreadHistory()
+        return _history
@@ -0,0 +1,166 @@
+# src/python/spread_stats.py - потокова статистика спредів пар та z-оцінки
+import math
+import threading
+
+import numpy as np
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+STATS_TAU = 3600.0     # секунд: стала часу EWMA (вага спостереження падає в e раз за годину)
+MIN_SAMPLES = 10       # спостережень до першої z-оцінки
+STD_FLOOR = 0.05       # %, нижня межа σ: постійний спред без шуму не дає z → ∞
+GROW_ROWS = 1024       # рядків, на які масиви ростуть при нових парах
+
+
+# ==================== СТАТИСТИКА ====================
+
+class SpreadStats:
+    """EWMA середнього і дисперсії спреду кожної пари (масиви по рядках)
+
+    Оновлення за Уелфордом: delta = x - mean; mean += a·delta;
+    var = (1 - a)·(var + a·delta²). Вага a = 1 - exp(-dt / tau) залежить
+    від часу між скануваннями (вони нерівномірні: кеш API, живий режим),
+    але не менша за 1/n - поки історії мало, це звичайні середнє і
+    дисперсія Уелфорда. Одне сканування = одна векторна операція.
+    """
+
+    def __init__(self, tau=STATS_TAU, min_samples=MIN_SAMPLES, std_floor=STD_FLOOR):
+        self.tau = tau
+        self.min_samples = min_samples
+        self.std_floor = std_floor
+        self.rows = {}                 # пара → рядок
+        self.pairs = []
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.count = np.zeros(0, np.int64)
+        self.seen = np.zeros(0)        # час останнього спостереження
+        self.scans = 0
+        self._mapped = (None, None)    # (список пар, рядки) останнього виклику
+        self._lock = threading.Lock()
+
+    def _grow(self, size):
+        rows = max(size, len(self.mean) + GROW_ROWS)
+        for name in ('mean', 'var', 'count', 'seen'):
+            old = getattr(self, name)
+            new = np.zeros(rows, old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _map(self, pairs):
+        """Рядки статистики для списку пар (кешується: знімки повторюють список)
+
+        Якщо рядки йдуть підряд (звичайно для пар універсуму) - slice:
+        оновлення тоді йде по видах масивів, без копій.
+        """
+        cached, rows = self._mapped
+        if cached is not None and (cached is pairs or cached == pairs):
+            return rows
+        rows = np.empty(len(pairs), np.intp)
+        for i, pair in enumerate(pairs):
+            row = self.rows.get(pair)
+            if row is None:
+                row = self.rows[pair] = len(self.pairs)
+                self.pairs.append(pair)
+            rows[i] = row
+        if len(self.pairs) > len(self.mean):
+            self._grow(len(self.pairs))
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and (np.diff(rows) == 1).all():
+            rows = slice(int(rows[0]), int(rows[-1]) + 1)
+        self._mapped = (pairs, rows)
+        return rows
+
+    def _z(self, rows, spreads):
+        std = np.maximum(np.sqrt(self.var[rows]), self.std_floor)
+        z = (spreads - self.mean[rows]) / std
+        return np.where(self.count[rows] >= self.min_samples, z, np.nan)
+
+    def observe(self, pairs, spreads, timestamp, valid=None):
+        """Одне сканування: z-оцінки відносно статистики ДО нього, потім оновлення
+
+        pairs - назви пар, spreads - масив спредів (%) у тому ж порядку,
+        valid - маска спостережень (інші не оновлюються, z = NaN).
+        Повертає масив z (NaN - мало історії).
+        """
+        spreads = np.asarray(spreads, dtype=np.float64)
+        ok = np.isfinite(spreads)
+        if valid is not None:
+            ok &= valid
+        with self._lock:
+            rows = self._map(pairs)
+            mean, var, count, seen = self.mean[rows], self.var[rows], self.count[rows], self.seen[rows]
+            std = np.maximum(np.sqrt(var), self.std_floor)
+            z = np.where(ok & (count >= self.min_samples), (spreads - mean) / std, np.nan)
+
+            # Невалідні спостереження: вага 0 - стан рядка не змінюється
+            count += ok
+            with np.errstate(invalid='ignore'):
+                alpha = np.maximum(-np.expm1(-np.maximum(timestamp - seen, 0.0) / self.tau),
+                                   1.0 / np.maximum(count, 1))
+            alpha = np.where(ok, alpha, 0.0)
+            delta = np.where(ok, spreads, mean) - mean
+            mean += alpha * delta
+            var += alpha * delta * delta
+            var *= 1 - alpha
+            seen[ok] = timestamp
+            if not isinstance(rows, slice):
+                self.mean[rows], self.var[rows], self.count[rows], self.seen[rows] = mean, var, count, seen
+            self.scans += 1
+        return z
+
+    def zscores(self, pairs, spreads):
+        """z-оцінки відносно поточної статистики, без оновлення"""
+        spreads = np.asarray(spreads, dtype=np.float64)
+        with self._lock:
+            rows = np.array([self.rows.get(pair, -1) for pair in pairs], np.intp)
+            known = rows >= 0
+            z = np.full(len(rows), np.nan)
+            z[known] = self._z(rows[known], spreads[known])
+        return z
+
+    def annotate(self, opportunities):
+        """Додати 'zscore' можливостям (живий режим: між скануваннями)"""
+        z = self.zscores([o['pair'] for o in opportunities], [o['spread'] for o in opportunities])
+        for o, value in zip(opportunities, z.tolist()):
+            o['zscore'] = zscore_value(value)
+        return opportunities
+
+    def get(self, pair):
+        """Статистика пари або None"""
+        with self._lock:
+            row = self.rows.get(pair)
+            if row is None:
+                return None
+            return {
+                'mean': float(self.mean[row]),
+                'std': float(math.sqrt(self.var[row])),
+                'samples': int(self.count[row]),
+                'last_seen': float(self.seen[row])
+            }
+
+    def get_status(self):
+        return {
+            'pairs': len(self.pairs),
+            'scans': self.scans,
+            'warm': int((self.count >= self.min_samples).sum()),
+            'tau': self.tau
+        }
+
+
+def zscore_value(z):
+    """NaN → None (JSON), інакше округлене значення"""
+    return None if z != z else round(z, 3)
+
+
+# ==================== ГЛОБАЛЬНИЙ ЕКЗЕМПЛЯР ====================
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_spread_stats():
+    """Спільна статистика процесу (сканування і живий режим)"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = SpreadStats()
+        return _stats
@@ -0,0 +1,166 @@
+# src/python/symbols.py - канонічний реєстр символів
+import functools
+import threading
+
+from venues import VENUES
+
+# ==================== ФОРМАТИ СИМВОЛІВ ====================
+
+# Котирувальні активи, які розпізнаються в "склеєних" символах (BTCUSDT).
+# Ціни й об'єми ринків не в USDT переводяться в USD курсами того ж знімка
+# (MarketSnapshot.quote_rates: BTCUSDT, ETHUSDT, USDCUSDT, FDUSDUSDT), тож
+# ринки одного базового активу порівнюються між собою (SOL/USDC vs SOL/USDT)
+QUOTE_ASSETS = ('USDT', 'USDC', 'FDUSD', 'BTC', 'ETH')
+USD_QUOTE = 'USDT'   # котирування, яке вважається USD
+
+# Як біржа записує пару BASE/QUOTE у розібраних даних (з реєстру venues.py;
+# символи вже у верхньому регістрі, aliases - власні назви активів біржі)
+SYMBOL_FORMATS = {
+    name: {'separator': adapter['separator'], 'aliases': adapter.get('aliases', {})}
+    for name, adapter in VENUES.items()
+}
+
+DEFAULT_FORMAT = {'separator': '', 'aliases': {}}
+
+
+@functools.lru_cache(maxsize=None)
+def _longest_first(quotes):
+    return tuple(sorted(quotes, key=len, reverse=True))
+
+
+def split_symbol(symbol, quotes=QUOTE_ASSETS, separator=''):
+    """BTCUSDT → ('BTC', 'USDT'); None якщо котирування невідоме
+
+    Котирування шукається тільки в кінці символу, тому USDTXUSDT
+    коректно дає ('USDTX', 'USDT'); довші котирування перевіряються
+    першими (BTCFDUSD - FDUSD, а не ...USD).
+    """
+    symbol = symbol.upper()
+    if separator:
+        base, sep, quote = symbol.rpartition(separator)
+        if not sep or not base or quote not in quotes:
+            return None
+        return base, quote
+
+    for quote in _longest_first(tuple(quotes)):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return None
+
+
+def native_symbol(exchange, base, quote):
+    """Символ пари у форматі біржі"""
+    fmt = SYMBOL_FORMATS.get(exchange, DEFAULT_FORMAT)
+    native = {canonical: own for own, canonical in fmt['aliases'].items()}
+    return f"{native.get(base, base)}{fmt['separator']}{native.get(quote, quote)}"
+
+
+def canonical_from_native(exchange, symbol, quotes=QUOTE_ASSETS):
+    """Символ біржі → (base, quote) або None
+
+    Котирування розпізнається і у власному написанні біржі (Kraken: ETHXBT).
+    """
+    fmt = SYMBOL_FORMATS.get(exchange, DEFAULT_FORMAT)
+    aliases = fmt['aliases']
+    if aliases:
+        quotes = tuple(quotes) + tuple(own for own, canonical in aliases.items()
+                                       if canonical in quotes and own not in quotes)
+    parts = split_symbol(symbol, quotes, fmt['separator'])
+    if parts is None or not aliases:
+        return parts
+    base, quote = parts
+    return aliases.get(base, base), aliases.get(quote, quote)
+
+
+# ==================== ІНДЕКС ====================
+
+class SymbolIndex:
+    """Відображення канонічних пар у цілі ID та нативні символи бірж
+
+    Будується один раз на універсум; пошук по парі чи символу біржі
+    зводиться до звернення за індексом у списку.
+    """
+
+    def __init__(self, pairs, exchanges, quotes=QUOTE_ASSETS, natives=None):
+        self.pairs = []
+        self.bases = []
+        self.quotes = []
+        self.pair_ids = {}
+        self.quote_assets = []   # котирування універсуму (код = позиція)
+        self.quote_ids = []      # ID пари → код котирування
+        self.base_ids = []       # ID пари → код базового активу (ринки однієї монети)
+        base_codes = {}
+
+        for pair in pairs:
+            parts = split_symbol(pair, quotes)
+            if parts is None or pair in self.pair_ids:
+                continue
+            self.pair_ids[pair] = len(self.pairs)
+            self.pairs.append(pair)
+            self.bases.append(parts[0])
+            self.quotes.append(parts[1])
+            if parts[1] not in self.quote_assets:
+                self.quote_assets.append(parts[1])
+            self.quote_ids.append(self.quote_assets.index(parts[1]))
+            self.base_ids.append(base_codes.setdefault(parts[0], len(base_codes)))
+
+        self.exchanges = list(exchanges)
+        self.native = {}
+        self.by_native = {}
+        natives = natives or {}
+        self.version = None   # версія універсуму, якщо індекс з файлу
+        for exchange in self.exchanges:
+            # Готові символи (з файлу універсуму) - тільки якщо відповідають парам
+            symbols = natives.get(exchange)
+            if symbols is None or len(symbols) != len(self.pairs):
+                symbols = [native_symbol(exchange, base, quote)
+                           for base, quote in zip(self.bases, self.quotes)]
+            self.native[exchange] = symbols
+            self.by_native[exchange] = {symbol: pid for pid, symbol in enumerate(symbols)}
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def pair_id(self, pair):
+        """Канонічна назва → ID (або None)"""
+        return self.pair_ids.get(pair)
+
+    def base_pairs(self):
+        """Код базового активу → ID пари, від імені якої звітується монета
+
+        Пара з USDT, якщо вона є в універсумі, інакше перша за ID.
+        """
+        reps = {}
+        for pid, (code, quote) in enumerate(zip(self.base_ids, self.quotes)):
+            if code not in reps or quote == USD_QUOTE:
+                reps[code] = pid
+        return [reps[code] for code in range(len(reps))]
+
+    def quote_refs(self):
+        """Котирування → ID пари QUOTE/USDT (None - USDT або пари немає в універсумі)"""
+        return [None if quote == USD_QUOTE else self.pair_ids.get(quote + USD_QUOTE)
+                for quote in self.quote_assets]
+
+    def native_symbol(self, exchange, pair_id):
+        """ID → символ біржі"""
+        return self.native[exchange][pair_id]
+
+    def lookup(self, exchange, symbol):
+        """Символ біржі → ID (або None)"""
+        return self.by_native.get(exchange, {}).get(symbol)
+
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+
+def get_index(pairs, exchanges):
+    """Індекс для універсуму (перебудовується тільки якщо змінились пари)"""
+    key = (tuple(pairs), tuple(exchanges))
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is None:
+            _index_cache.clear()
+            index = SymbolIndex(pairs, exchanges)
+            _index_cache[key] = index
+    return index
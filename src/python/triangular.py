@@ -0,0 +1,338 @@
+# src/python/triangular.py - цикловий (трикутний) арбітраж всередині біржі
+import argparse
+import math
+import threading
+import time
+
+import numpy as np
+
+from spread_engine import MIN_VOLUME
+from symbols import canonical_from_native, native_symbol
+from venues import VENUES
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+TRI_QUOTES = ('USDT', 'USDC', 'BTC', 'ETH')   # котирування, з яких будується граф
+MIN_PROFIT = 0.05              # %, після комісій усіх ніг
+MIN_LEG_VOLUME = MIN_VOLUME    # USD за 24 год; тонші пари не входять у граф
+MAX_PASSES = 12                # проходів Bellman-Ford (довші цикли практично не виконувані)
+DEFAULT_FEE = 0.001            # якщо біржа не вказала taker_fee
+EPS = 1e-12                    # покращення відстані, менші за це, ігноруються
+
+_UNKNOWN = object()
+
+
+# ==================== ГРАФ БІРЖІ ====================
+
+class VenueGraph:
+    """Граф валют однієї біржі: вузли - активи, ребра - обмін за кращою ціною
+
+    Ребро base→quote - продаж по bid, quote→base - купівля по ask;
+    вага = -log(отримано за одиницю × (1 - комісія)), тож прибутковий
+    цикл має від'ємну вагу. Ребра створюються один раз на символ;
+    знімки та оновлення тільки переписують ваги (недоступне ребро = +inf).
+    """
+
+    def __init__(self, venue, fee=None, min_volume=MIN_LEG_VOLUME):
+        self.venue = venue
+        self.fee = VENUES.get(venue, {}).get('taker_fee', DEFAULT_FEE) if fee is None else fee
+        self.min_volume = min_volume
+        self.nodes = {}        # актив → ID вузла
+        self.assets = []
+        self.symbols = {}      # символ → (ребро продажу, ребро купівлі, котирування) або None
+        self.edge_symbols = []
+        self._src, self._dst, self._buy = [], [], []
+        self.src = np.zeros(0, dtype=np.intp)
+        self.dst = np.zeros(0, dtype=np.intp)
+        self.is_buy = np.zeros(0, dtype=bool)
+        self.weights = np.zeros(0)
+        self.rates = np.zeros(0)      # ціна ноги (bid для продажу, ask для купівлі)
+        self.volumes = np.zeros(0)    # USD за 24 год
+        self.seen = np.zeros(0, dtype=np.int64)
+        self.generation = 0
+        self.quote_usd = {'USDT': 1.0}
+        self.usd_symbols = {native_symbol(venue, quote, 'USDT'): quote for quote in TRI_QUOTES[1:]}
+        self.changed = True
+        self.last_passes = 0
+        self.last_ms = 0.0
+
+    def _node(self, asset):
+        node = self.nodes.get(asset)
+        if node is None:
+            node = self.nodes[asset] = len(self.assets)
+            self.assets.append(asset)
+        return node
+
+    def _add_symbol(self, symbol):
+        parts = canonical_from_native(self.venue, symbol, TRI_QUOTES)
+        if parts is None:
+            self.symbols[symbol] = None
+            return None
+        base, quote = parts
+        b, q = self._node(base), self._node(quote)
+        sell = len(self._src)
+        self._src += [b, q]
+        self._dst += [q, b]
+        self._buy += [False, True]
+        self.edge_symbols += [symbol, symbol]
+        info = self.symbols[symbol] = (sell, sell + 1, quote)
+        return info
+
+    def _grow(self):
+        """Нові ребра → масиви (рідко: тільки при появі нових символів)"""
+        added = len(self._src) - len(self.weights)
+        if added <= 0:
+            return
+        self.src = np.asarray(self._src, dtype=np.intp)
+        self.dst = np.asarray(self._dst, dtype=np.intp)
+        self.is_buy = np.asarray(self._buy, dtype=bool)
+        self.weights = np.concatenate([self.weights, np.full(added, np.inf)])
+        self.rates = np.concatenate([self.rates, np.zeros(added)])
+        self.volumes = np.concatenate([self.volumes, np.zeros(added)])
+        self.seen = np.concatenate([self.seen, np.zeros(added, dtype=np.int64)])
+
+    def update(self, tickers, full=False):
+        """Оновити ваги з {символ: {'price', 'bid', 'ask', 'volume'}}
+
+        full=True - це повний знімок біржі: символи, яких у ньому немає,
+        вимикаються. Інакше оновлюються тільки передані символи.
+        Повертає кількість оновлених ребер.
+        """
+        for symbol, quote in self.usd_symbols.items():
+            item = tickers.get(symbol)
+            if item and item['price'] > 0:
+                self.quote_usd[quote] = item['price']
+
+        edges, rates, volumes = [], [], []
+        for symbol, item in tickers.items():
+            info = self.symbols.get(symbol, _UNKNOWN)
+            if info is _UNKNOWN:
+                info = self._add_symbol(symbol)
+            if info is None:
+                continue
+            sell, buy, quote = info
+            usd = self.quote_usd.get(quote, 0.0)
+            volume = item['volume'] * usd
+            edges += (sell, buy)
+            rates += (item['bid'], item['ask'])
+            volumes += (volume, volume)
+        self._grow()
+        self.generation += 1
+
+        if edges:
+            edges = np.asarray(edges, dtype=np.intp)
+            rates = np.asarray(rates, dtype=np.float64)
+            volumes = np.asarray(volumes, dtype=np.float64)
+            bids, asks = rates[0::2], rates[1::2]
+            # Перехрещений або порожній стакан і тонкі пари - поза графом
+            usable = np.repeat((bids > 0) & (asks > bids) & (volumes[0::2] >= self.min_volume), 2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_rates = np.log(np.where(usable, rates, 1.0))
+            weights = np.where(self.is_buy[edges], log_rates, -log_rates) - math.log1p(-self.fee)
+            self.weights[edges] = np.where(usable, weights, np.inf)
+            self.rates[edges] = rates
+            self.volumes[edges] = volumes
+            self.seen[edges] = self.generation
+        if full:
+            self.weights[self.seen != self.generation] = np.inf
+        self.changed = True
+        return len(edges)
+
+    # ---------- пошук циклів ----------
+
+    def _pred_cycles(self, pred, src):
+        """Цикли в графі попередників (кожен - список активних ребер по порядку)
+
+        Подвоєння вказівників: після 2^k ≥ n кроків вузол стоїть на циклі,
+        якщо не дійшов до кореня; далі цикл проходиться вже в Python.
+        """
+        n = len(pred)
+        sentinel = n
+        parent = np.full(n + 1, sentinel, dtype=np.intp)
+        has_pred = pred >= 0
+        parent[:n][has_pred] = src[pred[has_pred]]
+        jump = parent
+        for _ in range(max(1, int(n).bit_length())):
+            jump = jump[jump]
+        cycles, visited = [], set()
+        for node in np.unique(jump[:n][jump[:n] != sentinel]).tolist():
+            if node in visited:
+                continue
+            edges, v = [], node
+            while True:
+                visited.add(v)
+                edge = int(pred[v])
+                edges.append(edge)
+                v = int(src[edge])
+                if v == node:
+                    break
+            cycles.append(edges[::-1])
+        return cycles
+
+    def find_cycles(self, min_profit=MIN_PROFIT, max_passes=MAX_PASSES):
+        """Прибуткові цикли: векторний Bellman-Ford від віртуального джерела
+
+        Усі вузли стартують з відстанню 0, тож знаходяться цикли в будь-якій
+        частині графа; після кожного проходу граф попередників перевіряється
+        на цикли (цикл у ньому завжди має від'ємну вагу).
+        """
+        start = time.perf_counter()
+        active = np.flatnonzero(np.isfinite(self.weights))
+        n = len(self.assets)
+        found = {}
+        passes = 0
+        if n and len(active):
+            src, dst, w = self.src[active], self.dst[active], self.weights[active]
+            dist = np.zeros(n)
+            pred = np.full(n, -1, dtype=np.intp)
+            for passes in range(1, min(max_passes, n) + 1):
+                candidate = dist[src] + w
+                best = dist.copy()
+                np.minimum.at(best, dst, candidate)
+                improved = best < dist - EPS
+                if not improved.any():
+                    break
+                winners = np.flatnonzero(improved[dst] & (candidate <= best[dst]))
+                pred[dst[winners]] = winners
+                dist = np.where(improved, best, dist)
+                for edges in self._pred_cycles(pred, src):
+                    cycle = self._describe([int(active[e]) for e in edges])
+                    if cycle['profit'] >= min_profit:
+                        found.setdefault(tuple(cycle['path']), cycle)
+        self.changed = False
+        self.last_passes = passes
+        self.last_ms = (time.perf_counter() - start) * 1000
+        return sorted(found.values(), key=lambda c: -c['profit'])
+
+    def _describe(self, edges):
+        """Цикл з ребер графа → словник для API (шлях починається з USDT, якщо є)"""
+        nodes = [int(self.src[e]) for e in edges]
+        first = nodes.index(self.nodes['USDT']) if self.nodes.get('USDT') in nodes else nodes.index(min(nodes))
+        edges = edges[first:] + edges[:first]
+        weight = float(self.weights[edges].sum())
+        legs = [{
+            'symbol': self.edge_symbols[e],
+            'side': 'buy' if self.is_buy[e] else 'sell',
+            'from': self.assets[self.src[e]],
+            'to': self.assets[self.dst[e]],
+            'price': float(self.rates[e]),
+            'volume': float(self.volumes[e])
+        } for e in edges]
+        return {
+            'venue': self.venue,
+            'path': [leg['from'] for leg in legs] + [legs[0]['from']],
+            'profit': (math.exp(-weight) - 1) * 100,
+            'legs': legs,
+            'min_volume': min(leg['volume'] for leg in legs)
+        }
+
+    def get_status(self):
+        return {
+            'assets': len(self.assets),
+            'edges': len(self.weights),
+            'active_edges': int(np.isfinite(self.weights).sum()),
+            'fee': self.fee,
+            'passes': self.last_passes,
+            'ms': round(self.last_ms, 3)
+        }
+
+
+# ==================== СКАНЕР ====================
+
+class TriangularScanner:
+    """Графи всіх бірж; кожне сканування тільки оновлює ваги ребер"""
+
+    def __init__(self, min_volume=MIN_LEG_VOLUME):
+        self.min_volume = min_volume
+        self.graphs = {}
+        self._lock = threading.Lock()
+
+    def graph(self, venue):
+        graph = self.graphs.get(venue)
+        if graph is None:
+            graph = self.graphs[venue] = VenueGraph(venue, min_volume=self.min_volume)
+        return graph
+
+    def update(self, venue, tickers, full=False):
+        """Інкрементальне оновлення однієї біржі (напр. з потоку)"""
+        with self._lock:
+            return self.graph(venue).update(tickers, full)
+
+    def scan(self, snapshot=None, min_profit=MIN_PROFIT, venues=None):
+        """Цикли на всіх біржах знімка {venue: {символ: тікер}}
+
+        Без snapshot - спільний знімок exchanges_all (повні дампи бірж).
+        """
+        if snapshot is None:
+            from exchanges_all import get_snapshot
+            snapshot = get_snapshot()
+        cycles = []
+        with self._lock:
+            for venue, tickers in snapshot.items():
+                if venues and venue not in venues:
+                    continue
+                graph = self.graph(venue)
+                if tickers:
+                    graph.update(tickers, full=True)
+                cycles += graph.find_cycles(min_profit)
+        cycles.sort(key=lambda c: -c['profit'])
+        return cycles
+
+    def get_status(self):
+        return {venue: graph.get_status() for venue, graph in self.graphs.items()}
+
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+
+def get_scanner():
+    """Спільний сканер (графи живуть між викликами)"""
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = TriangularScanner()
+    return _scanner
+
+
+def find_triangular(min_profit=MIN_PROFIT, venues=None):
+    """Прибуткові цикли на всіх біржах + стан графів (для API)"""
+    scanner = get_scanner()
+    start = time.time()
+    cycles = scanner.scan(min_profit=min_profit, venues=venues)
+    return {
+        'cycles': cycles,
+        'stats': {
+            'found_cycles': len(cycles),
+            'max_profit': cycles[0]['profit'] if cycles else 0,
+            'time': round(time.time() - start, 3),
+            'timestamp': time.time(),
+            'venues': scanner.get_status()
+        }
+    }
+
+
+# ==================== CLI ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Цикловий арбітраж всередині бірж")
+    parser.add_argument('--min-profit', type=float, default=MIN_PROFIT, help="мінімальний прибуток, %%")
+    args = parser.parse_args()
+
+    result = find_triangular(args.min_profit)
+    print("=" * 80)
+    print(f"🔺 ЦИКЛОВИЙ АРБІТРАЖ (>{args.min_profit}% після комісій)")
+    print("=" * 80)
+    for venue, status in result['stats']['venues'].items():
+        print(f"{venue:<10} {status['assets']:>5} активів, {status['active_edges']:>6} ребер, "
+              f"{status['passes']} проходів, {status['ms']:.1f} мс")
+    print("-" * 80)
+    if not result['cycles']:
+        print("Циклів не знайдено")
+    for cycle in result['cycles'][:15]:
+        print(f"{cycle['venue']:<10} {cycle['profit']:>6.3f}%  {' → '.join(cycle['path'])}  "
+              f"(мін. об'єм ${cycle['min_volume']:,.0f})")
+
+
+if __name__ == '__main__':
+    main()
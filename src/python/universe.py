@@ -0,0 +1,464 @@
+# src/python/universe.py - універсум пар: покриття бірж бітовими масками та версії
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from symbols import SymbolIndex, canonical_from_native, native_symbol, split_symbol
+
+logger = logging.getLogger(__name__)
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+UNIVERSE_TEXT = "pairs_3plus_of_5.txt"       # список пар для людей і старих скриптів
+UNIVERSE_BIN = "universe.bin"                # робочий формат (mmap)
+UNIVERSE_HISTORY = "universe_history.jsonl"  # один рядок = одна нова версія (diff)
+MIN_VENUES = 3                               # пара потрапляє в універсум з N бірж
+REFRESH_INTERVAL = 900                       # секунд між фоновими перебудовами
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+# ==================== ПОКРИТТЯ ====================
+
+def venue_coverage(symbols_by_exchange, exchanges):
+    """{pair: бітова маска бірж}; біт i = exchanges[i]
+
+    Один прохід по символах кожної біржі, без перебору пар × бірж.
+    """
+    masks = {}
+    for bit, exchange in enumerate(exchanges):
+        flag = 1 << bit
+        for symbol in symbols_by_exchange.get(exchange, ()):
+            parts = canonical_from_native(exchange, symbol)
+            if parts:
+                pair = parts[0] + parts[1]
+                masks[pair] = masks.get(pair, 0) | flag
+    return masks
+
+
+class Universe:
+    """Версія універсуму: пари, маска бірж кожної пари та поріг N з M"""
+
+    def __init__(self, exchanges, masks, min_venues=MIN_VENUES, version=0, generated_at=None,
+                 masks_known=True):
+        self.exchanges = list(exchanges)
+        self.masks_known = masks_known
+        self.min_venues = min_venues
+        self.version = version
+        self.generated_at = generated_at if generated_at is not None else time.time()
+        self.seen = len(masks)   # всіх пар до порогу
+        self.masks = {pair: mask for pair, mask in masks.items() if popcount(mask) >= min_venues}
+        self.pairs = sorted(self.masks)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __contains__(self, pair):
+        return pair in self.masks
+
+    def venues(self, pair):
+        """Біржі, на яких є пара"""
+        mask = self.masks.get(pair, 0)
+        return [ex for bit, ex in enumerate(self.exchanges) if mask >> bit & 1]
+
+    def counts(self):
+        """{кількість бірж: кількість пар}"""
+        result = {}
+        for mask in self.masks.values():
+            count = popcount(mask)
+            result[count] = result.get(count, 0) + 1
+        return result
+
+    def diff(self, previous):
+        """Що змінилось відносно попередньої версії
+
+        added / removed - пари; changed - пари, у яких змінився набір бірж
+        (тільки якщо маски попередньої версії відомі і список бірж той самий).
+        """
+        old = previous.masks if previous is not None else {}
+        added = sorted(pair for pair in self.masks if pair not in old)
+        removed = sorted(pair for pair in old if pair not in self.masks)
+        changed = []
+        if previous is not None and previous.masks_known and previous.exchanges == self.exchanges:
+            changed = sorted(pair for pair, mask in self.masks.items()
+                             if pair in old and old[pair] != mask)
+        return {'added': added, 'removed': removed, 'changed': changed}
+
+
+def build_universe(symbols_by_exchange, exchanges=None, min_venues=MIN_VENUES, previous=None):
+    """Новий універсум і diff до попереднього
+
+    Версія збільшується тільки якщо склад пар, їх біржі або список
+    бірж змінились; інакше новий універсум отримує ту саму версію.
+    """
+    exchanges = list(exchanges or symbols_by_exchange)
+    universe = Universe(exchanges, venue_coverage(symbols_by_exchange, exchanges), min_venues)
+    diff = universe.diff(previous)
+    if previous is None:
+        universe.version = 1
+    elif any(diff.values()) or previous.exchanges != exchanges or previous.min_venues != min_venues:
+        universe.version = previous.version + 1
+    else:
+        universe.version = previous.version
+    return universe, diff
+
+
+# ==================== ФАЙЛИ ====================
+
+def write_universe_text(universe, path=UNIVERSE_TEXT):
+    """Текстовий список пар (заголовок з версією - для наступного diff)"""
+    total = len(universe.exchanges)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# Пари на {universe.min_venues}+ біржах (з {total})\n")
+        f.write(f"# Згенеровано: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(universe.generated_at))}\n")
+        f.write(f"# Кількість: {len(universe)}\n")
+        f.write(f"# Версія: {universe.version}\n")
+        f.write(f"# Біржі: {','.join(universe.exchanges)}\n")
+        f.write("#" * 50 + "\n\n")
+        for pair in universe.pairs:
+            f.write(f"{pair}\n")
+
+
+def read_universe_text(path=UNIVERSE_TEXT):
+    """Пари та версія з текстового файлу (None, якщо файлу немає)
+
+    Коментарі могли бути збережені не в UTF-8 (старі файли з Windows),
+    тому вони читаються з заміною невідомих байтів.
+    """
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return None
+
+    pairs = [line for line in lines if line and not line.startswith('#')]
+    version, exchanges, min_venues = 0, [], MIN_VENUES
+    for line in lines:
+        if line.startswith('# Версія:'):
+            try:
+                version = int(line.split(':', 1)[1])
+            except ValueError:
+                pass
+        elif line.startswith('# Біржі:'):
+            exchanges = [name for name in line.split(':', 1)[1].strip().split(',') if name]
+        elif line.startswith('# Пари на ') and '+' in line:
+            try:
+                min_venues = int(line[len('# Пари на '):line.index('+')])
+            except ValueError:
+                pass
+    return {'pairs': pairs, 'version': version, 'exchanges': exchanges, 'min_venues': min_venues}
+
+
+def load_previous(path=UNIVERSE_TEXT, bin_path=UNIVERSE_BIN):
+    """Попередній універсум: з бінарного файлу (з масками) або з текстового"""
+    universe_file = load_universe_file(bin_path)
+    if universe_file is not None:
+        return universe_file.to_universe()
+    saved = read_universe_text(path)
+    if saved is None:
+        return None
+    # Маски невідомі: заглушка з min_venues біт, щоб пройти поріг
+    stub = (1 << saved['min_venues']) - 1
+    return Universe(saved['exchanges'], {pair: stub for pair in saved['pairs']},
+                    saved['min_venues'], saved['version'], masks_known=False)
+
+
+def append_history(universe, diff, path=UNIVERSE_HISTORY):
+    """Дописати diff нової версії (для інкрементального оновлення кешів)"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            'version': universe.version,
+            'generated_at': universe.generated_at,
+            'min_venues': universe.min_venues,
+            'exchanges': universe.exchanges,
+            'size': len(universe),
+            'added': diff['added'],
+            'removed': diff['removed'],
+            'changed': diff['changed']
+        }) + "\n")
+
+
+# ==================== БІНАРНИЙ ФОРМАТ ====================
+# Заголовок: magic, версія формату, кількість бірж, поріг N, версія універсуму,
+#            кількість пар, час генерації, зміщення таблиці рядків
+# Біржі:     (зміщення, довжина) назви в таблиці рядків
+# Записи:    pair_id, маска бірж, (зміщення, довжина) назви пари,
+#            (зміщення, довжина) нативного символу на кожній біржі
+# Рядки:     UTF-8 байти одним блоком
+# Всі числа little-endian; запис фіксованої довжини, тому пара i читається
+# за зміщенням без розбору решти файлу.
+
+BIN_MAGIC = b'SUNV'
+BIN_FORMAT = 1
+_HEADER = struct.Struct('<4sHHHHIIdI')
+_STRING = struct.Struct('<IH')
+_RECORD_HEAD = struct.Struct('<II')
+
+
+class _Strings:
+    def __init__(self):
+        self.blob = bytearray()
+        self.offsets = {}
+
+    def add(self, text):
+        if text not in self.offsets:
+            data = text.encode('utf-8')
+            self.offsets[text] = (len(self.blob), len(data))
+            self.blob += data
+        return self.offsets[text]
+
+
+def write_universe_binary(universe, path=UNIVERSE_BIN):
+    """Записати універсум у бінарний файл (атомарно: tmp + rename)
+
+    Процеси, що вже відобразили старий файл через mmap, продовжують
+    читати стару версію до перевідкриття.
+    """
+    strings = _Strings()
+    exchanges = universe.exchanges
+    exchange_refs = [strings.add(name) for name in exchanges]
+
+    records = bytearray()
+    for pair_id, pair in enumerate(universe.pairs):
+        base, quote = split_symbol(pair)
+        records += _RECORD_HEAD.pack(pair_id, universe.masks[pair])
+        records += _STRING.pack(*strings.add(pair))
+        for exchange in exchanges:
+            records += _STRING.pack(*strings.add(native_symbol(exchange, base, quote)))
+
+    strings_offset = _HEADER.size + _STRING.size * len(exchanges) + len(records)
+    header = _HEADER.pack(BIN_MAGIC, BIN_FORMAT, len(exchanges), universe.min_venues, 0,
+                          universe.version, len(universe.pairs), universe.generated_at,
+                          strings_offset)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for ref in exchange_refs:
+            f.write(_STRING.pack(*ref))
+        f.write(records)
+        f.write(strings.blob)
+    os.replace(tmp, path)
+
+
+class UniverseFile:
+    """Бінарний універсум, відображений у пам'ять (mmap, тільки читання)
+
+    Сторінки файлу спільні для всіх процесів, що його відкрили;
+    рядки декодуються тільки при зверненні.
+    """
+
+    def __init__(self, path=UNIVERSE_BIN):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, fmt, n_exchanges, self.min_venues, _, self.version, self.count,
+         self.generated_at, self._strings) = _HEADER.unpack_from(self._map, 0)
+        if magic != BIN_MAGIC or fmt != BIN_FORMAT:
+            self._map.close()
+            raise ValueError(f"{path}: не файл універсуму (формат {fmt})")
+
+        offset = _HEADER.size
+        self.exchanges = []
+        for _ in range(n_exchanges):
+            self.exchanges.append(self._string(*_STRING.unpack_from(self._map, offset)))
+            offset += _STRING.size
+        self._records = offset
+        self._record_size = _RECORD_HEAD.size + _STRING.size * (1 + n_exchanges)
+        self.exchange_ids = {name: i for i, name in enumerate(self.exchanges)}
+        self._pairs = None
+
+    def _string(self, offset, length):
+        start = self._strings + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def __len__(self):
+        return self.count
+
+    def mask(self, pair_id):
+        return _RECORD_HEAD.unpack_from(self._map, self._records + pair_id * self._record_size)[1]
+
+    def pair(self, pair_id):
+        offset = self._records + pair_id * self._record_size + _RECORD_HEAD.size
+        return self._string(*_STRING.unpack_from(self._map, offset))
+
+    def native(self, exchange, pair_id):
+        """Нативний символ пари на біржі (як записано при генерації)"""
+        column = self.exchange_ids[exchange]
+        offset = (self._records + pair_id * self._record_size
+                  + _RECORD_HEAD.size + _STRING.size * (1 + column))
+        return self._string(*_STRING.unpack_from(self._map, offset))
+
+    @property
+    def pairs(self):
+        if self._pairs is None:
+            self._pairs = [self.pair(i) for i in range(self.count)]
+        return self._pairs
+
+    def natives(self, exchange):
+        return [self.native(exchange, i) for i in range(self.count)]
+
+    def to_universe(self):
+        """Повний Universe (з масками) - напр. як попередня версія для diff"""
+        masks = {self.pair(i): self.mask(i) for i in range(self.count)}
+        return Universe(self.exchanges, masks, self.min_venues, self.version, self.generated_at)
+
+    def close(self):
+        self._map.close()
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_universe_file(path=UNIVERSE_BIN):
+    """Спільний UniverseFile: відкривається один раз, повторно - тільки
+    якщо файл замінили (інша mtime). None, якщо файлу немає."""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _loaded_lock:
+        current = _loaded.get(path)
+        if current is None or current.mtime != mtime:
+            try:
+                current = UniverseFile(path)
+            except (OSError, ValueError, struct.error):
+                return None
+            _loaded[path] = current
+        return current
+
+
+_indexes = {}
+
+
+def get_universe_index(exchanges, path=UNIVERSE_BIN):
+    """SymbolIndex з бінарного універсуму (нативні символи - з файлу)
+
+    Будується один раз на версію файлу; None, якщо файлу немає.
+    """
+    universe_file = load_universe_file(path)
+    if universe_file is None:
+        return None
+    key = (path, universe_file.mtime, tuple(exchanges))
+    with _loaded_lock:
+        index = _indexes.get(key)
+        if index is None:
+            natives = {ex: universe_file.natives(ex) for ex in exchanges
+                       if ex in universe_file.exchange_ids}
+            index = SymbolIndex(universe_file.pairs, exchanges, natives=natives)
+            index.version = universe_file.version
+            _indexes.clear()
+            _indexes[key] = index
+    return index
+
+
+def save_universe(universe, text_path=UNIVERSE_TEXT, bin_path=UNIVERSE_BIN):
+    """Бінарний файл для програм + текстовий список для людей"""
+    write_universe_binary(universe, bin_path)
+    write_universe_text(universe, text_path)
+
+
+# ==================== ФОНОВЕ ОНОВЛЕННЯ ====================
+
+class UniverseRefresher:
+    """Перебудова універсуму за розкладом у фоновому потоці
+
+    Активна версія - один SymbolIndex (пари, нативні символи, version).
+    Нова версія будується повністю осторонь і підміняє посилання active
+    одним присвоєнням; сканування беруть active один раз на початку і
+    доходять до кінця на своїй версії.
+
+    listings - функція без аргументів → {exchange: [символи біржі]}.
+    """
+
+    def __init__(self, listings, exchanges, interval=REFRESH_INTERVAL, min_venues=MIN_VENUES,
+                 text_path=UNIVERSE_TEXT, bin_path=UNIVERSE_BIN, history_path=UNIVERSE_HISTORY):
+        self.listings = listings
+        self.exchanges = list(exchanges)
+        self.interval = interval
+        self.min_venues = min_venues
+        self.text_path = text_path
+        self.bin_path = bin_path
+        self.history_path = history_path
+        self.universe = None
+        self.active = get_universe_index(self.exchanges, bin_path)
+        self.refreshes = 0
+        self.last_refresh = 0
+        self.last_duration = None
+        self.last_diff = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Одна перебудова; повертає diff або None, якщо версія не змінилась"""
+        start = time.monotonic()
+        listings = self.listings()
+        missing = [ex for ex in self.exchanges if not listings.get(ex)]
+        if missing:
+            # Без біржі маски зсунуться і пари випадуть з порогу - краще почекати
+            raise RuntimeError(f"немає символів: {', '.join(missing)}")
+
+        previous = self.universe or load_previous(self.text_path, self.bin_path)
+        universe, diff = build_universe(listings, self.exchanges, self.min_venues, previous)
+        changed = previous is None or universe.version != previous.version
+        if changed:
+            save_universe(universe, self.text_path, self.bin_path)
+            append_history(universe, diff, self.history_path)
+            index = SymbolIndex(universe.pairs, self.exchanges)
+            index.version = universe.version
+            self.active = index
+            self.last_diff = {key: len(value) for key, value in diff.items()}
+            logger.info(f"Універсум v{universe.version}: {len(universe)} пар "
+                        f"(+{len(diff['added'])} / -{len(diff['removed'])} / ~{len(diff['changed'])})")
+        self.universe = universe
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        self.last_duration = time.monotonic() - start
+        self.last_error = None
+        return diff if changed else None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"Оновлення універсуму: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='universe-refresh', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def get_status(self):
+        active = self.active
+        now = time.time()
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'version': active.version if active is not None else None,
+            'pairs': len(active) if active is not None else 0,
+            'min_venues': self.min_venues,
+            'interval': self.interval,
+            'refreshes': self.refreshes,
+            'age': round(now - self.last_refresh, 1) if self.last_refresh else None,
+            'duration': round(self.last_duration, 3) if self.last_duration is not None else None,
+            'last_diff': self.last_diff,
+            'last_error': self.last_error
+        }
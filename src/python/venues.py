@@ -0,0 +1,209 @@
+# src/python/venues.py - декларативний реєстр бірж
+import json
+import os
+
+# ==================== АДАПТЕРИ ====================
+# Кожна біржа описується даними, а не кодом:
+#   url        - один ендпоінт з усіма spot тікерами
+#   items      - шлях до списку тікерів у відповіді (None - відповідь і є список)
+#   keyed      - тікери лежать у словнику {символ: тікер} (Kraken)
+#   symbol     - поле символу; separator - роздільник BASE/QUOTE
+#   aliases    - назви активів біржі → канонічні (Kraken: XBT → BTC)
+#   price / bid / ask / volume - поля тікера; рядок або (поле, індекс)
+#   volume_unit - 'quote' (об'єм у котируванні пари; в USD - курсами знімка)
+#                 або 'base' (множиться на ціну)
+#   taker_fee  - комісія taker базового рівня (без знижок), частка
+#   batch      - той самий ендпоінт з фільтром символів: параметр, формат
+#                списку ('json' - ["A","B"], 'comma' - A,B) та символів на запит
+# Символи зберігаються у верхньому регістрі: btcusdt → BTCUSDT.
+
+VENUES = {
+    'Binance': {
+        'url': "https://api.binance.com/api/v3/ticker/24hr",
+        'items': None, 'symbol': 'symbol', 'separator': '',
+        'price': 'lastPrice', 'bid': 'bidPrice', 'ask': 'askPrice',
+        'volume': 'quoteVolume', 'volume_unit': 'quote', 'taker_fee': 0.001,
+        'batch': {'param': 'symbols', 'style': 'json', 'chunk': 100},
+    },
+    'Bybit': {
+        'url': "https://api.bybit.com/v5/market/tickers?category=spot",
+        'items': ('result', 'list'), 'symbol': 'symbol', 'separator': '',
+        'price': 'lastPrice', 'bid': 'bid1Price', 'ask': 'ask1Price',
+        'volume': 'turnover24h', 'volume_unit': 'quote', 'taker_fee': 0.001,
+    },
+    'MEXC': {
+        'url': "https://api.mexc.com/api/v3/ticker/24hr",
+        'items': None, 'symbol': 'symbol', 'separator': '',
+        'price': 'lastPrice', 'bid': 'bidPrice', 'ask': 'askPrice',
+        'volume': 'quoteVolume', 'volume_unit': 'quote', 'taker_fee': 0.0005,
+    },
+    'Gate.io': {
+        'url': "https://api.gateio.ws/api/v4/spot/tickers",
+        'items': None, 'symbol': 'currency_pair', 'separator': '_',
+        'price': 'last', 'bid': 'highest_bid', 'ask': 'lowest_ask',
+        'volume': 'quote_volume', 'volume_unit': 'quote', 'taker_fee': 0.002,
+    },
+    'HTX': {
+        'url': "https://api.huobi.pro/market/tickers",
+        'items': ('data',), 'symbol': 'symbol', 'separator': '',
+        'price': 'close', 'bid': 'bid', 'ask': 'ask',
+        'volume': 'vol', 'volume_unit': 'quote', 'taker_fee': 0.002,
+    },
+    'OKX': {
+        'url': "https://www.okx.com/api/v5/market/tickers?instType=SPOT",
+        'items': ('data',), 'symbol': 'instId', 'separator': '-',
+        'price': 'last', 'bid': 'bidPx', 'ask': 'askPx',
+        'volume': 'volCcy24h', 'volume_unit': 'quote', 'taker_fee': 0.001,
+    },
+    'KuCoin': {
+        'url': "https://api.kucoin.com/api/v1/market/allTickers",
+        'items': ('data', 'ticker'), 'symbol': 'symbol', 'separator': '-',
+        'price': 'last', 'bid': 'buy', 'ask': 'sell',
+        'volume': 'volValue', 'volume_unit': 'quote', 'taker_fee': 0.001,
+    },
+    'Bitget': {
+        'url': "https://api.bitget.com/api/v2/spot/market/tickers",
+        'items': ('data',), 'symbol': 'symbol', 'separator': '',
+        'price': 'lastPr', 'bid': 'bidPr', 'ask': 'askPr',
+        'volume': 'quoteVolume', 'volume_unit': 'quote', 'taker_fee': 0.001,
+    },
+    'Kraken': {
+        'url': "https://api.kraken.com/0/public/Ticker",
+        'items': ('result',), 'keyed': True, 'separator': '',
+        'aliases': {'XBT': 'BTC', 'XDG': 'DOGE'},
+        'price': ('c', 0), 'bid': ('b', 0), 'ask': ('a', 0),
+        'volume': ('v', 1), 'volume_unit': 'base', 'taker_fee': 0.004,
+        'batch': {'param': 'pair', 'style': 'comma', 'chunk': 200},
+    },
+}
+
+# Біржі, що опитуються без налаштувань (інші - через SOLIPSIST_VENUES)
+DEFAULT_VENUES = ('Binance', 'Bybit', 'MEXC', 'Gate.io', 'HTX')
+
+
+def enabled_venues():
+    """Активні біржі: SOLIPSIST_VENUES=Binance,OKX,... або DEFAULT_VENUES
+
+    SOLIPSIST_VENUES=all - всі біржі з реєстру.
+    """
+    configured = os.environ.get('SOLIPSIST_VENUES', '').strip()
+    if configured.lower() == 'all':
+        return list(VENUES)
+    if configured:
+        names = {name.strip().lower(): name.strip() for name in configured.split(',')}
+        return [name for name in VENUES if name.lower() in names]
+    return [name for name in VENUES if name in DEFAULT_VENUES]
+
+
+# ==================== НОРМАЛІЗАЦІЯ ====================
+
+def field_path(spec):
+    """Поле тікера як (ім'я, індекс або None)"""
+    if isinstance(spec, tuple):
+        return spec
+    return spec, None
+
+
+def read_field(item, spec):
+    """Число з поля тікера; порожнє / відсутнє значення = 0"""
+    name, position = field_path(spec)
+    value = item.get(name)
+    if position is not None:
+        value = value[position] if isinstance(value, (list, tuple)) and len(value) > position else None
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def iter_tickers(venue, payload):
+    """(символ у верхньому регістрі, тікер) з розібраної відповіді біржі"""
+    adapter = VENUES[venue]
+    items = payload
+    for key in adapter.get('items') or ():
+        items = items[key]
+
+    if adapter.get('keyed'):
+        for symbol, item in items.items():
+            yield symbol.upper(), item
+        return
+
+    symbol_key = adapter['symbol']
+    for item in items:
+        symbol = item.get(symbol_key)
+        if symbol:
+            yield symbol.upper(), item
+
+
+def is_flat(venue):
+    """Тікер - плаский об'єкт з полем символу (придатний для fast_decode.scan_records)"""
+    adapter = VENUES[venue]
+    return not adapter.get('keyed') and not any(
+        isinstance(adapter[field], tuple) for field in ('price', 'bid', 'ask', 'volume'))
+
+
+def parse_tickers(venue, payload):
+    """Розібрана відповідь → {символ: {'price', 'bid', 'ask', 'volume'}}
+
+    volume - об'єм у котируванні пари (для 'base' бірж помножений на ціну):
+    USD тільки для USDT пар, решту в USD переводить spread_engine
+    курсами знімка (MarketSnapshot.quote_rates).
+    """
+    adapter = VENUES[venue]
+    base_volume = adapter['volume_unit'] == 'base'
+    result = {}
+    for symbol, item in iter_tickers(venue, payload):
+        price = read_field(item, adapter['price'])
+        if price <= 0:
+            continue
+        volume = read_field(item, adapter['volume'])
+        result[symbol] = {
+            'price': price,
+            'bid': read_field(item, adapter['bid']),
+            'ask': read_field(item, adapter['ask']),
+            'volume': volume * price if base_volume else volume
+        }
+    return result
+
+
+# ==================== ФІЛЬТР СИМВОЛІВ ====================
+
+def batch_requests(venue, symbols):
+    """[(url, params)] для тікерів тільки цих символів (порціями batch['chunk'])"""
+    adapter = VENUES[venue]
+    batch = adapter['batch']
+    requests = []
+    for i in range(0, len(symbols), batch['chunk']):
+        chunk = symbols[i:i + batch['chunk']]
+        if batch['style'] == 'json':
+            value = json.dumps(chunk, separators=(',', ':'))
+        else:
+            value = ','.join(chunk)
+        requests.append((adapter['url'], {batch['param']: value}))
+    return requests
+
+
+def merge_payloads(venue, bodies):
+    """Відповіді кількох порцій → одна відповідь у форматі повного дампу"""
+    if len(bodies) == 1:
+        return bodies[0]
+    adapter = VENUES[venue]
+    path = adapter.get('items')
+    if not path:
+        # Відповідь - JSON масив: склеюємо без розбору
+        parts = [body.strip()[1:-1].strip() for body in bodies]
+        return b'[' + b','.join(part for part in parts if part) + b']'
+
+    merged = json.loads(bodies[0])
+    target = merged
+    for key in path:
+        target = target[key]
+    for body in bodies[1:]:
+        items = json.loads(body)
+        for key in path:
+            items = items[key]
+        if adapter.get('keyed'):
+            target.update(items)
+        else:
+            target.extend(items)
+    return json.dumps(merged).encode()
@@ -0,0 +1,308 @@
+# src/python/ws_ingest.py - потокові тікери бірж через WebSocket
+import asyncio
+import gzip
+import json
+import logging
+import threading
+import time
+
+import aiohttp
+
+from ingestion import get_engine
+
+logger = logging.getLogger(__name__)
+
+# ==================== НАЛАШТУВАННЯ ====================
+
+FRESH_SECONDS = 5          # біржа без повідомлень довше - повертаємось до REST
+RECONNECT_MIN = 1          # секунд до першого перепідключення
+RECONNECT_MAX = 30         # максимальна пауза між спробами
+SUBSCRIBE_CHUNK = 10       # символів в одному повідомленні підписки
+
+
+# ==================== ФОРМАТИ БІРЖ ====================
+# parse() повертає [(символ у форматі exchanges_all, ціна, USD об'єм, bid, ask), ...]
+# bid / ask = 0, якщо потік біржі їх не містить
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _subscribe_binance(symbols):
+    # !miniTicker@arr - всі пари одним потоком, підписка не потрібна
+    return []
+
+
+def _parse_binance(data):
+    if not isinstance(data, list):
+        return []
+    return [(item['s'], float(item['c']), float(item['q']), 0.0, 0.0) for item in data]
+
+
+def _subscribe_bybit(symbols):
+    return [{'op': 'subscribe', 'args': [f"tickers.{s}" for s in chunk]}
+            for chunk in _chunks(symbols, SUBSCRIBE_CHUNK)]
+
+
+def _parse_bybit(data):
+    item = data.get('data') if str(data.get('topic', '')).startswith('tickers.') else None
+    if not item:
+        return []
+    return [(item['symbol'], float(item['lastPrice']), float(item.get('turnover24h') or 0), 0.0, 0.0)]
+
+
+def _subscribe_gateio(symbols):
+    return [{'time': int(time.time()), 'channel': 'spot.tickers',
+             'event': 'subscribe', 'payload': chunk}
+            for chunk in _chunks(symbols, 100)]
+
+
+def _parse_gateio(data):
+    if data.get('channel') != 'spot.tickers' or data.get('event') != 'update':
+        return []
+    result = data.get('result')
+    items = result if isinstance(result, list) else [result]
+    return [(item['currency_pair'], float(item['last']), float(item.get('quote_volume') or 0),
+             float(item.get('highest_bid') or 0), float(item.get('lowest_ask') or 0))
+            for item in items if item]
+
+
+def _subscribe_htx(symbols):
+    return [{'sub': f"market.{s.lower()}.ticker", 'id': s} for s in symbols]
+
+
+def _parse_htx(data):
+    channel = data.get('ch', '')
+    tick = data.get('tick')
+    if not tick or not channel.endswith('.ticker'):
+        return []
+    symbol = channel.split('.')[1].upper()
+    return [(symbol, float(tick['close']), float(tick.get('vol') or 0),
+             float(tick.get('bid') or 0), float(tick.get('ask') or 0))]
+
+
+# MEXC публікує spot тікери тільки у protobuf - для неї залишається REST
+VENUE_STREAMS = {
+    'Binance': {
+        'url': "wss://stream.binance.com:9443/ws/!miniTicker@arr",
+        'subscribe': _subscribe_binance,
+        'parse': _parse_binance,
+    },
+    'Bybit': {
+        'url': "wss://stream.bybit.com/v5/public/spot",
+        'subscribe': _subscribe_bybit,
+        'parse': _parse_bybit,
+        'ping': {'op': 'ping'},
+        'ping_interval': 20,
+    },
+    'Gate.io': {
+        'url': "wss://api.gateio.ws/ws/v4/",
+        'subscribe': _subscribe_gateio,
+        'parse': _parse_gateio,
+        'ping': {'channel': 'spot.ping'},
+        'ping_interval': 20,
+    },
+    'HTX': {
+        'url': "wss://api.huobi.pro/ws",
+        'subscribe': _subscribe_htx,
+        'parse': _parse_htx,
+    },
+}
+
+
+# ==================== ТАБЛИЦЯ ТІКЕРІВ ====================
+
+class TickerTable:
+    """Остання ціна / об'єм / bid / ask / час оновлення по кожному символу біржі"""
+
+    def __init__(self):
+        self.venues = {}
+
+    def update(self, venue, records):
+        now = time.time()
+        rows = self.venues.setdefault(venue, {})
+        for symbol, price, volume, bid, ask in records:
+            rows[symbol] = (price, volume, bid, ask, now)
+        return len(records)
+
+    def rows(self, venue):
+        return self.venues.get(venue, {})
+
+
+# ==================== ПОТОКОВИЙ ІНЖЕСТОР ====================
+
+class StreamIngestor:
+    """Підписка на публічні тікери бірж з автоматичним перепідключенням
+
+    Працює у фоновому loop двигуна ingestion; таблицю тікерів
+    читає build_market_snapshot() замість REST знімка, а слухачі
+    (live_engine) отримують кожне оновлення одразу.
+    """
+
+    def __init__(self, symbols_by_venue, urls=None, venues=None):
+        self.symbols_by_venue = symbols_by_venue
+        self.venues = [v for v in (venues or VENUE_STREAMS) if v in VENUE_STREAMS]
+        self.urls = {v: VENUE_STREAMS[v]['url'] for v in self.venues}
+        self.urls.update(urls or {})
+        self.table = TickerTable()
+        self.listeners = []
+        self.running = False
+        self.stats = {v: {'connected': False, 'messages': 0, 'updates': 0,
+                          'reconnects': 0, 'last_message': 0, 'last_error': None}
+                      for v in self.venues}
+        self._future = None
+        self._session = None
+
+    def add_listener(self, listener):
+        """listener(venue, records) - після кожного оновлення таблиці тікерів"""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, venue, records):
+        # Помилка слухача не повинна рвати з'єднання з біржею
+        for listener in list(self.listeners):
+            try:
+                listener(venue, records)
+            except Exception as e:
+                logger.error(f"WS {venue}: слухач {listener}: {e}")
+
+    async def _ping_loop(self, ws, message, interval):
+        while not ws.closed:
+            await asyncio.sleep(interval)
+            await ws.send_json(message)
+
+    def _decode(self, message):
+        if message.type == aiohttp.WSMsgType.TEXT:
+            return json.loads(message.data)
+        if message.type == aiohttp.WSMsgType.BINARY:
+            # HTX стискає кожне повідомлення gzip
+            return json.loads(gzip.decompress(message.data))
+        return None
+
+    async def _run_venue(self, venue):
+        spec = VENUE_STREAMS[venue]
+        stats = self.stats[venue]
+        symbols = list(self.symbols_by_venue.get(venue, []))
+        backoff = RECONNECT_MIN
+
+        while self.running:
+            ping_task = None
+            try:
+                async with self._session.ws_connect(self.urls[venue], heartbeat=30,
+                                                    max_msg_size=0) as ws:
+                    for message in spec['subscribe'](symbols):
+                        await ws.send_json(message)
+                    if spec.get('ping'):
+                        ping_task = asyncio.ensure_future(
+                            self._ping_loop(ws, spec['ping'], spec['ping_interval']))
+                    stats['connected'] = True
+                    backoff = RECONNECT_MIN
+
+                    async for message in ws:
+                        data = self._decode(message)
+                        if data is None:
+                            continue
+                        if isinstance(data, dict) and 'ping' in data:
+                            await ws.send_json({'pong': data['ping']})
+                            continue
+                        stats['messages'] += 1
+                        stats['last_message'] = time.time()
+                        records = spec['parse'](data)
+                        stats['updates'] += self.table.update(venue, records)
+                        self._notify(venue, records)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats['last_error'] = str(e)
+                logger.warning(f"WS {venue}: {e}")
+            finally:
+                stats['connected'] = False
+                if ping_task:
+                    ping_task.cancel()
+
+            if self.running:
+                stats['reconnects'] += 1
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX)
+
+    async def _main(self):
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, connect=10))
+        try:
+            await asyncio.gather(*(self._run_venue(v) for v in self.venues))
+        finally:
+            await self._session.close()
+
+    def start(self):
+        """Запустити підписки (не блокує)"""
+        if self.running:
+            return
+        self.running = True
+        self._future = get_engine().submit(self._main())
+        logger.info(f"WS потоки запущено: {', '.join(self.venues)}")
+
+    def stop(self):
+        """Зупинити всі підписки"""
+        self.running = False
+        if self._future:
+            self._future.cancel()
+            self._future = None
+        logger.info("WS потоки зупинено")
+
+    def fresh_venues(self, max_age=FRESH_SECONDS):
+        """Біржі з живим потоком (інакше - REST)"""
+        now = time.time()
+        return [v for v in self.venues
+                if self.stats[v]['connected'] and now - self.stats[v]['last_message'] < max_age]
+
+    def get_status(self):
+        now = time.time()
+        return {
+            'running': self.running,
+            'venues': {
+                v: {
+                    'connected': s['connected'],
+                    'messages': s['messages'],
+                    'updates': s['updates'],
+                    'reconnects': s['reconnects'],
+                    'symbols': len(self.table.rows(v)),
+                    'age': round(now - s['last_message'], 3) if s['last_message'] else None,
+                    'last_error': s['last_error']
+                }
+                for v, s in self.stats.items()
+            }
+        }
+
+
+# ==================== ГЛОБАЛЬНИЙ ПОТІК ====================
+
+_stream = None
+_stream_lock = threading.Lock()
+
+
+def start_stream(index, urls=None, venues=None):
+    """Запустити глобальний потік для універсуму з SymbolIndex"""
+    global _stream
+    with _stream_lock:
+        if _stream is not None:
+            _stream.stop()
+        symbols = {v: index.native[v] for v in index.exchanges if v in VENUE_STREAMS}
+        _stream = StreamIngestor(symbols, urls=urls, venues=venues or list(symbols))
+        _stream.start()
+    return _stream
+
+
+def stop_stream():
+    global _stream
+    with _stream_lock:
+        if _stream is not None:
+            _stream.stop()
+            _stream = None
+
+
+def get_stream():
+    """Активний потік або None"""
+    return _stream
@@ -0,0 +1,233 @@
+# src/python/ws_standin.py - локальний WebSocket сервер-замінник бірж
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import threading
+import time
+
+from aiohttp import web, WSMsgType
+
+from symbols import SymbolIndex
+from ws_ingest import StreamIngestor
+
+# ==================== МОДЕЛЬ ЦІН ====================
+
+class RandomWalk:
+    """Випадкове блукання цін для синтетичних тікерів"""
+
+    def __init__(self, bases, seed=42):
+        self.random = random.Random(seed)
+        self.prices = {base: self.random.uniform(0.001, 500) for base in bases}
+
+    def tick(self, base):
+        price = self.prices[base] * (1 + self.random.gauss(0, 0.001))
+        self.prices[base] = price
+        return price, self.random.uniform(1e5, 1e7)
+
+
+# ==================== ФОРМАТИ ПОВІДОМЛЕНЬ ====================
+
+def _binance_message(walk, bases):
+    items = []
+    for base in bases:
+        price, volume = walk.tick(base)
+        items.append({'e': '24hrMiniTicker', 'E': int(time.time() * 1000), 's': f"{base}USDT",
+                      'c': f"{price:.8f}", 'q': f"{volume:.2f}"})
+    return items
+
+
+def _bybit_message(walk, base):
+    price, volume = walk.tick(base)
+    return {'topic': f"tickers.{base}USDT", 'type': 'snapshot', 'ts': int(time.time() * 1000),
+            'data': {'symbol': f"{base}USDT", 'lastPrice': f"{price:.8f}",
+                     'turnover24h': f"{volume:.2f}"}}
+
+
+def _gateio_message(walk, base):
+    price, volume = walk.tick(base)
+    return {'time': int(time.time()), 'channel': 'spot.tickers', 'event': 'update',
+            'result': {'currency_pair': f"{base}_USDT", 'last': f"{price:.8f}",
+                       'highest_bid': f"{price * 0.9995:.8f}", 'lowest_ask': f"{price * 1.0005:.8f}",
+                       'quote_volume': f"{volume:.2f}"}}
+
+
+def _htx_message(walk, base):
+    price, volume = walk.tick(base)
+    return {'ch': f"market.{base.lower()}usdt.ticker", 'ts': int(time.time() * 1000),
+            'tick': {'close': price, 'bid': price * 0.9995, 'ask': price * 1.0005, 'vol': volume}}
+
+
+# ==================== СЕРВЕР ====================
+
+class StandInServer:
+    """Відтворює повідомлення у форматі Binance/Bybit/Gate.io/HTX
+
+    rate - повідомлень на секунду на з'єднання,
+    drop_after - розірвати з'єднання після N повідомлень (тест перепідключення),
+    replay - JSONL файл {"venue": ..., "message": ...} замість синтетики.
+    """
+
+    def __init__(self, bases, rate=50, drop_after=None, replay=None, seed=42,
+                 host='127.0.0.1', port=0):
+        self.bases = list(bases)
+        self.rate = rate
+        self.drop_after = drop_after
+        self.walk = RandomWalk(self.bases, seed)
+        self.replay = self._load_replay(replay) if replay else {}
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self.sent = 0
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+    @staticmethod
+    def _load_replay(path):
+        messages = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    messages.setdefault(record['venue'], []).append(record['message'])
+        return messages
+
+    async def _send(self, ws, venue, message):
+        if venue == 'HTX':
+            await ws.send_bytes(gzip.compress(json.dumps(message).encode()))
+        else:
+            await ws.send_str(json.dumps(message))
+        self.sent += 1
+
+    async def _pump(self, ws, venue, make_message):
+        """Надсилати повідомлення з заданою частотою до закриття / drop_after"""
+        delay = 1 / self.rate if self.rate else 0
+        replay = self.replay.get(venue)
+        count = 0
+        while not ws.closed:
+            if self.drop_after and count >= self.drop_after:
+                await ws.close()
+                return
+            message = replay[count % len(replay)] if replay else make_message()
+            if message is not None:
+                await self._send(ws, venue, message)
+            count += 1
+            await asyncio.sleep(delay)
+
+    async def _handle(self, request, venue):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self.connections += 1
+        subscribed = []
+        cursor = {'i': 0}
+
+        def next_subscribed(build):
+            if not subscribed:
+                return None
+            base = subscribed[cursor['i'] % len(subscribed)]
+            cursor['i'] += 1
+            return build(self.walk, base)
+
+        if venue == 'Binance':
+            def make_message():
+                start = cursor['i'] % len(self.bases)
+                cursor['i'] += 50
+                return _binance_message(self.walk, self.bases[start:start + 50])
+        elif venue == 'Bybit':
+            make_message = lambda: next_subscribed(_bybit_message)
+        elif venue == 'Gate.io':
+            make_message = lambda: next_subscribed(_gateio_message)
+        else:
+            make_message = lambda: next_subscribed(_htx_message)
+
+        pump = asyncio.ensure_future(self._pump(ws, venue, make_message))
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.TEXT:
+                    data = json.loads(message.data)
+                    subscribed.extend(self._subscriptions(venue, data))
+                    if data.get('op') == 'ping':
+                        await ws.send_str(json.dumps({'op': 'pong', 'success': True}))
+        finally:
+            pump.cancel()
+        return ws
+
+    @staticmethod
+    def _subscriptions(venue, data):
+        if venue == 'Bybit' and data.get('op') == 'subscribe':
+            return [arg.split('.', 1)[1][:-4] for arg in data.get('args', [])]
+        if venue == 'Gate.io' and data.get('event') == 'subscribe':
+            return [pair.split('_')[0] for pair in data.get('payload', [])]
+        if venue == 'HTX' and 'sub' in data:
+            return [data['sub'].split('.')[1][:-4].upper()]
+        return []
+
+    async def _start(self):
+        app = web.Application()
+        for venue, path in (('Binance', '/binance'), ('Bybit', '/bybit'),
+                            ('Gate.io', '/gate'), ('HTX', '/htx')):
+            app.router.add_get(path, lambda request, venue=venue: self._handle(request, venue))
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        """Запустити сервер у власному потоці, повертає {venue: ws url}"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='ws-standin', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result(10)
+        return self.urls()
+
+    def urls(self):
+        base = f"ws://{self.host}:{self.port}"
+        return {'Binance': f"{base}/binance", 'Bybit': f"{base}/bybit",
+                'Gate.io': f"{base}/gate", 'HTX': f"{base}/htx"}
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+
+# ==================== ТЕСТОВИЙ ЗАПУСК ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн тест потокового режиму")
+    parser.add_argument('--pairs', type=int, default=756)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rate', type=float, default=200)
+    parser.add_argument('--drop-after', type=int, default=None)
+    parser.add_argument('--replay', default=None)
+    args = parser.parse_args()
+
+    bases = [f"COIN{i}" for i in range(args.pairs)]
+    server = StandInServer(bases, rate=args.rate, drop_after=args.drop_after, replay=args.replay)
+    urls = server.start()
+    print(f"🧪 Stand-in сервер: {urls['Binance'].rsplit('/', 1)[0]}")
+
+    index = SymbolIndex([f"{b}USDT" for b in bases], list(urls))
+    stream = StreamIngestor({v: index.native[v] for v in urls}, urls=urls)
+    stream.start()
+    time.sleep(args.seconds)
+    status = stream.get_status()
+    stream.stop()
+    server.stop()
+
+    print(f"\n📊 РЕЗУЛЬТАТИ ЗА {args.seconds:.0f} СЕК:")
+    print(f"{'БІРЖА':<10} {'ПОВІД/С':>10} {'ОНОВЛ/С':>10} {'СИМВОЛІВ':>9} {'РЕКОНЕКТ':>9} {'ВІК, С':>8}")
+    for venue, s in status['venues'].items():
+        age = f"{s['age']:.3f}" if s['age'] is not None else '-'
+        print(f"{venue:<10} {s['messages'] / args.seconds:>10.1f} {s['updates'] / args.seconds:>10.1f} "
+              f"{s['symbols']:>9} {s['reconnects']:>9} {age:>8}")
+
+
+if __name__ == '__main__':
+    main()